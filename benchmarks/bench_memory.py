@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+'''
+Measure the memory used by a loaded chunk set using tracemalloc (Only
+what the DocChunk objects keep after the source dicts are discarded is
+counted as retained).
+
+Run from the repo directory via:
+python3 -m benchmarks.bench_memory [chunks.ndjson]
+
+Without an argument, srd/data/chunks.ndjson is used if it exists,
+otherwise a synthetic set the size of the SRD (1694 pages of 60 chunks
+in the fonts and sizes of the SRD) is generated.
+'''
+import os
+import sys
+import gc
+import json
+import tracemalloc
+
+from srd import (
+    dictToChunk,
+    chunksNdjsonPath,
+)
+
+srdPageCount = 1694
+srdChunksPerPage = 60
+srdStyles = [
+    ('WWROEK+Calibri-Bold', 16.139999999999986),
+    ('DXJJCX+GillSans-SemiBold', 16.60656),
+    ('WWROEK+Calibri-Bold', 13.234800000000064),
+    ('LUFRKP+Calibri', 13.116719999999987),
+    ('LUFRKP+Calibri-Italic', 13.116719999999987),
+]
+
+
+def syntheticChunkDicts(pageCount=srdPageCount,
+                        chunksPerPage=srdChunksPerPage):
+    '''
+    Make chunk dicts shaped like the SRD's chunks.json. Every string is
+    created separately (as json.load would) so that sharing is not
+    measured unless the loader does it.
+    '''
+    chunkDicts = []
+    for pageid in range(pageCount):
+        for i in range(chunksPerPage):
+            column = i * 2 // chunksPerPage
+            y = 740.0 - (i % (chunksPerPage // 2)) * 22.5
+            fragments = []
+            for f in range(1 + i % 3):
+                fontname, size = srdStyles[(i + f) % len(srdStyles)]
+                fragments.append({
+                    'text': "word{} fragment {} line".format(f, i),
+                    'fontname': "".join(list(fontname)),
+                    'size': size,
+                })
+            chunkDicts.append({
+                'text': " ".join(frag['text'] for frag in fragments),
+                'pageid': pageid,
+                'pageN': pageid + 1,
+                'fontname': None,
+                'size': None,
+                'bbox': [57.6 + column * 270.96, y, 300.0, y + 13.1],
+                'column': column,
+                'fragments': fragments,
+                'annotations': [[len(fragments[0]['text']), "\n"]],
+            })
+    return chunkDicts
+
+
+def loadChunkDicts(path):
+    chunkDicts = []
+    with open(path, 'r') as ins:
+        for line in ins:
+            chunkDicts.append(json.loads(line))
+    return chunkDicts
+
+
+def main():
+    gc.collect()
+    tracemalloc.start()
+    path = None
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    elif os.path.isfile(chunksNdjsonPath):
+        path = chunksNdjsonPath
+    if path is not None:
+        print("source: {}".format(path))
+        chunkDicts = loadChunkDicts(path)
+    else:
+        print("source: synthetic ({} pages x {} chunks)"
+              "".format(srdPageCount, srdChunksPerPage))
+        chunkDicts = syntheticChunkDicts()
+    chunks = [dictToChunk(chunkD) for chunkD in chunkDicts]
+    del chunkDicts  # Only what the chunks keep is counted.
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("chunks: {}".format(len(chunks)))
+    print("retained MiB: {:.1f}".format(retained / 1048576.0))
+    print("peak MiB: {:.1f}".format(peak / 1048576.0))
+    print("bytes/chunk: {:.0f}".format(retained / len(chunks)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+'''
+Show that the cost of PDFPageDetailedAggregator.receive_layout per page
+doesn't grow with the number of pages already received: The same
+laid-out page is received once for every page of the SRD, and the mean
+time of the first and last pages is compared.
+
+Run from the repo directory via:
+python3 -m benchmarks.bench_receive_layout
+'''
+import sys
+import time
+
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LAParams
+
+from srd.pageaggregator import PDFPageDetailedAggregator
+from benchmarks.fixtures import (
+    fixturePath,
+    colStarts,
+)
+
+srdPageCount = 1694
+
+
+def layoutFirstPage(path):
+    with open(path, 'rb') as fp:
+        doc = PDFDocument(PDFParser(fp))
+        rsrcmgr = PDFResourceManager()
+        device = PDFPageAggregator(rsrcmgr, laparams=LAParams())
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        for page in PDFPage.create_pages(doc):
+            interpreter.process_page(page)
+            return device.get_result()
+
+
+def timePages(ltpage, pageCount=srdPageCount):
+    device = PDFPageDetailedAggregator(
+        PDFResourceManager(),
+        laparams=LAParams(),
+        colStarts=colStarts,
+        verbose=False,
+    )
+    times = []
+    for i in range(pageCount):
+        start = time.perf_counter()
+        device.receive_layout(ltpage)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    pageCount = srdPageCount
+    if len(sys.argv) > 1:
+        pageCount = int(sys.argv[1])
+    ltpage = layoutFirstPage(fixturePath(pageCount=1))
+    times = timePages(ltpage, pageCount=pageCount)
+    window = max(1, min(100, pageCount // 10))
+    first = sum(times[:window]) / window
+    last = sum(times[-window:]) / window
+    print("pages: {}".format(pageCount))
+    print("mean ms/page of pages 1-{}: {:.3f}".format(window, first * 1000))
+    print("mean ms/page of pages {}-{}: {:.3f}"
+          "".format(pageCount - window + 1, pageCount, last * 1000))
+    print("last/first: {:.2f}".format(last / first))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
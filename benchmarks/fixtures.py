@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+'''
+Generate freely usable PDF files for benchmarks so that no copy of a
+real manual is required. The text is laid out like the SRD: two columns
+of lines in two fonts, some lines mixing fonts, and the visible page
+number as the last text in the second column.
+'''
+import os
+
+colStarts = [57.6, 328.56]
+pageSize = (612, 792)
+
+
+def pageOps(pageIndex, lineCount=30, colStarts=colStarts):
+    ops = []
+    for col in range(len(colStarts)):
+        x = colStarts[col]
+        y = 740
+        for i in range(lineCount):
+            if i % 5 == 2:
+                # A stat-like line with a bold label then regular text.
+                ops.append("BT /F2 10 Tf {} {} Td (Stat{}) Tj"
+                           " /F1 10 Tf ( value {} of {}) Tj ET"
+                           "".format(x, y, i, col, pageIndex))
+            else:
+                font, size = ("/F1", 10)
+                if i % 7 == 0:
+                    font, size = ("/F2", 13)
+                ops.append("BT {} {} Tf {} {} Td (Column {} line {} of"
+                           " page {} text) Tj ET"
+                           "".format(font, size, x, y, col, i,
+                                     pageIndex))
+            y -= 22
+    ops.append("BT /F1 9 Tf 540 30 Td ({}) Tj ET".format(pageIndex + 1))
+    return "\n".join(ops).encode("ascii")
+
+
+def pdfString(text):
+    '''
+    Get text as a PDF literal string (in parentheses).
+    '''
+    for ch in "\\()":
+        text = text.replace(ch, "\\" + ch)
+    return "(" + text + ")"
+
+
+def writeTwoColumnPdf(path, pageCount=20, lineCount=30,
+                      colStarts=colStarts, pageLabels=None, outline=None):
+    '''
+    Write a PDF with the given number of pages to path using only the
+    standard Type1 fonts (Helvetica and Helvetica-Bold).
+
+    Keyword arguments:
+    pageLabels -- A list of (pageIndex, style, prefix, start) for each
+        range of /PageLabels, where style is "D", "r", "R", "a", "A" or
+        None (for only the prefix).
+    outline -- A list of (level, title, pageIndex) in order, where
+        level starts at 1, for each item of the document outline.
+    '''
+    objs = [None, None]  # The catalog and page tree are filled in last.
+
+    def add(data):
+        objs.append(data)
+        return len(objs)
+
+    f1 = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    f2 = add(b"<< /Type /Font /Subtype /Type1"
+             b" /BaseFont /Helvetica-Bold >>")
+    kids = []
+    for pageIndex in range(pageCount):
+        data = pageOps(pageIndex, lineCount=lineCount,
+                       colStarts=colStarts)
+        contents = add(b"<< /Length %d >>\nstream\n" % len(data)
+                       + data + b"\nendstream")
+        kids.append(add(
+            ("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {} {}]"
+             " /Contents {} 0 R /Resources << /Font << /F1 {} 0 R"
+             " /F2 {} 0 R >> >> >>"
+             "".format(pageSize[0], pageSize[1], contents, f1, f2)
+             ).encode("ascii")
+        ))
+    catalog = "<< /Type /Catalog /Pages 2 0 R"
+    if pageLabels is not None:
+        nums = []
+        for pageIndex, style, prefix, start in pageLabels:
+            entry = "<<"
+            if style is not None:
+                entry += " /S /" + style
+            if prefix:
+                entry += " /P " + pdfString(prefix)
+            if start is not None:
+                entry += " /St {}".format(start)
+            nums.append("{} {} >>".format(pageIndex, entry))
+        catalog += " /PageLabels << /Nums [{}] >>".format(" ".join(nums))
+    if outline:
+        root = {'children': [], 'level': 0}
+        stack = [root]
+        for level, title, pageIndex in outline:
+            while stack[-1]['level'] >= level:
+                stack.pop()
+            node = {'children': [], 'level': level, 'title': title,
+                    'page': kids[pageIndex], 'parent': stack[-1]}
+            stack[-1]['children'].append(node)
+            stack.append(node)
+
+        def reserve(node):
+            node['objid'] = add(None)
+            for child in node['children']:
+                reserve(child)
+
+        def count(node):
+            return sum(1 + count(child) for child in node['children'])
+
+        def fill(node):
+            entries = []
+            if node is root:
+                entries.append("/Type /Outlines")
+            else:
+                entries.append("/Title " + pdfString(node['title']))
+                entries.append("/Parent {} 0 R"
+                               "".format(node['parent']['objid']))
+                entries.append("/Dest [{} 0 R /Fit]".format(node['page']))
+                siblings = node['parent']['children']
+                i = siblings.index(node)
+                if i > 0:
+                    entries.append("/Prev {} 0 R"
+                                   "".format(siblings[i-1]['objid']))
+                if i + 1 < len(siblings):
+                    entries.append("/Next {} 0 R"
+                                   "".format(siblings[i+1]['objid']))
+            if node['children']:
+                entries.append("/First {} 0 R"
+                               "".format(node['children'][0]['objid']))
+                entries.append("/Last {} 0 R"
+                               "".format(node['children'][-1]['objid']))
+                entries.append("/Count {}".format(count(node)))
+            objs[node['objid'] - 1] = ("<< " + " ".join(entries) + " >>"
+                                       ).encode("latin-1")
+            for child in node['children']:
+                fill(child)
+
+        reserve(root)
+        fill(root)
+        catalog += " /Outlines {} 0 R".format(root['objid'])
+    objs[0] = (catalog + " >>").encode("latin-1")
+    objs[1] = ("<< /Type /Pages /Kids [{}] /Count {} >>"
+               "".format(" ".join("{} 0 R".format(k) for k in kids),
+                         len(kids))).encode("ascii")
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i in range(len(objs)):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % (i + 1) + objs[i] + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += (b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objs) + 1, xref))
+    with open(path, 'wb') as outs:
+        outs.write(out)
+    return path
+
+
+def fixturePath(pageCount=20, lineCount=30, directory=None):
+    '''
+    Get the path of a generated fixture, writing it only if it doesn't
+    exist yet.
+    '''
+    if directory is None:
+        directory = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                 "data")
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    path = os.path.join(directory, "two-column-{}x{}.pdf"
+                                   "".format(pageCount, lineCount))
+    if not os.path.isfile(path):
+        writeTwoColumnPdf(path, pageCount=pageCount, lineCount=lineCount)
+    return path
+
+
+# The fonts and sizes that srd.styleRoles recognizes (see srd):
+srdStyles = {
+    'name': ('WWROEK+Calibri-Bold', 16.139999999999986),
+    'subcategory': ('DXJJCX+GillSans-SemiBold', 16.60656),
+    'stat': ('WWROEK+Calibri-Bold', 13.234800000000064),
+    'body': ('LUFRKP+Calibri', 13.116719999999987),
+    'italic': ('LUFRKP+Calibri-Italic', 13.116719999999987),
+    'letter': ('DXJJCX+GillSans-SemiBold', 21.474000000000046),
+    'title': ('DXJJCX+GillSans-SemiBold', 30.922559999999976),
+}
+challenges = [("1/8", "25"), ("1/4", "50"), ("1/2", "100"), ("1", "200"),
+              ("5", "1,800"), ("10", "5,900")]
+creatureTypes = [
+    "Large monstrosity, unaligned",
+    "Medium humanoid (any race), any alignment",
+    "Small fey, neutral",
+    "Huge undead, chaotic evil",
+    "Tiny aberration, neutral evil",
+]
+
+
+def srdLikeChunkDicts(creaturesPerSection=6):
+    '''
+    Make chunk dicts (as from DocChunk.toDict) laid out like the
+    creature sections of the SRD, so that srd.processChunks finds
+    categories, subcategories and creatures (with stats, a Challenge for
+    most of them, and unknown chunks) without a copy of the SRD.
+    '''
+    chunkDicts = []
+    state = {'pageid': 0, 'line': 0}
+
+    def nextPage():
+        state['pageid'] += 1
+
+    def add(frags, pageN=None):
+        style = (None, None)
+        if len(frags) == 1:
+            style = srdStyles[frags[0][1]]
+        if pageN is None:
+            pageN = state['pageid'] + 1
+        y = 700.0 - (state['line'] % 30) * 20
+        state['line'] += 1
+        chunkDicts.append({
+            'text': " ".join(text for text, role in frags),
+            'pageid': state['pageid'],
+            'pageN': pageN,
+            'fontname': style[0],
+            'size': style[1],
+            'bbox': [57.6, y, 300.0, y + 13.0],
+            'column': 0,
+            'fragments': [{'text': text,
+                           'fontname': srdStyles[role][0],
+                           'size': srdStyles[role][1]}
+                          for text, role in frags],
+            'annotations': [[len(frags[0][0]), "\n"]],
+        })
+
+    def addCreature(name, creatureType, challenge, i, pageN=None):
+        add([(name, 'name')], pageN=pageN)
+        add([(creatureType, 'italic')], pageN=pageN)
+        add([("Armor Class", 'stat'),
+             ("{} (natural armor)".format(10 + i % 8), 'body')],
+            pageN=pageN)
+        add([("Hit Points", 'stat'),
+             ("{} ({}d8)".format(5 * i + 3, i + 1), 'body')], pageN=pageN)
+        add([("Speed", 'stat'), ("30 ft.", 'body')], pageN=pageN)
+        add([("STR", 'stat')], pageN=pageN)
+        add([("10 (+0) 12 (+1) 14 (+2) 8 (-1) 10 (+0) 6 (-2)", 'body')],
+            pageN=pageN)
+        if i % 4 != 3:
+            add([("Challenge", 'stat'),
+                 ("{} ({} XP)".format(*challenge), 'body')], pageN=pageN)
+        add([("Some descriptive text about {}".format(name), 'body')],
+            pageN=pageN)
+        add([("Multiattack.", 'stat'),
+             ("The creature makes two attacks.", 'body'),
+             ("Extra", 'italic')], pageN=pageN)
+
+    add([("Introduction", 'title')])
+    nextPage()
+    k = 0
+    for letter in "ABCDEG":
+        add([("Monsters ({})".format(letter), 'letter')])
+        for i in range(creaturesPerSection):
+            addCreature("{}creature{}".format(letter, i),
+                        creatureTypes[(k + i) % len(creatureTypes)],
+                        challenges[(k + i) % len(challenges)], i)
+            if i == 1:
+                add([("{} Group".format(letter), 'subcategory')])
+            if (i == 3) and (letter == "G"):
+                add([("Ghost", 'name')])
+            k += 1
+            nextPage()
+    # Headings on pages in nonSubcategoryPages and subcatEndPages:
+    add([("Elementals", 'subcategory')], pageN=320)
+    addCreature("Air Elemental", "Large elemental, neutral", ("5", "1,800"),
+                1, pageN=320)
+    add([("Animated Objects", 'subcategory')], pageN=331)
+    add([("Rug", 'name')], pageN=332)
+    add([("Challenge", 'stat'), ("2 (450 XP)", 'body')], pageN=332)
+    nextPage()
+    add([("Appendix PH-A: Conditions", 'title')])
+    nextPage()
+    add([("Appendix MM-A:", 'title')])
+    add([("Miscellaneous", 'title')])
+    add([("Creatures", 'title')])
+    for i in range(creaturesPerSection):
+        addCreature("Beast{}".format(i), "Medium beast, unaligned",
+                    challenges[i % len(challenges)], i)
+        nextPage()
+    add([("Unknown", 'stat'), ("a", 'body'), ("b", 'italic')])
+    add([("Appendix MM-B:", 'title')])
+    add([("Nonplayer", 'title')])
+    add([("Characters", 'title')])
+    for i in range(creaturesPerSection):
+        addCreature("Npc{}".format(i),
+                    "Medium humanoid (any race), any alignment",
+                    challenges[i % len(challenges)], i)
+        nextPage()
+    add([("5.1", 'body')])
+    add([("403", 'body')])
+    return chunkDicts
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+'''
+Time each stage of the pipeline on generated fixtures (see
+benchmarks.fixtures) and write the results to a JSON file so that the
+results of two commits can be compared:
+
+- generateChunks: pages/s for a two-column PDF
+- receive_layout: ns per glyph (LTChar) of one laid-out page
+- saving and loading the chunks as chunks.json, chunks.ndjson and
+  chunks.bin: chunks/s
+- dictToChunk: chunks/s
+- iterCreatures (the processChunks state machine): chunks/s
+- writing creatures.json and creatures.csv: creatures/s
+
+Each time is the best of several repeats. Run from the repo directory
+via:
+python3 -m benchmarks.suite [--quick] [--output PATH] [--compare PATH]
+
+Without --output, the results are written to
+benchmarks/data/results-<commit>.json. With --compare, each result is
+also compared to a previous results file, and the exit code is 1 if any
+stage is slower by more than --threshold.
+'''
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import datetime
+import tempfile
+import subprocess
+
+from pdfminer.layout import (
+    LAParams,
+    LTChar,
+)
+from pdfminer.pdfinterp import PDFResourceManager
+
+from srd import (
+    dictToChunk,
+)
+from srd.diagnostics import (
+    Diagnostics,
+)
+from srd.pageaggregator import PDFPageDetailedAggregator
+from srd.pagechunker import generateChunks
+from srd.chunkstore import (
+    saveChunkPages,
+    iterChunkDicts,
+)
+from srd.chunkcolumns import (
+    writeColumnarChunks,
+    ColumnarChunks,
+)
+from srd.creaturewriter import CreatureWriter
+from benchmarks.fixtures import (
+    fixturePath,
+    colStarts,
+    srdLikeChunkDicts,
+)
+from benchmarks.bench_receive_layout import layoutFirstPage
+
+resultsVersion = 1
+fullSettings = {
+    'pages': 40,  # pages of the two-column fixture
+    'lines': 30,  # lines per column of the fixture
+    'layoutRepeats': 200,  # times receive_layout runs per repeat
+    'creaturesPerSection': 300,  # see srdLikeChunkDicts
+    'repeat': 5,
+}
+quickSettings = {
+    'pages': 8,
+    'lines': 30,
+    'layoutRepeats': 40,
+    'creaturesPerSection': 40,
+    'repeat': 2,
+}
+dataPath = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+
+
+def bestTime(func, repeat):
+    '''
+    Get the shortest number of seconds that func() takes in repeat
+    calls.
+    '''
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - start
+        if (best is None) or (seconds < best):
+            best = seconds
+    return best
+
+
+def result(count, seconds, unit, repeat, perItem=False):
+    '''
+    Describe a benchmark of count items that took seconds (the best of
+    repeat runs) as a rate (count per second), or as nanoseconds per
+    item if perItem is True.
+    '''
+    if perItem:
+        value = seconds * 1e9 / count
+        higherIsBetter = False
+    else:
+        value = count / seconds
+        higherIsBetter = True
+    return {
+        'value': value,
+        'unit': unit,
+        'higherIsBetter': higherIsBetter,
+        'count': count,
+        'seconds': seconds,
+        'repeat': repeat,
+    }
+
+
+def countGlyphs(item):
+    if isinstance(item, LTChar):
+        return 1
+    count = 0
+    if hasattr(item, '__iter__'):
+        for child in item:
+            count += countGlyphs(child)
+    return count
+
+
+def runSuite(settings, log=None):
+    '''
+    Run every benchmark and get a dict where each key is the name of a
+    benchmark and the value is from result.
+
+    Keyword arguments:
+    log -- A function that receives the name of each benchmark before
+        it runs (None for no output).
+    '''
+    if log is None:
+        def log(msg):
+            pass
+    repeat = settings['repeat']
+    results = {}
+    pdfPath = fixturePath(pageCount=settings['pages'],
+                          lineCount=settings['lines'])
+
+    log("generateChunks")
+    chunks = []
+
+    def extract():
+        chunks[:] = generateChunks(pdfPath, colStarts=colStarts,
+                                   captureAnnotations=False)
+
+    results['generateChunks'] = result(
+        settings['pages'], bestTime(extract, repeat), "pages/s", repeat)
+
+    log("receive_layout")
+    ltpage = layoutFirstPage(pdfPath)
+    glyphs = countGlyphs(ltpage)
+    layoutRepeats = settings['layoutRepeats']
+
+    def receive():
+        device = PDFPageDetailedAggregator(
+            PDFResourceManager(),
+            laparams=LAParams(),
+            colStarts=colStarts,
+            verbose=False,
+            captureAnnotations=False,
+        )
+        for i in range(layoutRepeats):
+            device.receive_layout(ltpage)
+
+    results['receive_layout'] = result(
+        glyphs * layoutRepeats, bestTime(receive, repeat), "ns/glyph",
+        repeat, perItem=True)
+
+    chunkDicts = [chunk.toDict() for chunk in chunks]
+    count = len(chunkDicts)
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonPath = os.path.join(tmp, "chunks.json")
+        ndjsonPath = os.path.join(tmp, "chunks.ndjson")
+        columnarPath = os.path.join(tmp, "chunks.bin")
+
+        def saveJson():
+            with open(jsonPath, 'w') as outs:
+                json.dump([chunk.toDict() for chunk in chunks], outs)
+
+        def loadJson():
+            with open(jsonPath, 'r') as ins:
+                json.load(ins)
+
+        def saveNdjson():
+            saveChunkPages([(0, chunks)], ndjsonPath)
+
+        def loadNdjson():
+            for chunkD in iterChunkDicts(ndjsonPath):
+                pass
+
+        def saveColumnar():
+            writeColumnarChunks(chunkDicts, columnarPath)
+
+        def loadColumnar():
+            with ColumnarChunks(columnarPath) as store:
+                for chunk in store:
+                    chunk.text
+                    chunk.styleKey
+
+        for name, func in [('saveChunksJson', saveJson),
+                           ('loadChunksJson', loadJson),
+                           ('saveChunksNdjson', saveNdjson),
+                           ('loadChunksNdjson', loadNdjson),
+                           ('saveChunksColumnar', saveColumnar),
+                           ('loadChunksColumnar', loadColumnar)]:
+            log(name)
+            results[name] = result(count, bestTime(func, repeat),
+                                   "chunks/s", repeat)
+
+    log("dictToChunk")
+
+    def convert():
+        for chunkD in chunkDicts:
+            dictToChunk(chunkD)
+
+    results['dictToChunk'] = result(count, bestTime(convert, repeat),
+                                    "chunks/s", repeat)
+
+    log("iterCreatures")
+    from srd import iterCreatures
+    srdChunks = [dictToChunk(chunkD) for chunkD in
+                 srdLikeChunkDicts(settings['creaturesPerSection'])]
+    quiet = Diagnostics(quiet=True)
+    creatures = []
+
+    def process():
+        creatures[:] = iterCreatures(srdChunks, diagnostics=quiet)
+
+    results['iterCreatures'] = result(
+        len(srdChunks), bestTime(process, repeat), "chunks/s", repeat)
+
+    log("writeCreatures")
+    with tempfile.TemporaryDirectory() as tmp:
+        def write():
+            with CreatureWriter(
+                    jsonPath=os.path.join(tmp, "creatures.json"),
+                    csvPath=os.path.join(tmp, "creatures.csv")) as writer:
+                for monster in creatures:
+                    writer.write(monster)
+
+        results['writeCreatures'] = result(
+            len(creatures), bestTime(write, repeat), "creatures/s", repeat)
+    return results
+
+
+def gitCommit():
+    '''
+    Get (commit, dirty) for the repo, or (None, None) if git fails.
+    '''
+    repoPath = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=repoPath,
+            stderr=subprocess.DEVNULL).decode("utf-8").strip()
+        status = subprocess.check_output(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=repoPath, stderr=subprocess.DEVNULL).decode("utf-8")
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, len(status.strip()) > 0
+
+
+def compareResults(old, new, threshold=0.1):
+    '''
+    Get a list of lines comparing each result that both results files
+    have, and the list of names of results that got worse by more than
+    threshold (0.1 is 10%).
+    '''
+    lines = []
+    regressions = []
+    for name, got in new['results'].items():
+        before = old['results'].get(name)
+        if before is None:
+            continue
+        speedup = got['value'] / before['value']
+        if not got['higherIsBetter']:
+            speedup = before['value'] / got['value']
+        mark = ""
+        if speedup < 1.0 - threshold:
+            mark = " REGRESSION"
+            regressions.append(name)
+        lines.append("{:<20} {:>14.1f} -> {:>14.1f} {:<12} x{:.2f}{}"
+                     "".format(name, before['value'], got['value'],
+                               got['unit'], speedup, mark))
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark each stage of the chunk pipeline.")
+    parser.add_argument("--quick", action="store_true",
+                        help="Use small fixtures and fewer repeats.")
+    parser.add_argument("--output", help="The results JSON file.")
+    parser.add_argument("--compare",
+                        help="A results JSON file from another run.")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="The slowdown (0.1 is 10%%) that counts as"
+                             " a regression.")
+    args = parser.parse_args()
+    settings = fullSettings
+    if args.quick:
+        settings = quickSettings
+
+    def log(name):
+        sys.stderr.write("* {}...\n".format(name))
+        sys.stderr.flush()
+
+    commit, dirty = gitCommit()
+    results = {
+        'version': resultsVersion,
+        'commit': commit,
+        'dirty': dirty,
+        'time': datetime.datetime.now().isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': settings,
+        'results': runSuite(settings, log=log),
+    }
+    path = args.output
+    if path is None:
+        if not os.path.isdir(dataPath):
+            os.makedirs(dataPath)
+        path = os.path.join(dataPath, "results-{}.json"
+                                      "".format((commit or "unknown")[:12]))
+    with open(path, 'w') as outs:
+        json.dump(results, outs, indent=2)
+    for name, got in results['results'].items():
+        print("{:<20} {:>14.1f} {}".format(name, got['value'], got['unit']))
+    print("* wrote \"{}\"".format(path))
+    if args.compare is not None:
+        with open(args.compare, 'r') as ins:
+            old = json.load(ins)
+        if old['settings'] != settings:
+            print("WARNING: \"{}\" used other settings: {}"
+                  "".format(args.compare, old['settings']))
+        lines, regressions = compareResults(old, results,
+                                            threshold=args.threshold)
+        print("compared to {}:".format(old.get('commit')))
+        for line in lines:
+            print(line)
+        if len(regressions) > 0:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
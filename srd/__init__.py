@@ -5,10 +5,24 @@ if __name__ == "__main__":
     exit(1)
 
 import os
+import re
 import platform
 import sys
 import json
 import csv
+import atexit
+
+from srd.markers import (
+    MarkerMatcher,
+)
+from srd.diagnostics import (
+    Diagnostics,
+    lazy,
+    DEBUG,
+)
+from srd.profiling import (
+    nullProfiler,
+)
 
 def prerr(msg):
     sys.stderr.write("{}\n".format(msg))
@@ -30,9 +44,43 @@ if not os.path.isdir(dataPath):
 
 chunksName = "chunks.json"
 chunksPath = os.path.join(dataPath, chunksName)
+# chunks.json (chunksPath) is only read if it exists from an old run,
+# since the line-delimited format can be saved and loaded one chunk at a
+# time (see srd.chunkstore):
+chunksNdjsonName = "chunks.ndjson"
+chunksNdjsonPath = os.path.join(dataPath, chunksNdjsonName)
+# The columnar copy is made from chunks.ndjson and is used if present
+# since opening it takes almost no time (see srd.chunkcolumns):
+chunksColumnarName = "chunks.bin"
+chunksColumnarPath = os.path.join(dataPath, chunksColumnarName)
+pageCachePath = os.path.join(dataPath, "pagecache")
+# The inverted index of the chunk store (see srd.chunkindex):
+chunkIndexPath = os.path.join(dataPath, "chunks.index")
+# What each output of main was made from (see srd.buildgraph):
+buildStatePath = os.path.join(dataPath, "build.json")
+# Pass this as sqlitePath to write an SQLite copy (see srd.creaturedb):
+databasePath = os.path.join(dataPath, "srd.sqlite")
+# Where the columns of SRD 5.1 start (see srd.columns to detect them in
+# other documents):
+srdColStarts = [57.6, 328.56]
 indent = ""
+# pdent, edent and processChunks report through diag by default. Change
+# its level, sampling or quiet mode with diag.configure, or pass another
+# Diagnostics object (such as from srd.diagnostics.openDiagnostics).
+diag = Diagnostics()
+atexit.register(diag.flush)
 nonSimpleTypeNames = ['builtin_function_or_method', 'method']
 
+NameHeader = 'ClassName'  # a.k.a. Name, such as "Spy"
+ContextHeader = 'Category'
+SubCategoryHeader = 'Subcategory'
+statHeaders = ["STR", "CHA", "CON", "DEX", "WIS", "INT"]
+# The columns of creatures.csv:
+creatureHeaders = [NameHeader, "CR", "XP", "Languages", ContextHeader,
+                   SubCategoryHeader, "Armor Class", "pageN",
+                   "Hit Points", "Saving Throws", "Speed", "Skills",
+                   "Senses"] + statHeaders
+
 '''
 Anything heading with the same style as a subcategory but is on one of
 the following pages is not a subcategory but still ends the previous
@@ -69,9 +117,6 @@ to None (Use page numbers instead of strings to avoid license
 infringement):
 '''
 subcatEndPages = [332, 336, 339]
-doneSubcatEndPages = {}
-for n in subcatEndPages:
-    doneSubcatEndPages[n] = False
 
 def assertPlainDict(d):
     for k,v in d.items():
@@ -84,6 +129,18 @@ def assertPlainDict(d):
             raise ValueError("^ not a plain dict")
 
 
+def partialPath(path):
+    '''
+    Get the path of the unfinished copy of path (such as
+    "creatures.partial.json" for "creatures.json").
+    '''
+    parts = os.path.basename(path).split(".", 1)
+    name = parts[0] + ".partial"
+    if len(parts) > 1:
+        name += "." + parts[1]
+    return os.path.join(os.path.dirname(path), name)
+
+
 def dented(s):
     '''
     Replace \n with \n+indent (the global indent).
@@ -95,18 +152,19 @@ def dented(s):
 
 def pdent(msg):
     '''
-    Write msg+newline to stdout but indent using the global 'indent'.
+    Report msg to diag at the INFO level (stdout by default) but indent
+    using the global 'indent'. The output is buffered (see
+    srd.diagnostics).
     '''
-    sys.stdout.write("{}{}\n".format(indent, dented(msg)))
-    sys.stdout.flush()
+    diag.info('general', msg, indent=indent)
 
 
 def edent(msg):
     '''
-    Write msg+newline to stderr but indent using the global 'indent'.
+    Report msg to diag at the WARNING level (stderr by default) but
+    indent using the global 'indent'.
     '''
-    sys.stderr.write("{}{}\n".format(indent, dented(msg)))
-    sys.stderr.flush()
+    diag.warning('general', msg, indent=indent)
 
 
 def noParens(s):
@@ -158,16 +216,18 @@ def clean_frag_text(text):
 
 
 def clean_frag(frag):
-    frag['text'] = clean_frag_text(frag['text'])
+    '''
+    Get a copy of the Fragment with clean_frag_text applied.
+    '''
+    return Fragment(clean_frag_text(frag.text), frag.style)
 
 
 def same_style(frag1, frag2):
     """
-    Is same fontname and size.
+    Is same fontname and size (Styles are interned so this is an
+    identity check).
     """
-    ffn = frag2['fontname']
-    ffs = frag2['size']
-    return (ffs == frag1['size']) and (ffn == frag1['fontname'])
+    return frag1.style is frag2.style
 
 
 def frag_dict(text, fontname, size):
@@ -178,7 +238,109 @@ def frag_dict(text, fontname, size):
     }
 
 
+class FontStyle:
+    """
+    A fontname and size. Get instances from internStyle so that every
+    fragment in the same style shares one FontStyle and styles can be
+    compared by identity.
+    """
+    __slots__ = ('fontname', 'size', '_rounded')
+
+    def __init__(self, fontname, size):
+        self.fontname = fontname
+        self.size = size
+        self._rounded = {}
+
+    def rounded(self, decimalPlaces):
+        '''
+        Get the interned style with the size rounded to decimalPlaces.
+        '''
+        style = self._rounded.get(decimalPlaces)
+        if style is None:
+            size = self.size
+            if size is not None:
+                size = round(size, decimalPlaces)
+            style = internStyle(self.fontname, size)
+            self._rounded[decimalPlaces] = style
+        return style
+
+    def __reduce__(self):
+        # Intern the style again when unpickled (such as in the parent
+        # process after a worker process generates chunks).
+        return (internStyle, (self.fontname, self.size))
+
+    def __repr__(self):
+        return "FontStyle({!r}, {!r})".format(self.fontname, self.size)
+
+
+fontStyles = {}
+
+
+def internStyle(fontname, size):
+    '''
+    Get the one FontStyle for the fontname and size.
+    '''
+    key = (fontname, size)
+    style = fontStyles.get(key)
+    if style is None:
+        if fontname is not None:
+            fontname = sys.intern(fontname)
+        style = fontStyles.setdefault(key, FontStyle(fontname, size))
+    return style
+
+
+class Fragment:
+    """
+    An immutable part of a DocChunk (usually words) in one style.
+    """
+    __slots__ = ('text', 'style')
+
+    def __init__(self, text, style):
+        object.__setattr__(self, 'text', text)
+        object.__setattr__(self, 'style', style)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Fragment is immutable.")
+
+    def __reduce__(self):
+        return (Fragment, (self.text, self.style))
+
+    @property
+    def fontname(self):
+        return self.style.fontname
+
+    @property
+    def size(self):
+        return self.style.size
+
+    def toDict(self):
+        return frag_dict(self.text, self.style.fontname, self.style.size)
+
+    def __repr__(self):
+        return "Fragment({!r}, {!r})".format(self.text, self.style)
+
+
+def new_frag(text, fontname, size):
+    '''
+    Get a Fragment that uses the interned style.
+    '''
+    return Fragment(text, internStyle(fontname, size))
+
+
+def toFragment(frag):
+    '''
+    Get a Fragment from a Fragment or a frag_dict.
+    '''
+    if isinstance(frag, Fragment):
+        return frag
+    return new_frag(frag['text'], frag['fontname'], frag['size'])
+
+
 class DocChunk:
+    __slots__ = ('pageid', 'column', 'bbox', 'text', 'fontSize',
+                 'fontName', 'fragments', 'annotations', 'pageN',
+                 'styleKey')
+
     def __init__(self, pageid, column, bbox, text, fontName=None,
                  fontSize=None, fragments=None, annotations=None):
         """
@@ -190,17 +352,25 @@ class DocChunk:
         Keyword arguments:
         fontName -- Only set if all fragments have same fontname.
         fontSize -- Only set if all fragments have same font size.
-        fragments -- frag_dict representing parts of the chunk
-            (usually words) that differ in font size or font name.
-        annotations -- LTAnno objects (defined in pdfminer.layout)
+        fragments -- Fragment objects (or frag_dict dicts, which are
+            converted) representing parts of the chunk (usually words)
+            that differ in font size or font name.
+        annotations -- [offset, text] pairs representing LTAnno
+            objects (defined in pdfminer.layout), or None if they were
+            not captured (see PDFPageDetailedAggregator).
         """
         self.pageid = pageid
         self.column = column
         self.bbox = BBox(bbox)
         self.text = text
         self.fontSize = fontSize
+        if fontName is not None:
+            fontName = sys.intern(fontName)
         self.fontName = fontName
+        if fragments is not None:
+            fragments = [toFragment(frag) for frag in fragments]
         self.fragments = fragments
+        self.styleKey = chunkStyleKey(fragments)
         self.annotations = annotations
 
         self.pageN = None  # Set this later based on the visible number.
@@ -222,6 +392,9 @@ class DocChunk:
         return chunk
 
     def toDict(self):
+        fragments = self.fragments
+        if fragments is not None:
+            fragments = [frag.toDict() for frag in fragments]
         return {
             'text': self.text,
             'pageid': self.pageid,
@@ -230,7 +403,7 @@ class DocChunk:
             'size': self.fontSize,
             'bbox': self.bbox.toTuple(),
             'column': self.column,
-            'fragments': self.fragments,
+            'fragments': fragments,
             'annotations': self.annotations,
         }
 
@@ -241,26 +414,23 @@ class DocChunk:
         and size.
         """
         fragments = []
-        thisFrag = None
+        texts = []
+        style = None
         for fragment in self.fragments:
-            if (thisFrag is None) or (not same_style(fragment, thisFrag)):
-                if thisFrag is not None:
+            if fragment.style is not style:
+                if len(texts) > 0:
                     # Append the finished fragment.
-                    clean_frag(thisFrag)
-                    fragments.append(thisFrag)
-                thisFrag = frag_dict(
-                    fragment['text'],
-                    fragment['fontname'],
-                    fragment['size'],
-                )
-            else:
-                thisFrag['text'] += fragment['text']
+                    fragments.append(clean_frag(Fragment("".join(texts),
+                                                         style)))
+                texts = []
+                style = fragment.style
+            texts.append(fragment.text)
 
-        if thisFrag is not None:
+        if len(texts) > 0:
             # Append the last fragment.
-            clean_frag(thisFrag)
-            fragments.append(thisFrag)
+            fragments.append(clean_frag(Fragment("".join(texts), style)))
         self.fragments = fragments
+        self.styleKey = chunkStyleKey(fragments)
 
     def oneStyle(self, fontname, size, decimalPlaces=2, index=None):
         """
@@ -278,16 +448,8 @@ class DocChunk:
                 return False
             index = 0
         frag = self.fragments[index]
-        fSize = round(frag['size'], decimalPlaces)
-        size = round(size, decimalPlaces)
-        '''
-        if size != fSize:
-            print("size {} != {}".format(fSize, size))
-        if fontname != frag['fontname']:
-            print("fontname {} is not {}"
-                  "".format(frag['fontname'], fontname))
-        '''
-        return (frag['fontname'] == fontname) and (fSize == size)
+        style = internStyle(fontname, round(size, decimalPlaces))
+        return frag.style.rounded(decimalPlaces) is style
 
     def startStyle(self, fontname, size, decimalPlaces=2):
         return self.oneStyle(
@@ -299,6 +461,8 @@ class DocChunk:
 
 
 class BBox:
+    __slots__ = ('x1', 'y1', 'x2', 'y2')
+
     def __init__(self, bbox):
         """
         bbox: tuple of (x1, x1, x2, y2)
@@ -312,6 +476,98 @@ class BBox:
         return (self.x1, self.y1, self.x2, self.y2)
 
 
+'''
+A style key describes the style of a chunk well enough to classify it:
+the (fontname, size) of the first fragment with the size rounded to
+styleDecimalPlaces and the number of fragments with 2 meaning 2 or
+more. It is computed once when the DocChunk is created so that
+processChunks only needs one dict lookup (see chunkRole) instead of
+rounding sizes for each check. It is a plain tuple rather than an
+interned FontStyle so that looking up a style that isn't in a table
+doesn't add it to fontStyles.
+'''
+styleDecimalPlaces = 2
+
+roleName = 'name'  # ClassName (Creature, NPC, or Monster name)
+roleSubcategory = 'subcategory'  # such as "Dragons, Metallic"
+roleStat = 'stat'  # such as "Armor Class" then its value
+roleLetterHeading = 'letterHeading'  # such as "Monsters (B)"
+
+
+def styleKey(fontname, size, fragCount):
+    '''
+    Get the style key of a chunk whose first fragment has the fontname
+    and size and that has fragCount fragments.
+    '''
+    if fragCount < 1:
+        return (None, 0)
+    if size is not None:
+        size = round(size, styleDecimalPlaces)
+    return ((fontname, size), min(fragCount, 2))
+
+
+def chunkStyleKey(fragments):
+    '''
+    Get the style key of a chunk from its list of Fragment objects.
+    '''
+    if not fragments:
+        return (None, 0)
+    style = fragments[0].style
+    return styleKey(style.fontname, style.size, len(fragments))
+
+
+'''
+Each known SRD 5.1 style maps to the role of the chunk. A style added
+with startOnly=True only has to match the first fragment (like
+DocChunk.startStyle), otherwise the chunk must be only one fragment
+(like DocChunk.oneStyle). Other extractors can add to styleRoles using
+addStyleRole or use their own table with chunkRole.
+'''
+styleRoles = {}
+
+
+def addStyleRole(fontname, size, role, startOnly=False, table=None):
+    '''
+    Give chunks in a style a role (see chunkRole).
+
+    Sequential arguments:
+    fontname -- The fontname of the style.
+    size -- The font size (it is rounded to styleDecimalPlaces).
+    role -- The role, such as roleName or roleStat.
+
+    Keyword arguments:
+    startOnly -- Also give the role to a chunk with more than one
+        fragment if the first is in the style (like
+        DocChunk.startStyle). Otherwise only a chunk that is one
+        fragment in the style has the role (like DocChunk.oneStyle).
+    table -- The style table to add the role to (None for
+        styleRoles).
+    '''
+    if table is None:
+        table = styleRoles
+    table[styleKey(fontname, size, 1)] = role
+    if startOnly:
+        table[styleKey(fontname, size, 2)] = role
+
+
+def chunkRole(chunk, table=None):
+    '''
+    Get the role of the chunk from the style table (styleRoles by
+    default), or None if its style has no role.
+    '''
+    if table is None:
+        table = styleRoles
+    return table.get(chunk.styleKey)
+
+
+addStyleRole('WWROEK+Calibri-Bold', 16.139999999999986, roleName)
+addStyleRole('DXJJCX+GillSans-SemiBold', 16.60656, roleSubcategory)
+addStyleRole('WWROEK+Calibri-Bold', 13.234800000000064, roleStat,
+             startOnly=True)
+addStyleRole('DXJJCX+GillSans-SemiBold', 21.474000000000046,
+             roleLetterHeading, startOnly=True)
+
+
 def dictToChunk(chunkD):
     # return DocChunk.fromDict(chunkD)
     # ^ Commented so pageaggregator and hence pdfminer isn't required
@@ -337,16 +593,9 @@ def dictToChunk(chunkD):
         annotations=annotations,
     )
     chunk.pageN = chunkD['pageN']
-    # ^ The code below doesn't fix it since it is None not missing!
-
-    for k,v in chunkD.items():
-        if not hasattr(chunk, k):
-            # If not already handled above
-            setattr(chunk, k, v)
-    '''
-    chunk.fragments = chunkD['fragments']
-    chunk.annotations = chunkD['annotations']
-    '''
+    # ^ Set it explicitly since it is None not missing!
+    # Other keys are ignored since DocChunk uses __slots__ (every key
+    # written by toDict is handled above).
     return chunk
 
 
@@ -361,7 +610,8 @@ def ltannosDump(ltannos):
     result = "["
     delim = ""
     for ltanno in ltannos:
-        if isinstance(ltanno, dict):
+        if isinstance(ltanno, (dict, list, tuple)):
+            # such as an [offset, text] pair from the aggregator
             result += delim + json.dumps(ltanno)
         else:
             result += delim + ltannoDump(ltanno)
@@ -468,14 +718,23 @@ def splitNotInParens(s, delimiters=" \r\n\t", pairs=[('(', ')'),]):
     return results
 
 
-def processChunks(chunks):
-    global indent
-    monsterLetterHeadings = []
-    for letter in alphabetUpper:
-        monsterLetterHeadings.append("Monsters ({})".format(letter))
-    monster = None
-    monsters = []
-    statHeaders = ["STR", "CHA", "CON", "DEX", "WIS", "INT"]
+# The heading before the creatures of each letter in the Monsters
+# category (see srd.creaturesegments):
+monsterLetterHeadings = []
+for letter in alphabetUpper:
+    monsterLetterHeadings.append("Monsters ({})".format(letter))
+creatureTypes = ['Monster', 'Creature', 'NPC']
+
+
+def newCategoryMarks(state=None):
+    '''
+    Get a dict where each key is an expected category and the value has
+    the markers that start and end it, and the number of start and end
+    markers (startCount and endCount) found so far.
+
+    Keyword arguments:
+    state -- Continue from the counts in a state from categoryState.
+    '''
     categoryMarks = {  # expected categories
         'Monster': {
             'start': "Monsters (A)",  # frag font: 'DXJJCX+GillSans-SemiBold' 21.474000000000046
@@ -490,51 +749,154 @@ def processChunks(chunks):
             'end': ["5.1", "403"],
         },
     }
-    creatureTypes = ['Monster', 'Creature', 'NPC']
     for k,o in categoryMarks.items():
         o['startCount'] = 0
         o['endCount'] = 0
-    subcategory = None
-    context = None
-    prevChunk = None
+        if state is not None:
+            o['startCount'], o['endCount'] = state['counts'][k]
+    return categoryMarks
 
-    for chunk in chunks:
-        startIsComplete = False
-        endIsComplete = False
-        newContext = None
-        for tryContext,mk in categoryMarks.items():
-            if strCount(mk['end']) == 1:
-                if mk['end'] in chunk.text:
-                    endIsComplete = True
-                    mk['endCount'] += 1
-                    newContext = None
-                    context = None
+
+def categoryMarkerStrings(categoryMarks):
+    '''
+    Get a list of every start and end marker in categoryMarks.
+    '''
+    markerStrings = []
+    for k,o in categoryMarks.items():
+        for key in ['start', 'end']:
+            if strCount(o[key]) == 1:
+                markerStrings.append(o[key])
             else:
-                if mk['endCount'] < strCount(mk['end']):
-                    if mk['end'][mk['endCount']] in chunk.text:
-                        mk['endCount'] += 1
-                        if mk['endCount'] == strCount(mk['end']):
-                            endIsComplete = True
-                            newContext = None
-                            context = None
-            if endIsComplete:
-                if monster is not None:
-                    monsters.append(monster)
-                    monster = None
-            # Keep the cases separate since the start of one may be the
-            # same text box as the end of the previous one.
-            if strCount(mk['start']) == 1:
-                if mk['start'] in chunk.text:
-                    startIsComplete = True
+                markerStrings += o[key]
+    return markerStrings
+
+
+def categoryState(context, categoryMarks):
+    '''
+    Get the state of the category markers as a dict that can be pickled
+    (see newCategoryMarks and the state argument of iterCreatures).
+    '''
+    counts = {}
+    for k,o in categoryMarks.items():
+        counts[k] = [o['startCount'], o['endCount']]
+    return {'context': context, 'counts': counts}
+
+
+def markCategories(categoryMarks, hits):
+    '''
+    Count the category markers that are in hits (the markers found in
+    one chunk).
+
+    Returns:
+    A tuple of the category that the chunk starts (or None) and whether
+    the chunk completes the start or the end of a category.
+    '''
+    startIsComplete = False
+    endIsComplete = False
+    newContext = None
+    if len(hits) == 0:
+        # No marker can change the state of any category.
+        return newContext, startIsComplete, endIsComplete
+    for tryContext,mk in categoryMarks.items():
+        if strCount(mk['end']) == 1:
+            if mk['end'] in hits:
+                endIsComplete = True
+                mk['endCount'] += 1
+                newContext = None
+        else:
+            if mk['endCount'] < strCount(mk['end']):
+                if mk['end'][mk['endCount']] in hits:
+                    mk['endCount'] += 1
+                    if mk['endCount'] == strCount(mk['end']):
+                        endIsComplete = True
+                        newContext = None
+        # Keep the cases separate since the start of one may be the
+        # same text box as the end of the previous one.
+        if strCount(mk['start']) == 1:
+            if mk['start'] in hits:
+                startIsComplete = True
+                mk['startCount'] += 1
+                newContext = tryContext
+        else:
+            if mk['startCount'] < strCount(mk['start']):
+                if mk['start'][mk['startCount']] in hits:
                     mk['startCount'] += 1
-                    newContext = tryContext
-            else:
-                if mk['startCount'] < strCount(mk['start']):
-                    if mk['start'][mk['startCount']] in chunk.text:
-                        mk['startCount'] += 1
-                        if mk['startCount'] == strCount(mk['start']):
-                            startIsComplete = True
-                            newContext = tryContext
+                    if mk['startCount'] == strCount(mk['start']):
+                        startIsComplete = True
+                        newContext = tryContext
+    return newContext, startIsComplete, endIsComplete
+
+
+class CreatureParser:
+    '''
+    Find creatures in chunks given one at a time in document order. All
+    of the state of a parse is in the object, so several documents can
+    be parsed in the same process (or in threads) by using one
+    CreatureParser for each:
+
+    parser = CreatureParser()
+    for chunk in chunks:
+        for monster in parser.feed(chunk):
+            ...
+    for monster in parser.finish():
+        ...
+    '''
+    def __init__(self, diagnostics=None, state=None):
+        '''
+        Keyword arguments:
+        diagnostics -- The Diagnostics object that receives progress and
+            warnings (None for diag). Details about each fragment are
+            only reported at the DEBUG level.
+        state -- Start with this category state (from categoryState)
+            instead of before any category, such as to continue from the
+            start of a segment (see srd.creaturesegments).
+        '''
+        self.log = diagnostics
+        if self.log is None:
+            self.log = diag
+        self.monster = None
+        self.categoryMarks = newCategoryMarks(state=state)
+        markerStrings = list(subcatEndStrings.values())
+        markerStrings += categoryMarkerStrings(self.categoryMarks)
+        # Find every marker in a chunk with one scan (see srd.markers):
+        self.matcher = MarkerMatcher(markerStrings)
+        self.subcategory = None
+        self.context = None
+        if state is not None:
+            self.context = state['context']
+        self.indent = ""
+
+    def state(self):
+        '''
+        Get the category state (see categoryState) after the chunks fed
+        so far.
+        '''
+        return categoryState(self.context, self.categoryMarks)
+
+    def feed(self, chunk):
+        '''
+        Parse the next chunk.
+
+        Returns:
+        A list of the creatures (each a dict with 'CR' as a float, see
+        parseChallenge) that the chunk ends, usually empty.
+        '''
+        log = self.log
+        matcher = self.matcher
+        categoryMarks = self.categoryMarks
+        monster = self.monster
+        subcategory = self.subcategory
+        context = self.context
+        indent = self.indent
+        done = []
+        hits = matcher.findAll(chunk.text)
+        newContext, startIsComplete, endIsComplete = \
+            markCategories(categoryMarks, hits)
+        if endIsComplete:
+            context = None
+            if monster is not None:
+                done.append(parseChallenge(monster, log))
+                monster = None
 
         if newContext is not None:
             if context is not None:
@@ -548,15 +910,17 @@ def processChunks(chunks):
                 if context is not None:
                     context = None
                     indent = "  "
-                    pdent("End of {} was inferred from {}"
-                          "".format(newContext, chunkDump(chunk)))
+                    log.info('category', "End of {} was inferred from {}",
+                             newContext, lazy(chunkDump, chunk),
+                             indent=indent)
                     indent = ""
-                    pdent("Section: \"{}\"".format(chunk.text))
+                    log.info('category', "Section: \"{}\"", chunk.text,
+                             indent=indent)
                     '''
                     for frag in chunk.fragments:
-                        pdent("- \"{}\"".format(frag['text']))
+                        pdent("- \"{}\"".format(frag.text))
                         pdent("  font: '{}' {}"
-                              "".format(frag['fontname'], frag['size']))
+                              "".format(frag.fontname, frag.size))
                     '''
             # Keep the cases separate since the start of one can mark
             # the end of another.
@@ -565,13 +929,14 @@ def processChunks(chunks):
                 if context != newContext:
                     context = newContext
                     indent = ""
-                    pdent("Category '{}' was inferred from {}"
-                          "".format(newContext, chunkDump(chunk)))
+                    log.info('category', "Category '{}' was inferred from {}",
+                             newContext, lazy(chunkDump, chunk),
+                             indent=indent)
                     '''
                     for frag in chunk.fragments:
-                        pdent("- \"{}\"".format(frag['text']))
+                        pdent("- \"{}\"".format(frag.text))
                         pdent("  font: '{}' {}"
-                              "".format(frag['fontname'], frag['size']))
+                              "".format(frag.fontname, frag.size))
                     '''
 
         isOneFrag = len(chunk.fragments) == 1
@@ -580,40 +945,24 @@ def processChunks(chunks):
         if isOneFrag:
             oneFrag = chunk.fragments[0]
 
-        # Known SRD 5.1 styles are represented by the params of
-        # the oneStyle and startStyle calls below.
+        # Known SRD 5.1 styles are in styleRoles.
+        role = chunkRole(chunk)
 
-        NameHeader = 'ClassName'  # a.k.a. Name, such as "Spy"
-        ContextHeader = 'Category'
-        SubCategoryHeader = 'Subcategory'
         prevStatName = None
         if context in creatureTypes:
             subContext = None
-            for endSC, ender in subcatEndStrings.items():
+            ender = subcatEndStrings.get(subcategory)
+            if ender is not None:
                 '''
                 See the comment at the subcatEndStrings declaration for
-                why this loop exists.
-                '''
-                if endSC != subcategory:
-                    if ender in chunk.text:
-                        creatureMsg = ""
-                        if monster is not None:
-                            creatureMsg = " for " + monster[NameHeader]
-                        '''
-                        pdent("Not ending Subcategory since {}"
-                              " was found{} but in {} not {}"
-                              "".format(ender, creatureMsg, subcategory,
-                                        endSC))
-                        '''
-                    continue
-                '''
-                pdent("Checking for subcategory ender {} in {}"
-                      "".format(ender, chunk.text))
+                why this check exists (Only the ender of the current
+                subcategory matters).
                 '''
                 indent = "  "
-                if ender in chunk.text:
-                    pdent("End Subcategory since {} was found in {}"
-                          "".format(ender, subcategory))
+                if ender in hits:
+                    log.info('subcategory',
+                             "End Subcategory since {} was found in {}",
+                             ender, subcategory, indent=indent)
                     if monster is not None:
                         monster[SubCategoryHeader] = None
                         '''
@@ -628,7 +977,7 @@ def processChunks(chunks):
                 # font: 'LUFRKP+Calibri' 13.116719999999987
                 if monster is not None:
                     if statName == "INT":
-                        pdent("- found stats")
+                        log.debug('stat', "- found stats", indent=indent)
                         parts = chunk.text.split()
                         if len(parts) != 12:
                             raise ValueError("Expected 12 parts"
@@ -647,19 +996,19 @@ def processChunks(chunks):
                         # Do nothing for each header (Wait for next row)
                         pass
                     else:
-                        pdent("- found \"{}\"".format(statName))
+                        log.debug('stat', "- found \"{}\"", statName,
+                                  indent=indent)
                         monster[statName] = chunk.text
                 else:
-                    pdent("WARNING: A stat was not under a monster in"
-                          " \"{}\"".format(chunk.text))
+                    log.warning('stat', "WARNING: A stat was not under a"
+                                " monster in \"{}\"", chunk.text,
+                                indent=indent)
                 prevStatName = statName
                 statName = None
-            elif chunk.oneStyle('WWROEK+Calibri-Bold', 16.1399):
-                # ^ Actually 16.139999999999986, but take advantage of
-                #   oneStyle's default rounding.
+            elif role == roleName:
                 # ClassName (Creature, NPC, or Monster name):
                 if monster is not None:
-                    monsters.append(monster)
+                    done.append(parseChallenge(monster, log))
                 if chunk.pageN in subcatEndPages:
                     subcategory = None
                 monster = {
@@ -670,89 +1019,99 @@ def processChunks(chunks):
                 }
                 subContext = NameHeader
                 indent = "    "
-                pdent("Name {}:".format(monster[NameHeader].strip()))
-            elif (chunk.oneStyle('DXJJCX+GillSans-SemiBold', 16.60656)
+                log.info('name', "Name {}:", monster[NameHeader].strip(),
+                         indent=indent)
+            elif ((role == roleSubcategory)
                   and (chunk.pageN not in nonSubcategoryPages)):
                 '''
                 NOTE: A monster can end with a category name,
                 subcategory name (this case), or heading equivalent to
                 subcategory (below), so see all instances of
-                monsters.append for other examples of creature endings.
+                the yields for other examples of creature endings.
                 '''
                 # Monster type subsection
                 if monster is not None:
-                    monsters.append(monster)
+                    done.append(parseChallenge(monster, log))
                     monster = None
                 indent = "  "
                 if chunk.pageN not in nonSubcategoryPages:
-                    pdent("Subcategory {}.{}"
-                          "".format(context, chunkDump(chunk)))
-                    for frag in chunk.fragments:
-                        pdent("- \"{}\"".format(frag['text']))
-                        pdent("  font: '{}' {}"
-                              "".format(frag['fontname'], frag['size']))
+                    log.info('subcategory', "Subcategory {}.{}",
+                             context, lazy(chunkDump, chunk), indent=indent)
+                    if log.enabled(DEBUG):
+                        for frag in chunk.fragments:
+                            log.debug('subcategory', "- \"{}\"", frag.text,
+                                      indent=indent)
+                            log.debug('subcategory', "  font: '{}' {}",
+                                      frag.fontname, frag.size,
+                                      indent=indent)
                     monster = None
                     subcategory = chunk.text
-            elif chunk.oneStyle('DXJJCX+GillSans-SemiBold', 16.60656):
+            elif role == roleSubcategory:
                 '''
                 It is in nonSubcategoryPages (because the previous
                 elif wasn't the case) so end the previous
                 subcategory without starting a new one.
                 '''
                 if monster is not None:
-                    monsters.append(monster)
+                    done.append(parseChallenge(monster, log))
                     monster = None
                 subcategory = None
-            elif chunk.startStyle('WWROEK+Calibri-Bold', 13.2348):
-                # 13.234800000000064
+            elif role == roleStat:
                 # Stat
                 if monster is None:
-                    pdent("Unknown stat: \"{}\"".format(chunk.text))
-                    pdent("  len(fragments): {}"
-                          "".format(len(chunk.fragments)))
-                    for frag in chunk.fragments:
-                        pdent("  - unknown fragment \"{}\""
-                              "".format(frag['text']))
-                        pdent("    font: '{}' {}"
-                              "".format(frag['fontname'], frag['size']))
+                    log.warning('unknown', "Unknown stat: \"{}\"",
+                                chunk.text, indent=indent)
+                    if log.enabled(DEBUG):
+                        log.debug('unknown', "  len(fragments): {}",
+                                  len(chunk.fragments), indent=indent)
+                        for frag in chunk.fragments:
+                            log.debug('unknown',
+                                      "  - unknown fragment \"{}\"",
+                                      frag.text, indent=indent)
+                            log.debug('unknown', "    font: '{}' {}",
+                                      frag.fontname, frag.size,
+                                      indent=indent)
                 else:
-                    statName = chunk.fragments[0]['text']
+                    statName = chunk.fragments[0].text
                     if len(chunk.fragments) == 2:
-                        monster[statName] = chunk.fragments[1]['text']
+                        monster[statName] = chunk.fragments[1].text
                     else:
                         # statName = chunk.text
-                        pdent("Unparsed stat: \"{}\""
-                              "".format(chunk.text))
-                        pdent("  len(fragments): {}"
-                              "".format(len(chunk.fragments)))
-                        for frag in chunk.fragments:
-                            pdent("  - unknown fragment \"{}\""
-                                  "".format(frag['text']))
-                            pdent("    font: '{}' {}"
-                                  "".format(frag['fontname'],
-                                            frag['size']))
-            elif chunk.startStyle('DXJJCX+GillSans-SemiBold', 21.4740):
+                        log.warning('unknown', "Unparsed stat: \"{}\"",
+                                    chunk.text, indent=indent)
+                        if log.enabled(DEBUG):
+                            log.debug('unknown', "  len(fragments): {}",
+                                      len(chunk.fragments), indent=indent)
+                            for frag in chunk.fragments:
+                                log.debug('unknown',
+                                          "  - unknown fragment \"{}\"",
+                                          frag.text, indent=indent)
+                                log.debug('unknown', "    font: '{}' {}",
+                                          frag.fontname, frag.size,
+                                          indent=indent)
+            elif role == roleLetterHeading:
                 # such as "Monsters (B)"
                 if monster is not None:
-                    monsters.append(monster)
+                    done.append(parseChallenge(monster, log))
                     monster = None
                 indent = ""
                 subcategory = None
             elif monster is not None:
-                pdent("Unknown chunk after {}: \"{}\""
-                      "".format(prevStatName, chunk.text))
-                pdent("  len(fragments): {}"
-                      "".format(len(chunk.fragments)))
-                for frag in chunk.fragments:
+                log.info('unknown', "Unknown chunk after {}: \"{}\"",
+                         prevStatName, chunk.text, indent=indent)
+                if log.enabled(DEBUG):
+                    log.debug('unknown', "  len(fragments): {}",
+                              len(chunk.fragments), indent=indent)
                     appendMsg = ""
                     if prevStatName is not None:
-                        monster[NameHeader]
                         appendMsg = (" appended to {}"
                                      "".format(monster[NameHeader]))
-                    pdent("  - unknown fragment \"{}\"{}"
-                          "".format(frag['text'], appendMsg))
-                    pdent("    font: '{}' {}"
-                          "".format(frag['fontname'], frag['size']))
+                    for frag in chunk.fragments:
+                        log.debug('unknown',
+                                  "  - unknown fragment \"{}\"{}",
+                                  frag.text, appendMsg, indent=indent)
+                        log.debug('unknown', "    font: '{}' {}",
+                                  frag.fontname, frag.size, indent=indent)
                 prevStatName = None
 
             if chunk.text == "Ghost":
@@ -762,78 +1121,279 @@ def processChunks(chunks):
                 append this creature.
                 '''
                 if subContext != NameHeader:
-                    pdent("Found undetected creature: {}"
-                          "".format(chunkDump(chunk)))
-        prevChunk = chunk
-
-    if monster is not None:
-        monsters.append(monster)
-    jsonName = 'creatures.json'
-    jsonPath = os.path.join(dataPath, jsonName)
-    for monster in monsters:
-        crxp = monster.get('Challenge')
-        if crxp is not None:
-            parts = splitNotInParens(crxp)
-            try:
-                monster['CR'] = fractionToFloat(parts[0])
-                XPs = noParens(parts[1])
-            except IndexError as ex:
-                print("splitNotInParens didn't split \"{}\" in two"
-                      " (a string formatted like \"# (# XP)\""
-                      " was expected)"
-                      "".format(crxp))
-                raise ex
+                    log.warning('name', "Found undetected creature: {}",
+                                lazy(chunkDump, chunk), indent=indent)
+
+        self.monster = monster
+        self.subcategory = subcategory
+        self.context = context
+        self.indent = indent
+        return done
+
+    def finish(self):
+        '''
+        End the parse (after the last chunk).
+
+        Returns:
+        A list with the last creature if it didn't end yet.
+        '''
+        done = []
+        if self.monster is not None:
+            done.append(parseChallenge(self.monster, self.log))
+            self.monster = None
+        return done
+
+
+def iterCreatures(chunks, diagnostics=None, state=None):
+    '''
+    Yield each creature (a dict with 'CR' as a float, see
+    parseChallenge) as soon as the chunk that ends it arrives, so only
+    one creature is kept in memory at a time. The chunks can be any
+    iterable in document order (such as a generator of the chunks of
+    each page as it is read). See CreatureParser for the keyword
+    arguments.
+    '''
+    parser = CreatureParser(diagnostics=diagnostics, state=state)
+    for chunk in chunks:
+        for monster in parser.feed(chunk):
+            yield monster
+    for monster in parser.finish():
+        yield monster
+
+
+def parseChallenge(monster, diagnostics=None):
+    '''
+    Set 'CR' (as a float) and 'XP' of the creature from its Challenge
+    stat, or set both to -1 if it has none.
+
+    Returns:
+    The same monster dict.
+    '''
+    log = diagnostics
+    if log is None:
+        log = diag
+    crxp = monster.get('Challenge')
+    if crxp is not None:
+        parts = splitNotInParens(crxp)
+        try:
+            monster['CR'] = fractionToFloat(parts[0])
+            XPs = noParens(parts[1])
+        except IndexError as ex:
+            log.flush()
+            prerr("splitNotInParens didn't split \"{}\" in two"
+                  " (a string formatted like \"# (# XP)\""
+                  " was expected)"
+                  "".format(crxp))
+            raise ex
+        try:
+            pair = unitStrToPair(XPs)
+        except Exception as ex:
+            log.flush()
+            prerr("Couldn't finish parsing \"{}\" in \"{}\""
+                  " (expected a string formatted like"
+                  " \"# XP\" after # [CR] in \"{}\")"
+                  "".format(XPs, parts[1], crxp))
+            raise ex
+        if (pair[0] is None) or (pair[1] != 'XP'):
+            raise ValueError("A string in the format \"(# XP)\" was"
+                             " expected after # [CR] in Challenge,"
+                             " but instead there was \"{}\""
+                             " resulting in {}"
+                             "".format(parts[1], pair))
+        monster['XP'] = pair[0]
+    else:
+        monster['CR'] = -1
+        monster['XP'] = -1
+        log.warning('challenge', "WARNING: {} \"{}\" is missing"
+                    " 'Challenge'", monster.get(ContextHeader),
+                    monster.get(NameHeader))
+    return monster
+
+
+# Change this whenever iterCreatures finds different creatures in the
+# same chunks (other than by a change to a table in ruleTables) so that
+# srd.buildgraph knows that creatures.json is out of date.
+creatureRulesVersion = 1
+
+
+def ruleTables():
+    '''
+    Get every table that changes which creatures are found in the
+    chunks, as simple types (such as for srd.buildgraph to tell whether
+    they changed since creatures.json was written).
+    '''
+    roles = []
+    for ((fontname, size), fragCount), role in styleRoles.items():
+        roles.append([fontname, size, fragCount, role])
+    marks = {}
+    for name, mark in newCategoryMarks().items():
+        marks[name] = [mark['start'], mark['end']]
+    return {
+        'creatureRulesVersion': creatureRulesVersion,
+        'styleDecimalPlaces': styleDecimalPlaces,
+        'styleRoles': sorted(roles),
+        'categoryMarks': marks,
+        'monsterLetterHeadings': monsterLetterHeadings,
+        'subcatEndStrings': subcatEndStrings,
+        'subcatEndPages': subcatEndPages,
+        'nonSubcategoryPages': nonSubcategoryPages,
+        'statHeaders': statHeaders,
+        'creatureHeaders': creatureHeaders,
+    }
+
+
+def processChunks(chunks, diagnostics=None, stream=False, profiler=None,
+                  sqlitePath=None, workers=1, outputPath=None,
+                  sortByCR=None):
+    '''
+    Find the creatures in the chunks and write creatures.json,
+    creatures.ndjson and creatures.csv to dataPath (or outputPath), all
+    in one pass (see srd.creaturewriter).
+
+    Keyword arguments:
+    diagnostics -- The Diagnostics object that receives progress and
+        warnings (None for diag).
+    stream -- Write each creature as soon as it ends instead of sorting
+        by CR (unless sortByCR is True), so the chunks can be a
+        generator (such as of pages being read) and only one creature
+        is in memory at a time.
+    profiler -- Time the "processChunks" and "writeCreatures" stages
+        (see srd.profiling).
+    sqlitePath -- Also write the chunks and creatures to this SQLite
+        database (such as databasePath; see srd.creaturedb).
+    workers -- Find creatures in this many processes (None for
+        os.cpu_count(); see srd.creaturesegments). The result is the
+        same as with 1. Only 1 is used if stream is True.
+    outputPath -- The directory for the creature files (None for
+        dataPath).
+    sortByCR -- Sort the creatures by CR (None to sort unless stream
+        is True). Only srd.creaturewriter.sortRunSize creatures are
+        sorted in memory at once (see
+        srd.creaturewriter.sortCreatures).
+
+    Returns:
+    The number of creatures written.
+    '''
+    from srd.creaturewriter import (
+        CreatureWriter,
+        sortCreatures,
+    )
+    from srd.creaturedb import CreatureDatabase
+    from srd.creaturesegments import iterCreaturesParallel
+    log = diagnostics
+    if log is None:
+        log = diag
+    if profiler is None:
+        profiler = nullProfiler
+    if outputPath is None:
+        outputPath = dataPath
+    if sortByCR is None:
+        sortByCR = not stream
+    jsonPath = os.path.join(outputPath, 'creatures.json')
+    ndjsonPath = os.path.join(outputPath, 'creatures.ndjson')
+    csvPath = os.path.join(outputPath, 'creatures.csv')
+    sinks = []
+    if sqlitePath is not None:
+        database = CreatureDatabase(sqlitePath)
+        sinks.append(database)
+        if stream or (workers == 1):
+            chunks = database.iterAddingChunks(chunks)
+        else:
+            # Add them first so a ColumnarChunks store stays one (its
+            # views can't be sent to the workers).
+            if iter(chunks) is chunks:
+                chunks = list(chunks)
             try:
-                pair = unitStrToPair(XPs)
-            except Exception as ex:
-                print("Couldn't finish parsing \"{}\" in \"{}\""
-                      " (expected a string formatted like"
-                      " \"# XP\" after # [CR] in \"{}\")"
-                      "".format(XPs, parts[1], crxp))
-                raise ex
-            if (pair[0] is None) or (pair[1] != 'XP'):
-                raise ValueError("A string in the format \"(# XP)\" was"
-                                 " expected after # [CR] in Challenge,"
-                                 " but instead there was \"{}\""
-                                 " resulting in {}"
-                                 "".format(parts[1], pair))
-            monster['XP'] = pair[0]
+                for chunk in chunks:
+                    database.addChunk(chunk)
+            except BaseException:
+                database.close(finish=False)
+                raise
+    with profiler.stage("processChunks"):
+        if stream or (workers == 1):
+            monsters = iterCreatures(chunks, diagnostics=log)
         else:
-            monster['CR'] = -1
-            monster['XP'] = -1
-            print("WARNING: {} \"{}\" is missing 'Challenge'"
-                  "".format(monster.get(ContextHeader),
-                            monster.get(NameHeader)))
-    monsters = sorted(monsters, key = lambda o: o['CR'])
-    for monster in monsters:
-        monster['CR'] = floatToFraction(monster['CR'])
-    for monster in monsters:
-        assertPlainDict(monster)
-    with open(jsonPath, 'w') as outs:
-        json.dump(monsters, outs, indent=2)  # sort_keys=True)
-        # If there are errors, ensure only simple types not classes are
-        # stored in the object.
-    print("* wrote \"{}\"".format(jsonPath))
-    tableHeaders = [NameHeader, "CR", "XP", "Languages", ContextHeader,
-                    SubCategoryHeader, "Armor Class", "pageN",
-                    "Hit Points", "Saving Throws", "Speed", "Skills",
-                    "Senses"]
-    tableHeaders += statHeaders
-    csvName = 'creatures.csv'
-    csvPath = os.path.join(dataPath, csvName)
-    with open(csvPath, 'w') as outs:
-        writer = csv.writer(outs)
-        writer.writerow(tableHeaders)
-        for monster in monsters:
-            row = []
-            for header in tableHeaders:
-                got = monster.get(header)
-                row.append(got)
-            writer.writerow(row)
-    print("* wrote \"{}\"".format(csvPath))
-
-
-def main():
+            monsters = iterCreaturesParallel(chunks, diagnostics=log,
+                                             workers=workers)
+        if sortByCR:
+            monsters = sortCreatures(monsters)
+        with CreatureWriter(jsonPath=jsonPath, ndjsonPath=ndjsonPath,
+                            csvPath=csvPath, sinks=sinks) as writer:
+            for monster in monsters:
+                with profiler.stage("writeCreatures"):
+                    writer.write(monster)
+    log.info('output', "* wrote \"{}\"", jsonPath)
+    log.info('output', "* wrote \"{}\"", ndjsonPath)
+    log.info('output', "* wrote \"{}\"", csvPath)
+    if sqlitePath is not None:
+        log.info('output', "* wrote \"{}\"", sqlitePath)
+    log.flush()
+    return writer.count
+
+
+def selectionPath(labels=None, sections=None):
+    '''
+    Get the directory for the creatures of a run of main that only
+    processes some pages, named after the selection (such as
+    "data/selections/pages-281-394").
+    '''
+    parts = []
+    if labels is not None:
+        parts.append("pages-" + labels)
+    if sections is not None:
+        parts.append("sections-" + "-".join(sections))
+    name = re.sub(r"[^A-Za-z0-9.-]+", "_", "_".join(parts)).strip("_")
+    return os.path.join(dataPath, "selections", name)
+
+
+def main(workers=None, diagnostics=None, stream=False, labels=None,
+         sections=None, profiler=None, colStarts=None, sqlitePath=None,
+         force=False, outputPath=None):
+    '''
+    Keyword arguments:
+    workers -- The number of processes to use for generating chunks
+        if no chunk list exists yet, and for finding creatures (None
+        for os.cpu_count()).
+    diagnostics -- The Diagnostics object for processChunks (None for
+        diag).
+    stream -- If no chunk list exists yet, process each page as soon as
+        it is read (while saving it) instead of after the whole PDF is
+        read, and write creatures in document order instead of by CR
+        (see processChunks).
+    labels -- Only process the pages with these printed page labels,
+        such as "281-394" (see srd.pageselect.parsePageSpec).
+    sections -- Only process the pages of the outline sections that
+        start with these titles, such as ["Monsters", "Appendix MM"].
+        Pages chosen by labels or sections are read from the PDF (or
+        the page cache) and are not saved to the chunk list, and the
+        creatures are written to outputPath.
+    profiler -- Time each stage and show a summary at the end (see
+        srd.profiling.Profiler).
+    colStarts -- The x coordinate where each column starts, or "auto"
+        to detect them (None for srdColStarts).
+    sqlitePath -- Also write the chunks and creatures to this SQLite
+        database (such as databasePath; see processChunks).
+    force -- Read the PDF and find creatures again even if nothing
+        changed. Otherwise, the chunk list is only made again if the PDF
+        or the chunk settings changed since it was made, and creatures
+        are only found again if the chunk list or the rule tables
+        changed (see srd.buildgraph).
+    outputPath -- Where to write the creatures of a labels or sections
+        run (None for selectionPath(labels, sections)). It can't be
+        dataPath (nor can sqlitePath be databasePath) so that part of
+        the creatures never replaces the full outputs.
+    '''
+    if colStarts is None:
+        colStarts = srdColStarts
+
+    def finish():
+        prerr("* done processing chunks.")
+        if profiler is not None:
+            prerr(profiler.report())
+
+    stages = profiler
+    if stages is None:
+        stages = nullProfiler
     srcName = "SRD-OGL_V5.1.pdf"
     srcPath = os.path.join(profile, "Nextcloud", "Tabletop",
                            "Campaigns", "publishing", srcName)
@@ -845,14 +1405,101 @@ def main():
               " run this from that directory."
               "".format(srcPath))
 
+    from srd.chunkstore import (
+        iterChunkDicts,
+        iterPageChunks,
+        iterSavingChunkPages,
+        saveChunkPages,
+    )
+    from srd.chunkcolumns import (
+        ColumnarChunks,
+        writeColumnarChunks,
+        noValue,
+    )
+    if (labels is not None) or (sections is not None):
+        from srd.pageselect import selectPages
+        from srd.pagechunker import iterChunkPages
+        if outputPath is None:
+            outputPath = selectionPath(labels=labels, sections=sections)
+        if os.path.realpath(outputPath) == os.path.realpath(dataPath):
+            raise ValueError("The creatures of chosen pages can't replace"
+                             " the full ones in \"{}\"."
+                             "".format(dataPath))
+        if ((sqlitePath is not None) and (os.path.realpath(sqlitePath)
+                                          == os.path.realpath(databasePath))):
+            raise ValueError("The creatures of chosen pages can't replace"
+                             " the full database \"{}\"."
+                             "".format(databasePath))
+        if not os.path.isdir(outputPath):
+            os.makedirs(outputPath)
+        pageIndices = selectPages(srcPath, labels=labels,
+                                  sections=sections)
+        prerr("* processing {} chosen pages of \"{}\"..."
+              "".format(len(pageIndices), srcPath))
+        pages = iterChunkPages(
+            srcPath,
+            colStarts=colStarts,
+            workers=workers,
+            cacheDir=pageCachePath,
+            captureAnnotations=False,
+            pageIndices=pageIndices,
+            profiler=profiler,
+        )
+        processChunks(iterPageChunks(pages), diagnostics=diagnostics,
+                      stream=stream, profiler=profiler,
+                      sqlitePath=sqlitePath, workers=workers,
+                      outputPath=outputPath)
+        finish()
+        return
+    from srd.buildgraph import (
+        BuildGraph,
+        chunkRulesDigest,
+        creatureRulesDigest,
+    )
+    graph = BuildGraph(buildStatePath)
+    chunkInputs = None
+    rebuildChunks = False
+    if os.path.isfile(srcPath):
+        chunkInputs = {
+            'pdf': graph.fileDigest(srcPath),
+            'rules': chunkRulesDigest(colStarts),
+        }
+        reason = graph.staleReason('chunks', chunkInputs, [chunksNdjsonPath])
+        if force:
+            rebuildChunks = True
+        elif graph.has('chunks') and (reason is not None):
+            # A chunk list with no record (from before build records)
+            # is used as it is, the same as before.
+            prerr("* The chunk list is out of date ({}), so \"{}\" will"
+                  " be read again.".format(reason, srcPath))
+            rebuildChunks = True
+    if rebuildChunks and os.path.isfile(chunksColumnarPath):
+        # Don't leave the old store to be loaded if the new chunk list
+        # isn't converted (such as in stream mode or after an error).
+        os.remove(chunksColumnarPath)
+    haveColumnar = os.path.isfile(chunksColumnarPath) and not rebuildChunks
+    if haveColumnar and graph.has('chunks'):
+        # Only use a store made from the recorded chunk list (a store
+        # made before build records is used as it is).
+        haveColumnar = graph.isRecordedOutput('chunks', chunksColumnarPath)
+    haveNdjson = os.path.isfile(chunksNdjsonPath) and not rebuildChunks
+    haveLegacy = os.path.isfile(chunksPath) and not rebuildChunks
     chunks = None
-    if os.path.isfile(chunksPath):
+    if haveColumnar:
+        prerr("* The chunk list \"{}\" was already created,"
+              " so reading \"{}\" will be skipped."
+              "".format(chunksColumnarPath, srcPath))
+    elif haveNdjson:
+        prerr("* The chunk list \"{}\" was already created,"
+              " so reading \"{}\" will be skipped."
+              "".format(chunksNdjsonPath, srcPath))
+    elif haveLegacy:
         prerr("* The chunk list \"{}\" was already created,"
               " so reading \"{}\" will be skipped if the list is ok."
               "".format(chunksPath, srcPath))
         prerr("  * loading \"{}\"".format(chunksPath))
         try:
-            with open(chunksPath, 'r') as ins:
+            with stages.stage("loadChunks"), open(chunksPath, 'r') as ins:
                 chunks = json.load(ins)
         except json.decoder.JSONDecodeError as ex:
             prerr(str(ex))
@@ -860,52 +1507,96 @@ def main():
             os.remove(chunksPath)
             chunks = None
         if chunks is not None:
-            for i in range(len(chunks)):
-                chunk = chunks[i]
-                chunks[i] = dictToChunk(chunk)
-                if chunk['pageN'] != chunks[i].pageN:
-                    raise RuntimeError("dictToChunk lost pageN.")
-                if chunks[i].pageN is None:
-                    raise RuntimeError("dictToChunk received no pageN.")
+            with stages.stage("dictToChunk"):
+                for i in range(len(chunks)):
+                    chunk = chunks[i]
+                    chunks[i] = dictToChunk(chunk)
+                    if chunk['pageN'] != chunks[i].pageN:
+                        raise RuntimeError("dictToChunk lost pageN.")
+                    if chunks[i].pageN is None:
+                        raise RuntimeError("dictToChunk received no"
+                                           " pageN.")
+    jsonPath = os.path.join(dataPath, 'creatures.json')
+    csvPath = os.path.join(dataPath, 'creatures.csv')
+    creatureOutputs = [jsonPath, os.path.join(dataPath, 'creatures.ndjson'),
+                       csvPath]
+    if sqlitePath is not None:
+        creatureOutputs.append(sqlitePath)
+
+    def creatureInputs(chunkSource):
+        return {
+            'chunks': graph.fileDigest(chunkSource),
+            'rules': creatureRulesDigest(),
+            'stream': stream,
+            'sqlitePath': sqlitePath,
+        }
+
+    if (chunks is None) and not haveColumnar:
+        if not haveNdjson:
+            from srd.pagechunker import iterChunkPages
+            pages = iterChunkPages(
+                srcPath,
+                colStarts=colStarts,
+                workers=workers,
+                cacheDir=pageCachePath,
+                captureAnnotations=False,
+                # ^ processChunks doesn't use annotations.
+                profiler=profiler,
+            )
+            if stream:
+                prerr("* processing chunks while saving \"{}\"..."
+                      "".format(chunksNdjsonPath))
+                processChunks(
+                    iterPageChunks(iterSavingChunkPages(
+                        pages, chunksNdjsonPath, profiler=profiler)),
+                    diagnostics=diagnostics,
+                    stream=True,
+                    profiler=profiler,
+                    sqlitePath=sqlitePath,
+                )
+                if chunkInputs is not None:
+                    graph.record('chunks', chunkInputs, [chunksNdjsonPath])
+                graph.record('creatures', creatureInputs(chunksNdjsonPath),
+                             creatureOutputs)
+                finish()
+                return
+            prerr("  * saving \"{}\" page by page..."
+                  "".format(chunksNdjsonPath))
+            count = saveChunkPages(pages, chunksNdjsonPath,
+                                   profiler=profiler)
+            prerr("  * saved {} chunks".format(count))
+        prerr("  * saving \"{}\"".format(chunksColumnarPath))
+        with stages.stage("saveColumnar"):
+            writeColumnarChunks(iterChunkDicts(chunksNdjsonPath),
+                                chunksColumnarPath)
+        if chunkInputs is not None:
+            graph.record('chunks', chunkInputs,
+                         [chunksNdjsonPath, chunksColumnarPath])
+    chunkSource = chunksColumnarPath
+    if chunks is not None:
+        chunkSource = chunksPath
+    inputs = creatureInputs(chunkSource)
+    reason = graph.staleReason('creatures', inputs, creatureOutputs)
+    if (reason is None) and not force:
+        prerr("* \"{}\" is up to date, so finding creatures will be"
+              " skipped.".format(jsonPath))
+        if graph.changed:
+            graph.save()
+        finish()
+        return
     if chunks is None:
-        from srd.pagechunker import generateChunks
-        chunks = generateChunks(
-            srcPath,
-            pageid=None,
-            colStarts=[57.6, 328.56],
-            max_pageid=1694,
-        )
-        for i in range(len(chunks)):
-            chunk = chunks[i]
-            chunks[i] = chunkToDict(chunk)
-            if chunks[i]['pageN'] != chunks[i].pageN:
-                raise RuntimeError("chunkToDict lost pageN.")
-            if chunk.pageN is None:
-                raise RuntimeError("chunkToDict received no pageN.")
-        # pre-save test:
-        for chunk in chunks:
-            print("* testing conversion of chunk {}"
-                  "".format(chunkDump(chunk)))
-            jsonStr = json.dumps(chunk)
-        sys.stderr.write("  * saving \"{}\"...".format(chunksPath))
-        sys.stderr.flush()
-        with open(chunksPath, 'w') as outs:
-            json.dump(chunks, outs, indent=2)
-        sys.stderr.write("OK\n")
-        sys.stderr.flush()
-        for i in range(len(chunks)):
-            chunk = chunks[i]
-            # It is a dict now whether saved or loaded due to use in
-            # json save or load.
-            chunks[i] = dictToChunk(chunk)
-            if chunk['pageN'] != chunks[i].pageN:
-                raise RuntimeError("dictToChunk lost pageN.")
-            if chunks[i].pageN is None:
-                raise RuntimeError("dictToChunk received no pageN.")
-
-    prerr("* processing chunks...")
-    processChunks(chunks)
-    prerr("* done processing chunks.")
+        with stages.stage("loadChunks"):
+            chunks = ColumnarChunks(chunksColumnarPath)
+            if noValue in chunks.pageNs:
+                raise RuntimeError("\"{}\" has a chunk with no pageN."
+                                   "".format(chunksColumnarPath))
+
+    prerr("* processing chunks ({})...".format(reason or "forced"))
+    processChunks(chunks, diagnostics=diagnostics, stream=stream,
+                  profiler=profiler, sqlitePath=sqlitePath,
+                  workers=workers)
+    graph.record('creatures', inputs, creatureOutputs)
+    finish()
 '''
 if __name__ == "__main__":
     main()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+'''
+Process many PDFs (such as a directory of two-column manuals) with a
+pool of worker processes. Each document is read and parsed by one
+worker, and the results of each go to a separate output directory:
+- chunks.ndjson and chunks.bin, the chunk store (see srd.chunkstore
+  and srd.chunkcolumns)
+- creatures.json, creatures.ndjson and creatures.csv (see
+  srd.processChunks)
+- diagnostics.log, the diagnostics of the parse
+
+Only a few more documents than there are workers are submitted at a
+time, so a long manifest doesn't fill memory with waiting jobs. Each
+document reports its progress as lines that start with its name, and
+batch.json in the output directory has the counts, times and throughput
+(or the error) of each document.
+
+Run it such as:
+python3 -m srd.batch ~/manuals ~/manuals-output --jobs 4
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    wait,
+    FIRST_COMPLETED,
+)
+
+from srd import (
+    prerr,
+    processChunks,
+    chunksNdjsonName,
+    chunksColumnarName,
+)
+from srd.diagnostics import (
+    Diagnostics,
+    TextSink,
+)
+from srd.chunkstore import (
+    saveChunkPages,
+    iterChunkDicts,
+)
+from srd.chunkcolumns import (
+    ColumnarChunks,
+    writeColumnarChunks,
+)
+from srd.pagechunker import (
+    iterChunkPages,
+)
+
+
+def readManifest(path):
+    '''
+    Get a list of job dicts (each with 'path' and optionally 'output'
+    and 'colStarts') from a manifest. A ".json" manifest is a list of
+    such dicts (or of paths), and any other manifest has one path on
+    each line (blank lines and lines starting with "#" are skipped).
+    Relative paths are relative to the manifest.
+    '''
+    directory = os.path.dirname(os.path.abspath(path))
+    if path.lower().endswith(".json"):
+        with open(path, 'r') as ins:
+            items = json.load(ins)
+    else:
+        items = []
+        with open(path, 'r') as ins:
+            for line in ins:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    items.append(line)
+    jobs = []
+    for item in items:
+        if not isinstance(item, dict):
+            item = {'path': item}
+        job = dict(item)
+        job['path'] = os.path.join(directory,
+                                   os.path.expanduser(job['path']))
+        jobs.append(job)
+    return jobs
+
+
+def findJobs(source, outputRoot):
+    '''
+    Get a list of job dicts with 'path' and 'output' (a separate
+    directory in outputRoot named after each document).
+
+    Sequential arguments:
+    source -- A directory (every PDF in it is used, in order by name) or
+        a manifest (see readManifest).
+    '''
+    if os.path.isdir(source):
+        jobs = []
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith(".pdf"):
+                jobs.append({'path': os.path.join(source, name)})
+    else:
+        jobs = readManifest(source)
+    # Automatic names don't use any output named in the manifest:
+    used = set(job['output'] for job in jobs
+               if job.get('output') is not None)
+    for job in jobs:
+        if job.get('output') is None:
+            name = os.path.splitext(os.path.basename(job['path']))[0]
+            output = name
+            number = 1
+            while output in used:
+                number += 1
+                output = "{}-{}".format(name, number)
+            used.add(output)
+            job['output'] = output
+        job['output'] = os.path.join(outputRoot, job['output'])
+    return jobs
+
+
+class DocumentProgress:
+    '''
+    Write a line that starts with the document name each time another
+    part of the pages (10% by default) is done, since several documents
+    write to the same stream at once.
+    '''
+    def __init__(self, name, step=10, stream=None):
+        self.name = name
+        self.step = step
+        self.stream = stream
+        self.start = time.perf_counter()
+        self._nextPercent = 0
+
+    def __call__(self, done, total):
+        percent = int(float(done) / max(total, 1) * 100)
+        if (percent < self._nextPercent) and (done != total):
+            return
+        self._nextPercent = (percent // self.step + 1) * self.step
+        elapsed = time.perf_counter() - self.start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        stream = self.stream
+        if stream is None:
+            stream = sys.stderr
+        stream.write("[{}] read {}/{} pages ({}%, {:.1f} pages/s)\n"
+                     "".format(self.name, done, total, percent, rate))
+        stream.flush()
+
+
+def processDocument(path, outputPath, colStarts="auto", cacheDir=None):
+    '''
+    Read one PDF and write its chunk store, creatures and diagnostics
+    to outputPath (run by a worker of runBatch). An error doesn't stop
+    the batch: it is in the result instead.
+
+    Keyword arguments:
+    colStarts -- The x coordinate where each column starts, "auto" to
+        detect them, or None for one column (see
+        srd.pagechunker.iterChunkPages).
+    cacheDir -- Keep the chunks of each page in this directory (see
+        srd.pagecache.PageCache).
+
+    Returns:
+    A dict with the path, output, pages, chunks, creatures, the seconds
+    for reading and parsing, pagesPerSecond, chunksPerSecond and error
+    (None unless the document failed).
+    '''
+    name = os.path.splitext(os.path.basename(path))[0]
+    result = {
+        'path': path,
+        'output': outputPath,
+        'pages': 0,
+        'chunks': 0,
+        'creatures': 0,
+        'readSeconds': None,
+        'parseSeconds': None,
+        'pagesPerSecond': None,
+        'chunksPerSecond': None,
+        'error': None,
+    }
+    progress = DocumentProgress(name)
+    pageCounts = []
+
+    def countPages(done, total):
+        pageCounts[:] = [done]
+        progress(done, total)
+
+    try:
+        if not os.path.isdir(outputPath):
+            os.makedirs(outputPath)
+        start = time.perf_counter()
+        pages = iterChunkPages(path, colStarts=colStarts, workers=1,
+                               cacheDir=cacheDir, captureAnnotations=False,
+                               progress=countPages)
+        ndjsonPath = os.path.join(outputPath, chunksNdjsonName)
+        result['chunks'] = saveChunkPages(pages, ndjsonPath)
+        result['pages'] = pageCounts[0] if pageCounts else 0
+        columnarPath = os.path.join(outputPath, chunksColumnarName)
+        writeColumnarChunks(iterChunkDicts(ndjsonPath), columnarPath)
+        readSeconds = time.perf_counter() - start
+        result['readSeconds'] = round(readSeconds, 3)
+        if readSeconds > 0:
+            result['pagesPerSecond'] = round(result['pages'] / readSeconds,
+                                             2)
+
+        start = time.perf_counter()
+        logPath = os.path.join(outputPath, "diagnostics.log")
+        with open(logPath, 'w') as stream:
+            log = Diagnostics(sink=TextSink(stream=stream,
+                                            errorLevel=None))
+            with ColumnarChunks(columnarPath) as chunks:
+                result['creatures'] = processChunks(
+                    chunks, diagnostics=log, outputPath=outputPath)
+            log.flush()
+        parseSeconds = time.perf_counter() - start
+        result['parseSeconds'] = round(parseSeconds, 3)
+        if parseSeconds > 0:
+            result['chunksPerSecond'] = round(
+                result['chunks'] / parseSeconds, 2)
+    except Exception as ex:
+        result['error'] = "{}: {}".format(type(ex).__name__, ex)
+        prerr("[{}] failed:\n{}".format(name, traceback.format_exc()))
+    return result
+
+
+def runBatch(jobs, workers=None, maxPending=None, colStarts="auto",
+             cacheDir=None):
+    '''
+    Process each job (see findJobs) with a pool of worker processes.
+
+    Keyword arguments:
+    workers -- The number of documents to process at once (None for
+        os.cpu_count()).
+    maxPending -- The most jobs that are submitted to the pool at once
+        (None for twice the number of workers).
+    colStarts -- The column starts for any job that doesn't have its
+        own 'colStarts' (see processDocument).
+
+    Returns:
+    A list of the result of each job (see processDocument), in the
+    same order as jobs.
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if maxPending is None:
+        maxPending = workers * 2
+    results = [None] * len(jobs)
+    nextJob = 0
+    pending = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while (nextJob < len(jobs)) or (len(pending) > 0):
+            while (nextJob < len(jobs)) and (len(pending) < maxPending):
+                job = jobs[nextJob]
+                future = pool.submit(processDocument, job['path'],
+                                     job['output'],
+                                     colStarts=job.get('colStarts',
+                                                       colStarts),
+                                     cacheDir=cacheDir)
+                pending[future] = nextJob
+                nextJob += 1
+            done, notDone = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                result = future.result()
+                results[index] = result
+                name = os.path.basename(result['path'])
+                if result['error'] is not None:
+                    prerr("* [{}] failed: {}".format(name, result['error']))
+                else:
+                    prerr("* [{}] {} pages ({} pages/s), {} chunks,"
+                          " {} creatures ({} chunks/s)"
+                          "".format(name, result['pages'],
+                                    result['pagesPerSecond'],
+                                    result['chunks'], result['creatures'],
+                                    result['chunksPerSecond']))
+    return results
+
+
+def parseColStarts(value):
+    '''
+    Convert "auto", "none" or comma-separated numbers (such as
+    "57.6,328.56") to a colStarts value.
+    '''
+    if value.lower() == "auto":
+        return "auto"
+    if value.lower() == "none":
+        return None
+    return [float(part) for part in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Get the chunks and creatures of many PDFs.")
+    parser.add_argument("source",
+                        help="A directory of PDFs, or a manifest (a .json"
+                             " list or a file with a path on each line).")
+    parser.add_argument("output",
+                        help="The directory for the output directory of"
+                             " each document.")
+    parser.add_argument("--jobs", type=int,
+                        help="The number of documents to process at once.")
+    parser.add_argument("--queue", type=int,
+                        help="The most documents submitted at once.")
+    parser.add_argument("--col-starts", default="auto",
+                        help="auto, none, or x coordinates such as"
+                             " 57.6,328.56.")
+    parser.add_argument("--cache",
+                        help="Keep the chunks of each page in this"
+                             " directory.")
+    args = parser.parse_args()
+    jobs = findJobs(args.source, args.output)
+    if len(jobs) == 0:
+        prerr("There are no PDFs in \"{}\".".format(args.source))
+        return 1
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    start = time.perf_counter()
+    results = runBatch(jobs, workers=args.jobs, maxPending=args.queue,
+                       colStarts=parseColStarts(args.col_starts),
+                       cacheDir=args.cache)
+    elapsed = time.perf_counter() - start
+    summaryPath = os.path.join(args.output, "batch.json")
+    with open(summaryPath, 'w') as outs:
+        json.dump({'seconds': round(elapsed, 3), 'documents': results},
+                  outs, indent=2)
+    failed = len([r for r in results if r['error'] is not None])
+    prerr("* processed {} document(s) in {:.1f} s ({} failed); wrote \"{}\""
+          "".format(len(results), elapsed, failed, summaryPath))
+    if failed > 0:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
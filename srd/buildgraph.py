@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+'''
+Remember what each output of main was made from so that only the stages
+whose inputs changed are run again. Each artifact (such as "chunks" or
+"creatures") is recorded with a digest of each of its inputs (files and
+rule tables) and the size and modification time of each of its output
+files. An artifact is stale if it was never recorded, if any input
+digest differs, or if any output file is missing or was changed since.
+
+The digest of a file is kept with its size and modification time, so a
+file is only hashed again after it changes and a run where nothing
+changed doesn't read any large file.
+'''
+import os
+import json
+import hashlib
+
+from srd import (
+    ruleTables,
+)
+from srd.pagecache import (
+    settingsDict,
+)
+
+try:
+    from pdfminer.layout import LAParams
+except ModuleNotFoundError:
+    # pagechunker shows the error since it requires pdfminer anyway.
+    pass
+
+buildStateVersion = 1
+
+
+def digestJson(value):
+    '''
+    Get the sha256 hex digest of value as sorted JSON.
+    '''
+    data = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def chunkRulesDigest(colStarts, captureAnnotations=False):
+    '''
+    Get the digest of the settings that change the chunks of a PDF (the
+    same settings as the keys of srd.pagecache.PageCache).
+    '''
+    return digestJson(settingsDict(LAParams(), colStarts,
+                                   captureAnnotations=captureAnnotations))
+
+
+def creatureRulesDigest():
+    '''
+    Get the digest of the tables that change which creatures are found
+    (see srd.ruleTables).
+    '''
+    return digestJson(ruleTables())
+
+
+def _fileStat(path):
+    info = os.stat(path)
+    return [info.st_size, info.st_mtime_ns]
+
+
+class BuildGraph:
+    def __init__(self, path):
+        '''
+        Sequential arguments:
+        path -- The JSON file where the state is kept (such as
+            srd.buildStatePath). It is created by the first record.
+        '''
+        self.path = path
+        self.files = {}  # path: [size, mtimeNs, digest]
+        self.artifacts = {}  # name: {'inputs': {}, 'outputs': {}}
+        self.changed = False  # Whether there is anything to save
+        if os.path.isfile(path):
+            try:
+                with open(path, 'r') as ins:
+                    state = json.load(ins)
+            except ValueError:
+                state = {}
+            if state.get('version') == buildStateVersion:
+                self.files = state['files']
+                self.artifacts = state['artifacts']
+
+    def fileDigest(self, path):
+        '''
+        Get the sha256 hex digest of a file, hashing it only if its size
+        or modification time changed since the last time.
+        '''
+        key = os.path.abspath(path)
+        stat = _fileStat(path)
+        got = self.files.get(key)
+        if (got is not None) and (got[:2] == stat):
+            return got[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as ins:
+            while True:
+                block = ins.read(1024 * 1024)
+                if not block:
+                    break
+                digest.update(block)
+        self.files[key] = stat + [digest.hexdigest()]
+        self.changed = True
+        return digest.hexdigest()
+
+    def has(self, name):
+        return name in self.artifacts
+
+    def staleReason(self, name, inputs, outputs):
+        '''
+        Get why the artifact has to be made again, or None if it is up
+        to date.
+
+        Sequential arguments:
+        name -- The name of the artifact, such as "creatures".
+        inputs -- A dict of the current digest (or other simple value)
+            of each input.
+        outputs -- The paths of the files that the artifact is made of.
+        '''
+        record = self.artifacts.get(name)
+        if record is None:
+            return "it has no build record"
+        for key in sorted(set(inputs) | set(record['inputs'])):
+            if inputs.get(key) != record['inputs'].get(key):
+                return "{} changed".format(key)
+        for path in outputs:
+            key = os.path.abspath(path)
+            if not os.path.isfile(path):
+                return "\"{}\" is missing".format(path)
+            if record['outputs'].get(key) != _fileStat(path):
+                return "\"{}\" was changed".format(path)
+        return None
+
+    def isRecordedOutput(self, name, path):
+        '''
+        Check whether path is an output of the artifact and wasn't
+        changed since it was recorded.
+        '''
+        record = self.artifacts.get(name)
+        if (record is None) or not os.path.isfile(path):
+            return False
+        return record['outputs'].get(os.path.abspath(path)) == _fileStat(path)
+
+    def isStale(self, name, inputs, outputs):
+        return self.staleReason(name, inputs, outputs) is not None
+
+    def record(self, name, inputs, outputs):
+        '''
+        Record that the artifact was made from inputs, then save the
+        state (see staleReason for the arguments).
+        '''
+        stats = {}
+        for path in outputs:
+            stats[os.path.abspath(path)] = _fileStat(path)
+        self.artifacts[name] = {'inputs': dict(inputs), 'outputs': stats}
+        self.save()
+
+    def forget(self, name):
+        '''
+        Make the artifact stale (such as to force it to be made again).
+        '''
+        if self.artifacts.pop(name, None) is not None:
+            self.save()
+
+    def save(self):
+        tmpPath = self.path + ".partial"
+        with open(tmpPath, 'w') as outs:
+            json.dump({
+                'version': buildStateVersion,
+                'files': self.files,
+                'artifacts': self.artifacts,
+            }, outs, indent=2, sort_keys=True)
+        os.replace(tmpPath, self.path)
+        self.changed = False
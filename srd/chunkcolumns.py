@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+'''
+Store chunks in a compact binary file that is opened with mmap instead
+of being parsed. Each field is a fixed-width array (one value per chunk
+or per fragment), font styles are stored once in a table and referred
+to by index, and all text is in one blob with offsets. A ChunkView only
+reads the fields that are used, directly from the mapped file.
+
+File layout (all numbers use the byte order in the header):
+- magic (8 bytes) then the JSON header length (uint32)
+- the JSON header: count, fragCount, byteorder, styles as
+  [fontname, size] pairs, and the (offset, typecode, length) of each
+  section relative to the start of the data
+- the data: each section from sectionTypes, aligned to 8 bytes
+'''
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+
+from srd import (
+    BBox,
+    DocChunk,
+    Fragment,
+    internStyle,
+    styleKey,
+)
+
+magic = b"SRDCOLS1"
+noValue = -2147483648  # Stored as an int32 instead of None
+sectionTypes = [
+    # name, typecode
+    ('pageid', 'i'),
+    ('pageN', 'i'),
+    ('column', 'i'),
+    ('bbox', 'd'),
+    ('style', 'i'),  # The index of (fontname, size) of the chunk
+    ('textStart', 'q'),
+    ('fragStart', 'q'),
+    ('fragStyle', 'i'),
+    ('fragTextStart', 'q'),
+    ('annotationStart', 'q'),
+    ('text', 'B'),
+    ('fragText', 'B'),
+    ('annotations', 'B'),
+]
+
+
+def align(n, size=8):
+    '''
+    Round n up to a multiple of size (the alignment of each section).
+    '''
+    return (n + size - 1) // size * size
+
+
+def intOrNoValue(value):
+    '''
+    Get the int to store for value (noValue for None).
+    '''
+    if value is None:
+        return noValue
+    return value
+
+
+def writeColumnarChunks(chunks, path):
+    '''
+    Write the chunks (DocChunk objects or dicts from toDict) to path.
+    The file is replaced atomically.
+
+    Returns:
+    The number of chunks written.
+    '''
+    sections = {}
+    for name, typecode in sectionTypes:
+        sections[name] = array(typecode)
+    styles = []
+    styleIndices = {}
+
+    def styleIndex(fontname, size):
+        if (fontname is None) and (size is None):
+            return -1
+        key = (fontname, size)
+        index = styleIndices.get(key)
+        if index is None:
+            index = len(styles)
+            styleIndices[key] = index
+            styles.append([fontname, size])
+        return index
+
+    text = bytearray()
+    fragText = bytearray()
+    annotations = bytearray()
+    count = 0
+    fragCount = 0
+    for chunk in chunks:
+        if not isinstance(chunk, dict):
+            chunk = chunk.toDict()
+        sections['pageid'].append(chunk['pageid'])
+        sections['pageN'].append(intOrNoValue(chunk.get('pageN')))
+        sections['column'].append(intOrNoValue(chunk['column']))
+        sections['bbox'].extend(chunk['bbox'])
+        sections['style'].append(styleIndex(chunk.get('fontname'),
+                                            chunk.get('size')))
+        sections['textStart'].append(len(text))
+        text += chunk['text'].encode("utf-8")
+        sections['fragStart'].append(fragCount)
+        for frag in chunk['fragments']:
+            sections['fragStyle'].append(styleIndex(frag['fontname'],
+                                                    frag['size']))
+            sections['fragTextStart'].append(len(fragText))
+            fragText += frag['text'].encode("utf-8")
+            fragCount += 1
+        sections['annotationStart'].append(len(annotations))
+        if chunk.get('annotations') is not None:
+            annotations += json.dumps(chunk['annotations']).encode("utf-8")
+        count += 1
+    # Each start array has one more entry so that every entry has an end.
+    sections['textStart'].append(len(text))
+    sections['fragStart'].append(fragCount)
+    sections['fragTextStart'].append(len(fragText))
+    sections['annotationStart'].append(len(annotations))
+    sections['text'] = array('B', bytes(text))
+    sections['fragText'] = array('B', bytes(fragText))
+    sections['annotations'] = array('B', bytes(annotations))
+
+    described = {}
+    offset = 0
+    for name, typecode in sectionTypes:
+        data = sections[name]
+        described[name] = [offset, typecode, len(data)]
+        offset = align(offset + len(data) * data.itemsize)
+    header = json.dumps({
+        'count': count,
+        'fragCount': fragCount,
+        'byteorder': sys.byteorder,
+        'styles': styles,
+        'sections': described,
+    }).encode("utf-8")
+    dataStart = align(len(magic) + 4 + len(header))
+
+    tmpPath = path + ".partial"
+    with open(tmpPath, 'wb') as outs:
+        outs.write(magic)
+        outs.write(struct.pack("<I", len(header)))
+        outs.write(header)
+        outs.write(b"\0" * (dataStart - outs.tell()))
+        for name, typecode in sectionTypes:
+            outs.write(b"\0" * (dataStart + described[name][0]
+                                - outs.tell()))
+            sections[name].tofile(outs)
+    os.replace(tmpPath, path)
+    return count
+
+
+class ChunkView(DocChunk):
+    '''
+    A read-only DocChunk whose fields are read from a ColumnarChunks
+    store only when they are used.
+    '''
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        # DocChunk.__init__ is not called, since every field is a
+        # property.
+        self.store = store
+        self.index = index
+
+    @property
+    def pageid(self):
+        return self.store.pageids[self.index]
+
+    @property
+    def pageN(self):
+        return self.store._none(self.store.pageNs[self.index])
+
+    @property
+    def column(self):
+        return self.store._none(self.store.columns[self.index])
+
+    @property
+    def bbox(self):
+        i = self.index * 4
+        return BBox(tuple(self.store.bboxes[i:i+4]))
+
+    @property
+    def text(self):
+        return self.store.chunkText(self.index)
+
+    @property
+    def fontName(self):
+        return self.store.style(self.store.chunkStyles[self.index]).fontname
+
+    @property
+    def fontSize(self):
+        return self.store.style(self.store.chunkStyles[self.index]).size
+
+    @property
+    def fragments(self):
+        return self.store.chunkFragments(self.index)
+
+    @property
+    def annotations(self):
+        return self.store.chunkAnnotations(self.index)
+
+    @property
+    def styleKey(self):
+        return self.store.chunkStyleKey(self.index)
+
+
+class ColumnarChunks:
+    '''
+    Open a file written by writeColumnarChunks. It acts as a read-only
+    sequence of ChunkView objects, and each column is also available
+    as a memoryview (pageids, pageNs, columns, bboxes with 4 values per
+    chunk, chunkStyles) for code that only needs one field. Use it as a
+    context manager or call close when done.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(magic)] != magic:
+            self.close()
+            raise ValueError("\"{}\" is not a columnar chunk file."
+                             "".format(path))
+        start = len(magic)
+        headerLen = struct.unpack("<I", self._mm[start:start+4])[0]
+        start += 4
+        header = json.loads(self._mm[start:start+headerLen].decode("utf-8"))
+        if header['byteorder'] != sys.byteorder:
+            self.close()
+            raise ValueError("\"{}\" was written on a {}-endian system."
+                             "".format(path, header['byteorder']))
+        self.count = header['count']
+        self.fragCount = header['fragCount']
+        self.styles = [internStyle(fontname, size)
+                       for fontname, size in header['styles']]
+        dataStart = align(start + headerLen)
+        view = memoryview(self._mm)
+        self._views = [view]
+        self._sections = {}
+        for name, (offset, typecode, length) in header['sections'].items():
+            itemsize = array(typecode).itemsize
+            begin = dataStart + offset
+            section = view[begin:begin+length*itemsize].cast(typecode)
+            self._views.append(section)
+            self._sections[name] = section
+        self.pageids = self._sections['pageid']
+        self.pageNs = self._sections['pageN']
+        self.columns = self._sections['column']
+        self.bboxes = self._sections['bbox']
+        self.chunkStyles = self._sections['style']
+
+    @staticmethod
+    def _none(value):
+        if value == noValue:
+            return None
+        return value
+
+    def style(self, index):
+        '''
+        Get the interned FontStyle for a style index (one with a
+        fontname and size of None if -1).
+        '''
+        if index < 0:
+            return internStyle(None, None)
+        return self.styles[index]
+
+    def chunkText(self, index):
+        starts = self._sections['textStart']
+        return str(self._sections['text'][starts[index]:starts[index+1]],
+                   "utf-8")
+
+    def chunkFragments(self, index):
+        fragStarts = self._sections['fragStart']
+        textStarts = self._sections['fragTextStart']
+        fragStyles = self._sections['fragStyle']
+        fragText = self._sections['fragText']
+        fragments = []
+        for i in range(fragStarts[index], fragStarts[index+1]):
+            fragments.append(Fragment(
+                str(fragText[textStarts[i]:textStarts[i+1]], "utf-8"),
+                self.styles[fragStyles[i]],
+            ))
+        return fragments
+
+    def chunkStyleKey(self, index):
+        '''
+        Get the style key (see srd.styleKey) of a chunk without reading
+        its fragments.
+        '''
+        fragStarts = self._sections['fragStart']
+        start = fragStarts[index]
+        fragCount = fragStarts[index+1] - start
+        if fragCount < 1:
+            return (None, 0)
+        style = self.styles[self._sections['fragStyle'][start]]
+        return styleKey(style.fontname, style.size, fragCount)
+
+    def chunkAnnotations(self, index):
+        starts = self._sections['annotationStart']
+        if starts[index] == starts[index+1]:
+            return None
+        data = self._sections['annotations'][starts[index]:starts[index+1]]
+        return json.loads(str(data, "utf-8"))
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if (index < 0) or (index >= self.count):
+            raise IndexError("chunk index out of range")
+        return ChunkView(self, index)
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield ChunkView(self, index)
+
+    def close(self):
+        for view in reversed(getattr(self, '_views', [])):
+            view.release()
+        self._views = []
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+'''
+Find chunks by the words in them without reading the whole chunk store.
+An inverted index (made once by writeChunkIndex) lists every token
+(each run of word characters, in lowercase) with the chunks where it
+occurs and the position of each occurrence, so a phrase is found by
+checking that the positions of its words are consecutive. The index
+also has the page, column, style, role and text of each chunk so that
+results can be filtered and shown without opening the chunk store.
+
+The file is opened with mmap the same way as srd.chunkcolumns, so a
+query only reads the parts of the file it needs (a binary search of the
+token table then the postings of each token) instead of parsing JSON.
+
+File layout (all numbers use the byte order in the header):
+- magic (8 bytes) then the JSON header length (uint32)
+- the JSON header: count, tokenCount, byteorder, styles as
+  [fontname, size] pairs (the style of each chunk that has only one),
+  roles, and the (offset, typecode, length) of each section relative
+  to the start of the data
+- the data: each section from sectionTypes, aligned to 8 bytes
+
+Search from the command line (the index is made from the chunk store
+in srd/data the first time, or when the chunk store is newer) such as:
+python3 -m srd.chunkindex '"adult red dragon"' --role name
+'''
+import os
+import re
+import sys
+import json
+import mmap
+import time
+import struct
+import operator
+import argparse
+from array import array
+from itertools import repeat
+
+from srd import (
+    prerr,
+    chunkRole,
+    chunkIndexPath,
+    chunksColumnarPath,
+    chunksNdjsonPath,
+)
+from srd.chunkcolumns import (
+    ColumnarChunks,
+    noValue,
+    align,
+    intOrNoValue,
+)
+from srd.chunkstore import (
+    iterChunks,
+)
+from srd.pageselect import (
+    parsePageSpec,
+)
+
+magic = b"SRDINDX2"
+tokenPattern = re.compile(r"\w+")
+queryPattern = re.compile(r'"([^"]*)"|(\S+)')
+sectionTypes = [
+    # name, typecode
+    ('tokenStart', 'q'),  # Where each sorted token starts in tokenText
+    ('postingStart', 'q'),  # Where the postings of each token start
+    ('postingChunk', 'i'),  # The chunk index of each posting
+    ('postingPos', 'i'),  # The token position in the chunk of each posting
+    ('pageid', 'i'),
+    ('pageN', 'i'),
+    ('column', 'i'),
+    ('style', 'i'),  # The index of (fontname, size) of the chunk or -1
+    ('role', 'i'),  # The index of the role in roles (-1 for none)
+    ('textStart', 'q'),
+    ('tokenText', 'B'),
+    ('text', 'B'),
+]
+
+
+def tokenize(text):
+    '''
+    Get the list of tokens (lowercase runs of word characters) in text.
+    '''
+    return tokenPattern.findall(text.lower())
+
+
+def writeChunkIndex(chunks, path):
+    '''
+    Write an inverted index of the chunks to path. The file is replaced
+    atomically.
+
+    Sequential arguments:
+    chunks -- Any iterable of DocChunk objects (such as a ColumnarChunks
+        store or iterChunks). The index of each chunk is its position in
+        this sequence.
+
+    Returns:
+    The number of chunks indexed.
+    '''
+    sections = {}
+    for name, typecode in sectionTypes:
+        sections[name] = array(typecode)
+    postings = {}  # token: array of chunk index and position pairs
+    styles = []
+    styleIndices = {}
+    roles = []
+    roleIndices = {}
+    text = bytearray()
+    count = 0
+    for chunk in chunks:
+        # The style of the whole chunk (None if it has more than one),
+        # the same as DocChunk.fontName and fontSize:
+        key = (chunk.fontName, chunk.fontSize)
+        styleIndex = -1
+        if key != (None, None):
+            styleIndex = styleIndices.get(key)
+            if styleIndex is None:
+                styleIndex = len(styles)
+                styleIndices[key] = styleIndex
+                styles.append(list(key))
+        role = chunkRole(chunk)
+        roleIndex = -1
+        if role is not None:
+            roleIndex = roleIndices.get(role)
+            if roleIndex is None:
+                roleIndex = len(roles)
+                roleIndices[role] = roleIndex
+                roles.append(role)
+        chunkText = chunk.text
+        sections['pageid'].append(chunk.pageid)
+        sections['pageN'].append(intOrNoValue(chunk.pageN))
+        sections['column'].append(intOrNoValue(chunk.column))
+        sections['style'].append(styleIndex)
+        sections['role'].append(roleIndex)
+        sections['textStart'].append(len(text))
+        text += chunkText.encode("utf-8")
+        for position, token in enumerate(tokenize(chunkText)):
+            got = postings.get(token)
+            if got is None:
+                got = array('i')
+                postings[token] = got
+            got.append(count)
+            got.append(position)
+        count += 1
+    sections['textStart'].append(len(text))
+    sections['text'] = array('B', bytes(text))
+
+    # Sort by the encoded token so that the binary search in ChunkIndex
+    # can compare bytes.
+    tokenText = bytearray()
+    postingCount = 0
+    encoded = sorted((token.encode("utf-8"), token) for token in postings)
+    for tokenBytes, token in encoded:
+        sections['tokenStart'].append(len(tokenText))
+        tokenText += tokenBytes
+        sections['postingStart'].append(postingCount)
+        pairs = postings[token]
+        sections['postingChunk'].extend(pairs[0::2])
+        sections['postingPos'].extend(pairs[1::2])
+        postingCount += len(pairs) // 2
+    sections['tokenStart'].append(len(tokenText))
+    sections['postingStart'].append(postingCount)
+    sections['tokenText'] = array('B', bytes(tokenText))
+
+    described = {}
+    offset = 0
+    for name, typecode in sectionTypes:
+        data = sections[name]
+        described[name] = [offset, typecode, len(data)]
+        offset = align(offset + len(data) * data.itemsize)
+    header = json.dumps({
+        'count': count,
+        'tokenCount': len(encoded),
+        'byteorder': sys.byteorder,
+        'styles': styles,
+        'roles': roles,
+        'sections': described,
+    }).encode("utf-8")
+    dataStart = align(len(magic) + 4 + len(header))
+
+    tmpPath = path + ".partial"
+    with open(tmpPath, 'wb') as outs:
+        outs.write(magic)
+        outs.write(struct.pack("<I", len(header)))
+        outs.write(header)
+        for name, typecode in sectionTypes:
+            outs.write(b"\0" * (dataStart + described[name][0]
+                                - outs.tell()))
+            sections[name].tofile(outs)
+    os.replace(tmpPath, path)
+    return count
+
+
+def pageNumbers(spec):
+    '''
+    Get a function that tells whether a pageN is in a page spec (such
+    as "281-290,300" or "300-"; see srd.pageselect) of printed page
+    numbers.
+    '''
+    ranges = []
+    for first, last in parsePageSpec(spec):
+        try:
+            ranges.append((int(first), None if last is None else int(last)))
+        except ValueError:
+            raise ValueError("\"{}\" is not a page number range."
+                             "".format(spec))
+
+    def contains(pageN):
+        for first, last in ranges:
+            if (pageN >= first) and ((last is None) or (pageN <= last)):
+                return True
+        return False
+    return contains
+
+
+def parseQuery(query):
+    '''
+    Split a query into a list of phrases, where each phrase is a list of
+    tokens. Words in double quotes are one phrase, and each other word
+    is a phrase by itself.
+    '''
+    phrases = []
+    for quoted, word in queryPattern.findall(query):
+        if word:
+            phrases.extend([token] for token in tokenize(word))
+        else:
+            tokens = tokenize(quoted)
+            if len(tokens) > 0:
+                phrases.append(tokens)
+    return phrases
+
+
+class ChunkIndex:
+    '''
+    Open a file written by writeChunkIndex. Use it as a context manager
+    or call close when done.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(magic)] != magic:
+            self.close()
+            raise ValueError("\"{}\" is not a chunk index file."
+                             "".format(path))
+        start = len(magic)
+        headerLen = struct.unpack("<I", self._mm[start:start+4])[0]
+        start += 4
+        header = json.loads(self._mm[start:start+headerLen].decode("utf-8"))
+        if header['byteorder'] != sys.byteorder:
+            self.close()
+            raise ValueError("\"{}\" was written on a {}-endian system."
+                             "".format(path, header['byteorder']))
+        self.count = header['count']
+        self.tokenCount = header['tokenCount']
+        self.styles = header['styles']
+        self.roles = header['roles']
+        dataStart = align(start + headerLen)
+        view = memoryview(self._mm)
+        self._views = [view]
+        self._sections = {}
+        for name, (offset, typecode, length) in header['sections'].items():
+            itemsize = array(typecode).itemsize
+            begin = dataStart + offset
+            section = view[begin:begin+length*itemsize].cast(typecode)
+            self._views.append(section)
+            self._sections[name] = section
+
+    def _tokenIndex(self, token):
+        '''
+        Get the index of token in the sorted token table, or -1 if no
+        chunk has it.
+        '''
+        key = token.encode("utf-8")
+        starts = self._sections['tokenStart']
+        tokenText = self._sections['tokenText']
+        low = 0
+        high = self.tokenCount
+        while low < high:
+            mid = (low + high) // 2
+            got = tokenText[starts[mid]:starts[mid+1]].tobytes()
+            if got < key:
+                low = mid + 1
+            elif got > key:
+                high = mid
+            else:
+                return mid
+        return -1
+
+    def postings(self, token):
+        '''
+        Get the chunk indices and positions of token as two memoryviews
+        of the same length (both empty if no chunk has it), in order of
+        chunk then position.
+        '''
+        index = self._tokenIndex(token.lower())
+        if index < 0:
+            return (self._sections['postingChunk'][0:0],
+                    self._sections['postingPos'][0:0])
+        starts = self._sections['postingStart']
+        start = starts[index]
+        stop = starts[index+1]
+        return (self._sections['postingChunk'][start:stop],
+                self._sections['postingPos'][start:stop])
+
+    def _phraseChunks(self, tokens):
+        '''
+        Get the set of indices of chunks that have the tokens in order.
+        '''
+        if len(tokens) == 1:
+            return set(self.postings(tokens[0])[0])
+        # Each set has the (chunk, position of the phrase) where token i
+        # could be part of the phrase, so the phrase is wherever every
+        # set has the same pair.
+        found = None
+        for offset, token in sorted(enumerate(tokens),
+                                    key=lambda pair: len(self.postings(
+                                        pair[1])[0])):
+            chunkIndices, positions = self.postings(token)
+            pairs = set(zip(chunkIndices,
+                            map(operator.sub, positions, repeat(offset))))
+            if found is None:
+                found = pairs
+            else:
+                found.intersection_update(pairs)
+            if len(found) == 0:
+                break
+        return set(chunkIndex for chunkIndex, position in found)
+
+    def chunkText(self, index):
+        starts = self._sections['textStart']
+        return str(self._sections['text'][starts[index]:starts[index+1]],
+                   "utf-8")
+
+    def chunk(self, index):
+        '''
+        Get a dict with the id (the index in the chunk store), pageid,
+        pageN, column, fontname, size, role and text of a chunk. The
+        fontname and size are those of DocChunk (None if the chunk has
+        more than one style).
+        '''
+        styleIndex = self._sections['style'][index]
+        fontname = None
+        size = None
+        if styleIndex >= 0:
+            fontname, size = self.styles[styleIndex]
+        roleIndex = self._sections['role'][index]
+        pageN = self._sections['pageN'][index]
+        column = self._sections['column'][index]
+        return {
+            'id': index,
+            'pageid': self._sections['pageid'][index],
+            'pageN': None if pageN == noValue else pageN,
+            'column': None if column == noValue else column,
+            'fontname': fontname,
+            'size': size,
+            'role': self.roles[roleIndex] if roleIndex >= 0 else None,
+            'text': self.chunkText(index),
+        }
+
+    def search(self, query="", phrase=False, pages=None, column=None,
+               font=None, size=None, role=None, limit=None):
+        '''
+        Get a list of chunk dicts (see chunk) in document order for the
+        chunks that have every word and phrase in the query and match
+        every filter. A query with no words matches any chunk.
+
+        Keyword arguments:
+        query -- Words to find. Words in double quotes (such as
+            '"armor class" 17') must be together in that order.
+        phrase -- Treat the whole query as one phrase.
+        pages -- Only get chunks with a pageN in this page spec (such
+            as "281-290,300"; see pageNumbers), or this collection of
+            page numbers.
+        column -- Only get chunks in this column (0 is the first).
+        font -- Only get chunks in one style where the font name
+            contains this (ignoring case, such as "calibri-bold").
+        size -- Only get chunks in one style with this font size
+            (rounded to 1 decimal place).
+        role -- Only get chunks with this role (such as srd.roleName).
+        limit -- Stop after this many results.
+        '''
+        if phrase:
+            phrases = [tokenize(query)]
+            if len(phrases[0]) == 0:
+                phrases = []
+        else:
+            phrases = parseQuery(query)
+        found = None
+        for tokens in phrases:
+            got = self._phraseChunks(tokens)
+            if found is None:
+                found = got
+            else:
+                found.intersection_update(got)
+            if len(found) == 0:
+                return []
+        if found is None:
+            found = range(self.count)
+        else:
+            found = sorted(found)
+
+        inPages = None
+        if isinstance(pages, str):
+            inPages = pageNumbers(pages)
+        elif pages is not None:
+            pages = set(pages)
+            inPages = pages.__contains__
+        roleIndex = None
+        if role is not None:
+            if role not in self.roles:
+                return []
+            roleIndex = self.roles.index(role)
+        styleIndices = None
+        if (font is not None) or (size is not None):
+            styleIndices = set()
+            for index, (fontname, styleSize) in enumerate(self.styles):
+                if ((font is not None)
+                        and (font.lower() not in (fontname or "").lower())):
+                    continue
+                if ((size is not None)
+                        and ((styleSize is None)
+                             or (round(styleSize, 1) != round(size, 1)))):
+                    continue
+                styleIndices.add(index)
+        pageNs = self._sections['pageN']
+        columns = self._sections['column']
+        chunkStyles = self._sections['style']
+        chunkRoles = self._sections['role']
+        results = []
+        for index in found:
+            if (inPages is not None) and not inPages(pageNs[index]):
+                continue
+            if (column is not None) and (columns[index] != column):
+                continue
+            if (roleIndex is not None) and (chunkRoles[index] != roleIndex):
+                continue
+            if ((styleIndices is not None)
+                    and (chunkStyles[index] not in styleIndices)):
+                continue
+            results.append(self.chunk(index))
+            if (limit is not None) and (len(results) >= limit):
+                break
+        return results
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        for view in reversed(getattr(self, '_views', [])):
+            view.release()
+        self._views = []
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def isCurrentIndex(path):
+    '''
+    Check whether the file at path is a chunk index in the current
+    format (an older one has another magic).
+    '''
+    with open(path, 'rb') as ins:
+        return ins.read(len(magic)) == magic
+
+
+def openChunkIndex(path=None, chunksPath=None):
+    '''
+    Open the chunk index, and make it first if it doesn't exist, if it
+    is in an older format, or if the chunk store is newer.
+
+    Keyword arguments:
+    path -- The index file (chunkIndexPath by default).
+    chunksPath -- The chunk store to index (chunks.bin if present, or
+        chunks.ndjson otherwise). A path ending in ".bin" is opened as
+        ColumnarChunks and any other as a chunk file (see
+        srd.chunkstore).
+    '''
+    if path is None:
+        path = chunkIndexPath
+    if chunksPath is None:
+        chunksPath = chunksColumnarPath
+        if not os.path.isfile(chunksPath):
+            chunksPath = chunksNdjsonPath
+    if os.path.isfile(chunksPath):
+        if ((not os.path.isfile(path))
+                or (os.path.getmtime(path) < os.path.getmtime(chunksPath))
+                or not isCurrentIndex(path)):
+            prerr("* indexing \"{}\"...".format(chunksPath))
+            if chunksPath.endswith(".bin"):
+                with ColumnarChunks(chunksPath) as chunks:
+                    count = writeChunkIndex(chunks, path)
+            else:
+                count = writeChunkIndex(iterChunks(chunksPath), path)
+            prerr("  * indexed {} chunks in \"{}\"".format(count, path))
+    elif not os.path.isfile(path):
+        raise FileNotFoundError(
+            "There is no chunk index or chunk store (\"{}\"). Run"
+            " step1getchunks first.".format(chunksPath))
+    return ChunkIndex(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find chunks by their words, page and style.")
+    parser.add_argument("query", nargs="*",
+                        help="Words to find. Put a phrase in double"
+                             " quotes (quoted again for the shell).")
+    parser.add_argument("--phrase", action="store_true",
+                        help="Treat the whole query as one phrase.")
+    parser.add_argument("--pages",
+                        help="Printed page numbers such as 281-290,300.")
+    parser.add_argument("--column", type=int,
+                        help="The column (0 is the first).")
+    parser.add_argument("--font", help="Part of the font name.")
+    parser.add_argument("--size", type=float, help="The font size.")
+    parser.add_argument("--role",
+                        help="The role of the chunk's style, such as name.")
+    parser.add_argument("--limit", type=int, help="The most results.")
+    parser.add_argument("--index", help="The index file.")
+    parser.add_argument("--chunks", help="The chunk store to index.")
+    parser.add_argument("--json", action="store_true",
+                        help="Show each result as a line of JSON.")
+    args = parser.parse_args()
+    with openChunkIndex(path=args.index, chunksPath=args.chunks) as index:
+        start = time.perf_counter()
+        results = index.search(" ".join(args.query), phrase=args.phrase,
+                               pages=args.pages, column=args.column,
+                               font=args.font, size=args.size,
+                               role=args.role, limit=args.limit)
+        elapsed = time.perf_counter() - start
+    for result in results:
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print("p{} c{} {}: {}".format(result['pageN'], result['column'],
+                                          result['role'] or "-",
+                                          result['text'].strip()))
+    prerr("* found {} chunks in {:.1f} ms".format(len(results),
+                                                  elapsed * 1000))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
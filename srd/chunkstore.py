@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+'''
+Store chunks as line-delimited JSON (one chunk per line) so that they
+can be written page by page while the PDF is being read and loaded
+lazily one at a time. A path ending with ".gz" is compressed using gzip
+and a path ending with ".zst" is compressed using zstandard (which must
+be installed separately).
+'''
+import os
+import io
+import json
+import gzip
+
+from srd import (
+    prerr,
+    dictToChunk,
+    partialPath,
+)
+from srd.profiling import (
+    nullProfiler,
+)
+
+try:
+    import zstandard
+except ModuleNotFoundError:
+    zstandard = None
+
+
+def openChunkFile(path, mode='r'):
+    '''
+    Open a chunk file as text in mode 'r', 'w', or 'a', compressed
+    according to the file extension.
+    '''
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + 't', encoding="utf-8")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            prerr("To use a \".zst\" chunk file you must first install"
+                  " the following module for Python:")
+            prerr("  zstandard")
+            raise ModuleNotFoundError("No module named 'zstandard'")
+        binary = open(path, mode + 'b')
+        if mode == 'r':
+            stream = zstandard.ZstdDecompressor().stream_reader(binary,
+                                                                closefd=True)
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(binary,
+                                                              closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class ChunkWriter:
+    '''
+    Write chunks to a chunk file as they arrive. Use it as a context
+    manager (with ChunkWriter(path) as writer: ...).
+    '''
+    def __init__(self, path, append=False):
+        self.path = path
+        mode = 'w'
+        if append:
+            mode = 'a'
+        self.outs = openChunkFile(path, mode)
+        self.count = 0
+
+    def writeChunk(self, chunk):
+        '''
+        Write one chunk (a DocChunk or a dict from toDict).
+        '''
+        if not isinstance(chunk, dict):
+            chunk = chunk.toDict()
+        self.outs.write(json.dumps(chunk))
+        self.outs.write("\n")
+        self.count += 1
+
+    def writeChunks(self, chunks):
+        for chunk in chunks:
+            self.writeChunk(chunk)
+
+    def close(self):
+        if self.outs is not None:
+            self.outs.close()
+            self.outs = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def iterSavingChunkPages(pages, path, profiler=None):
+    '''
+    Yield each (pageid, chunks) from pages (such as from
+    srd.pagechunker.iterChunkPages) after writing it, so the pages can
+    be processed while they are saved. The file only appears at path
+    once every page is written (and consumed), so a partial file is
+    never mistaken for a complete one.
+
+    Keyword arguments:
+    profiler -- Time the "saveChunks" stage (see srd.profiling).
+    '''
+    if profiler is None:
+        profiler = nullProfiler
+    tmpPath = partialPath(path)
+    with ChunkWriter(tmpPath) as writer:
+        for pageid, pageChunks in pages:
+            with profiler.stage("saveChunks"):
+                writer.writeChunks(pageChunks)
+            yield pageid, pageChunks
+    os.replace(tmpPath, path)
+
+
+def saveChunkPages(pages, path, profiler=None):
+    '''
+    Write each (pageid, chunks) from pages as soon as it arrives (see
+    iterSavingChunkPages).
+
+    Returns:
+    The number of chunks written.
+    '''
+    count = 0
+    for pageid, pageChunks in iterSavingChunkPages(pages, path,
+                                                   profiler=profiler):
+        count += len(pageChunks)
+    return count
+
+
+def iterPageChunks(pages):
+    '''
+    Yield each chunk of each (pageid, chunks) in pages.
+    '''
+    for pageid, pageChunks in pages:
+        for chunk in pageChunks:
+            yield chunk
+
+
+def iterChunkDicts(path):
+    '''
+    Yield each chunk in the chunk file as a dict.
+    '''
+    with openChunkFile(path, 'r') as ins:
+        for line in ins:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iterChunks(path, requirePageN=False):
+    '''
+    Yield each chunk in the chunk file as a DocChunk.
+
+    Keyword arguments:
+    requirePageN -- Raise RuntimeError if a chunk has no pageN.
+    '''
+    for chunkD in iterChunkDicts(path):
+        chunk = dictToChunk(chunkD)
+        if requirePageN and (chunk.pageN is None):
+            raise RuntimeError("dictToChunk received no pageN.")
+        yield chunk
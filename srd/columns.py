@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+'''
+Find where the columns of a document start so that colStarts doesn't
+have to be measured by hand. The left edge (x0) of every text line on a
+sample of pages is counted in a histogram, and each bin with a large
+share of the lines is the start of a column. Bins close to a previous
+start (such as indented paragraphs or list items) belong to the same
+column.
+'''
+from srd import (
+    prerr,
+)
+
+try:
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+    from pdfminer.converter import PDFPageAggregator
+    from pdfminer.layout import LAParams, LTTextBox, LTTextLine, LTPage
+except ModuleNotFoundError:
+    # pagechunker shows the error since it requires pdfminer anyway.
+    pass
+
+
+def lineStarts(item, xs=None):
+    '''
+    Get a list of the x0 of each LTTextLine in a laid-out page (or
+    other layout item) with text.
+
+    Keyword arguments:
+    xs -- Append to this list instead of a new one.
+    '''
+    if xs is None:
+        xs = []
+    if isinstance(item, LTTextLine):
+        if item.get_text().strip():
+            xs.append(item.bbox[0])
+    elif isinstance(item, (LTPage, LTTextBox)):
+        for child in item:
+            lineStarts(child, xs=xs)
+    return xs
+
+
+def findColumnStarts(xs, binWidth=2.0, minShare=0.08, minGap=36.0):
+    '''
+    Get the sorted list of column starts from line starts.
+
+    Sequential arguments:
+    xs -- The x0 of each line (such as from lineStarts).
+
+    Keyword arguments:
+    binWidth -- The width of each histogram bin in points.
+    minShare -- The smallest part of all lines (0.08 is 8%) that have to
+        start in a bin for it to be a column start.
+    minGap -- Bins closer than this many points to the previous column
+        start are part of that column.
+    '''
+    if len(xs) == 0:
+        return []
+    bins = {}  # bin: [count, smallest x]
+    for x in xs:
+        key = int(x // binWidth)
+        got = bins.get(key)
+        if got is None:
+            bins[key] = [1, x]
+        else:
+            got[0] += 1
+            if x < got[1]:
+                got[1] = x
+    threshold = max(2, minShare * len(xs))
+    starts = []
+    for key in sorted(bins):
+        count, smallest = bins[key]
+        if count < threshold:
+            continue
+        if (len(starts) > 0) and (smallest - starts[-1] < minGap):
+            continue
+        starts.append(smallest)
+    return starts
+
+
+def samplePageIndices(count, sampleCount):
+    '''
+    Get up to sampleCount page indices spread evenly over count pages.
+    '''
+    if (sampleCount is None) or (sampleCount >= count):
+        return list(range(count))
+    step = float(count) / sampleCount
+    return sorted(set(int(i * step + step / 2) for i in range(sampleCount)))
+
+
+def detectColumnStarts(path, sampleCount=12, laparams=None,
+                       pageIndices=None, **kwargs):
+    '''
+    Find the column starts of a PDF using the lines on a sample of its
+    pages (see findColumnStarts for other keyword arguments).
+
+    Keyword arguments:
+    sampleCount -- The number of pages to lay out (None for all).
+    laparams -- The LAParams to use (None for the default that the
+        pagechunker uses).
+    pageIndices -- Only sample these pages (None for any page).
+    '''
+    if laparams is None:
+        laparams = LAParams()
+    xs = []
+    with open(path, 'rb') as fp:
+        doc = PDFDocument(PDFParser(fp))
+        pages = list(PDFPage.create_pages(doc))
+        candidates = list(range(len(pages)))
+        if pageIndices is not None:
+            candidates = sorted(set(pageIndices))
+        rsrcmgr = PDFResourceManager()
+        device = PDFPageAggregator(rsrcmgr, laparams=laparams)
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        for i in samplePageIndices(len(candidates), sampleCount):
+            interpreter.process_page(pages[candidates[i]])
+            lineStarts(device.get_result(), xs=xs)
+    starts = findColumnStarts(xs, **kwargs)
+    if len(starts) == 0:
+        prerr("No text was found in the sample pages of \"{}\", so one"
+              " column will be used.".format(path))
+        return None
+    return starts
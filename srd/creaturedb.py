@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+'''
+Write chunks and creatures to an SQLite database so that questions
+such as "every Dragon with a CR of 10 or more" are an indexed SQL query
+instead of loading creatures.json. Rows are collected in batches and
+added with executemany, all in one transaction, and the indexes are
+made after the rows are added (which is faster than updating them for
+each row). Like CreatureWriter, the database is written under a
+".partial" name and only replaces the destination once it is closed
+without an error.
+
+Tables:
+- chunks: one row per chunk (id is the index of the chunk in the chunk
+  store) with its page, column, bbox, style, role and text
+- creatures: one row per creature with the columns that are searched
+  most (name, cr as a number, crText such as "1/4", xp, category,
+  subcategory, pageN), and the whole record as JSON in data
+- stats: one row for each other field of each creature (such as
+  "Armor Class" or "STR"), as text
+- creatureStats (a view): the stats joined with the name and cr of each
+  creature
+'''
+import os
+import json
+import sqlite3
+
+from srd import (
+    chunkRole,
+    floatToFraction,
+    partialPath,
+    NameHeader,
+    ContextHeader,
+    SubCategoryHeader,
+)
+
+# The creature fields that are columns of the creatures table (any
+# other field is a row in the stats table):
+creatureColumns = [
+    # field, column
+    (NameHeader, 'name'),
+    ('CR', 'cr'),
+    ('XP', 'xp'),
+    (ContextHeader, 'category'),
+    (SubCategoryHeader, 'subcategory'),
+    ('pageN', 'pageN'),
+]
+schema = '''
+CREATE TABLE chunks (
+    id INTEGER PRIMARY KEY,
+    pageid INTEGER,
+    pageN INTEGER,
+    "column" INTEGER,
+    x1 REAL,
+    y1 REAL,
+    x2 REAL,
+    y2 REAL,
+    fontname TEXT,
+    size REAL,
+    role TEXT,
+    text TEXT
+);
+CREATE TABLE creatures (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    cr REAL,
+    crText TEXT,
+    xp REAL,
+    category TEXT,
+    subcategory TEXT,
+    pageN INTEGER,
+    data TEXT
+);
+CREATE TABLE stats (
+    creatureId INTEGER REFERENCES creatures(id),
+    name TEXT,
+    value TEXT
+);
+CREATE VIEW creatureStats AS
+    SELECT creatures.id AS creatureId, creatures.name AS creature,
+        creatures.cr AS cr, stats.name AS name, stats.value AS value
+    FROM stats JOIN creatures ON creatures.id = stats.creatureId;
+'''
+indexes = '''
+CREATE INDEX chunksPageN ON chunks(pageN);
+CREATE INDEX chunksRole ON chunks(role);
+CREATE INDEX creaturesCr ON creatures(cr);
+CREATE INDEX creaturesXp ON creatures(xp);
+CREATE INDEX creaturesCategory ON creatures(category);
+CREATE INDEX creaturesSubcategory ON creatures(subcategory);
+CREATE INDEX creaturesPageN ON creatures(pageN);
+CREATE INDEX creaturesName ON creatures(name);
+CREATE INDEX statsName ON stats(name, value);
+CREATE INDEX statsCreature ON stats(creatureId);
+'''
+
+
+def _statValue(value):
+    if (value is None) or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return str(value)
+    return json.dumps(value)
+
+
+class CreatureDatabase:
+    '''
+    Use it as a context manager (with CreatureDatabase(path) as db:
+    ...), then call addChunk for each chunk (or wrap the chunks with
+    iterAddingChunks) and write for each creature.
+    '''
+    def __init__(self, path, batchSize=5000):
+        '''
+        Sequential arguments:
+        path -- The database file to make (replaced if it exists).
+
+        Keyword arguments:
+        batchSize -- The number of rows to collect for each executemany.
+        '''
+        self.path = path
+        self.batchSize = batchSize
+        self.chunkCount = 0
+        self.count = 0
+        self._chunkRows = []
+        self._creatureRows = []
+        self._statRows = []
+        tmpPath = partialPath(path)
+        if os.path.isfile(tmpPath):
+            os.remove(tmpPath)
+        # isolation_level=None so that the one transaction is only the
+        # explicit BEGIN and COMMIT.
+        self._db = sqlite3.connect(tmpPath, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode = MEMORY")
+        self._db.execute("PRAGMA synchronous = OFF")
+        self._db.executescript(schema)
+        self._db.execute("BEGIN")
+
+    def addChunk(self, chunk):
+        '''
+        Add a chunk (a DocChunk). Its id is the number of chunks added
+        before it.
+        '''
+        bbox = chunk.bbox
+        self._chunkRows.append((
+            self.chunkCount, chunk.pageid, chunk.pageN, chunk.column,
+            bbox.x1, bbox.y1, bbox.x2, bbox.y2, chunk.fontName,
+            chunk.fontSize, chunkRole(chunk), chunk.text,
+        ))
+        self.chunkCount += 1
+        if len(self._chunkRows) >= self.batchSize:
+            self._flushChunks()
+
+    def iterAddingChunks(self, chunks):
+        '''
+        Add each chunk as it is yielded, so that the chunks can also be
+        a generator that is only read once (such as by processChunks).
+        '''
+        for chunk in chunks:
+            self.addChunk(chunk)
+            yield chunk
+
+    def write(self, monster):
+        '''
+        Add one creature (a dict from srd.iterCreatures).
+        '''
+        record = dict(monster)
+        cr = record.get('CR')
+        if isinstance(cr, (int, float)):
+            record['CR'] = floatToFraction(cr)
+        else:
+            cr = None
+        creatureId = self.count
+        row = [creatureId]
+        for field, column in creatureColumns:
+            if field == 'CR':
+                row.append(cr)
+                row.append(record.get('CR'))
+            else:
+                row.append(record.get(field))
+        row.append(json.dumps(record))
+        self._creatureRows.append(row)
+        for field, column in creatureColumns:
+            record.pop(field, None)
+        for name, value in record.items():
+            self._statRows.append((creatureId, name, _statValue(value)))
+        self.count += 1
+        if len(self._creatureRows) >= self.batchSize:
+            self._flushCreatures()
+
+    def _flushChunks(self):
+        if len(self._chunkRows) > 0:
+            self._db.executemany(
+                "INSERT INTO chunks VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+                self._chunkRows)
+            self._chunkRows = []
+
+    def _flushCreatures(self):
+        if len(self._creatureRows) > 0:
+            self._db.executemany(
+                "INSERT INTO creatures VALUES (?,?,?,?,?,?,?,?,?)",
+                self._creatureRows)
+            self._creatureRows = []
+        if len(self._statRows) > 0:
+            self._db.executemany("INSERT INTO stats VALUES (?,?,?)",
+                                 self._statRows)
+            self._statRows = []
+
+    def close(self, finish=True):
+        '''
+        Keyword arguments:
+        finish -- Add the remaining rows and indexes, commit, and move
+            the database to its destination (False discards the rows
+            and leaves the ".partial" file, such as after an error).
+        '''
+        if self._db is None:
+            return
+        if finish:
+            self._flushChunks()
+            self._flushCreatures()
+            self._db.execute("COMMIT")
+            self._db.executescript(indexes)
+        else:
+            self._db.execute("ROLLBACK")
+        self._db.close()
+        self._db = None
+        if finish:
+            os.replace(partialPath(self.path), self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(finish=(exc_type is None))
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+'''
+Find creatures with several processes. The state of iterCreatures is
+reset at each "Monsters (X)" letter heading (the creature before it
+ends and there is no subcategory after it), so the chunks can be cut
+before each heading and each segment parsed separately. Only the
+category state carries over a cut, so a quick pre-pass (splitSegments)
+counts the category markers (without parsing creatures) to know the
+state at the start of each segment.
+
+Each group of segments is parsed by iterCreatures in a worker process
+starting from that state. The creatures and the diagnostic events of
+each group are then used in document order, so the result (including
+what is written by the Diagnostics object) is the same as that of a
+serial run.
+'''
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from srd import (
+    diag,
+    chunkRole,
+    roleLetterHeading,
+    monsterLetterHeadings,
+    newCategoryMarks,
+    categoryMarkerStrings,
+    categoryState,
+    markCategories,
+    iterCreatures,
+    MarkerMatcher,
+)
+from srd.chunkcolumns import (
+    ColumnarChunks,
+)
+from srd.diagnostics import (
+    Diagnostics,
+    RecordingSink,
+    INFO,
+)
+
+
+def splitSegments(chunks):
+    '''
+    Get a list of (start, stop, state) for each segment of the chunks,
+    where state is the category state (see srd.categoryState) before
+    the chunk at start. Each segment after the first starts with a
+    letter heading (see srd.monsterLetterHeadings).
+
+    Sequential arguments:
+    chunks -- A sequence of DocChunk objects (such as a list or a
+        ColumnarChunks store).
+    '''
+    headings = set(monsterLetterHeadings)
+    categoryMarks = newCategoryMarks()
+    matcher = MarkerMatcher(categoryMarkerStrings(categoryMarks))
+    context = None
+    segments = []
+    start = 0
+    state = categoryState(context, categoryMarks)
+    index = -1
+    for index, chunk in enumerate(chunks):
+        text = chunk.text
+        if ((index > start) and (text.strip() in headings)
+                and (chunkRole(chunk) == roleLetterHeading)):
+            segments.append((start, index, state))
+            start = index
+            state = categoryState(context, categoryMarks)
+        newContext, startIsComplete, endIsComplete = \
+            markCategories(categoryMarks, matcher.findAll(text))
+        # Change the context the same way as iterCreatures:
+        if endIsComplete:
+            context = None
+        if startIsComplete and (newContext is not None):
+            context = newContext
+    segments.append((start, index + 1, state))
+    return segments
+
+
+def groupSegments(segments, groupCount):
+    '''
+    Join consecutive segments into up to groupCount groups with about
+    the same number of chunks. A group is also a segment (it starts
+    with the state of its first segment).
+    '''
+    if len(segments) == 0:
+        return []
+    total = segments[-1][1] - segments[0][0]
+    size = float(total) / max(groupCount, 1)
+    groups = []
+    for start, stop, state in segments:
+        if ((len(groups) > 0)
+                and (stop - segments[0][0] <= size * len(groups))):
+            groups[-1] = (groups[-1][0], stop, groups[-1][2])
+        else:
+            groups.append((start, stop, state))
+    return groups
+
+
+def parseSegment(chunks, start, stop, state, level=INFO, quiet=False):
+    '''
+    Parse one segment in a worker process.
+
+    Sequential arguments:
+    chunks -- The chunks of the segment, or the path of a ColumnarChunks
+        file (then only chunks from start to stop are used).
+
+    Returns:
+    A tuple of the list of creatures and the list of diagnostic events
+    (see srd.diagnostics.RecordingSink).
+    '''
+    if isinstance(chunks, str):
+        # Only the segment is read, and the store is closed before the
+        # next task so the worker doesn't keep the mmap open.
+        with ColumnarChunks(chunks) as store:
+            return parseSegment((store[i] for i in range(start, stop)),
+                                start, stop, state, level=level,
+                                quiet=quiet)
+    log = Diagnostics(level=level, sink=RecordingSink(), quiet=quiet)
+    monsters = list(iterCreatures(chunks, diagnostics=log, state=state))
+    return monsters, log.sink.events
+
+
+def iterCreaturesParallel(chunks, diagnostics=None, workers=None):
+    '''
+    Yield the same creatures as iterCreatures, in the same order, but
+    parse segments of the chunks (see splitSegments) in separate
+    processes. Diagnostic events from the workers are written by
+    diagnostics in order, before the creatures of each segment.
+
+    Keyword arguments:
+    diagnostics -- The Diagnostics object that receives progress and
+        warnings (None for diag).
+    workers -- The number of processes (None for os.cpu_count()).
+    '''
+    log = diagnostics
+    if log is None:
+        log = diag
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if not isinstance(chunks, (list, ColumnarChunks)):
+        chunks = list(chunks)
+    # More groups than workers keeps every worker busy even if some
+    # segments take longer than others.
+    segments = groupSegments(splitSegments(chunks), workers * 4)
+    if (workers < 2) or (len(segments) < 2):
+        for monster in iterCreatures(chunks, diagnostics=log):
+            yield monster
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for start, stop, state in segments:
+            if isinstance(chunks, ColumnarChunks):
+                source = chunks.path
+            else:
+                source = chunks[start:stop]
+            futures.append(pool.submit(
+                parseSegment, source, start, stop, state,
+                level=log.level, quiet=log.quiet,
+            ))
+        for future in futures:
+            monsters, events = future.result()
+            log.replay(events)
+            for monster in monsters:
+                yield monster
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+'''
+Write creatures (dicts from srd.iterCreatures) to creatures.json,
+creatures.ndjson, creatures.csv and any other sinks one at a time as
+they are found, so no file requires the whole list in memory. Each
+creature is given to CreatureWriter once and it goes to every sink in
+the same pass. Each file is written under a ".partial" name and only
+replaces the destination once the writer is closed without an error.
+
+The CSV columns are srd.creatureHeaders followed by any other field
+that any creature has (in the order they are first seen), so no stat is
+left out. Sorting by CR is a separate stage (sortCreatures) that only
+keeps a limited number of creatures in memory.
+'''
+import os
+import csv
+import json
+import heapq
+import tempfile
+
+from srd import (
+    assertPlainDict,
+    partialPath,
+    floatToFraction,
+    creatureHeaders,
+)
+
+# The most creatures that sortCreatures sorts in memory at once:
+sortRunSize = 10000
+
+
+def creatureRecord(monster):
+    '''
+    Get a copy of a creature to write. If 'CR' is a number, it is
+    written as a fraction string (such as "1/4") the same way as
+    processChunks always has.
+    '''
+    record = dict(monster)
+    if isinstance(record.get('CR'), (int, float)):
+        record['CR'] = floatToFraction(record['CR'])
+    # Ensure only simple types not classes are stored in the object.
+    assertPlainDict(record)
+    return record
+
+
+def crKey(monster):
+    return monster['CR']
+
+
+def sortCreatures(monsters, key=crKey, runSize=None, tmpDir=None):
+    '''
+    Yield the creatures sorted by key (CR by default) in the same order
+    as sorted would. Up to runSize creatures are sorted in memory at a
+    time, and if there are more, each sorted run is saved as NDJSON in
+    a temporary directory and the runs are merged.
+
+    Keyword arguments:
+    runSize -- The most creatures in memory at once (None for
+        sortRunSize).
+    tmpDir -- Where to make the temporary directory (None for the
+        system default).
+    '''
+    if runSize is None:
+        runSize = sortRunSize
+    run = []
+    tmp = None
+    runPaths = []
+    try:
+        for monster in monsters:
+            run.append(monster)
+            if len(run) >= runSize:
+                if tmp is None:
+                    tmp = tempfile.TemporaryDirectory(dir=tmpDir)
+                run.sort(key=key)
+                path = os.path.join(tmp.name,
+                                    "run{}.ndjson".format(len(runPaths)))
+                with open(path, 'w') as outs:
+                    for item in run:
+                        outs.write(json.dumps(item))
+                        outs.write("\n")
+                runPaths.append(path)
+                run = []
+        run.sort(key=key)
+        if len(runPaths) == 0:
+            for monster in run:
+                yield monster
+            return
+        # heapq.merge takes equal items from the earlier run first, so
+        # the merge is stable the same way as sorted.
+        files = [open(path, 'r') for path in runPaths]
+        try:
+            runs = [(json.loads(line) for line in ins) for ins in files]
+            runs.append(run)
+            for monster in heapq.merge(*runs, key=key):
+                yield monster
+        finally:
+            for ins in files:
+                ins.close()
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+
+class JsonSink:
+    '''
+    Write a JSON list of creatures (formatted the same way as json.dump
+    with indent=2).
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = open(partialPath(path), 'w')
+        self._file.write("[")
+
+    def write(self, record):
+        if self.count > 0:
+            self._file.write(",")
+        self._file.write("\n  ")
+        self._file.write(json.dumps(record, indent=2)
+                         .replace("\n", "\n  "))
+        self.count += 1
+
+    def close(self, finish=True):
+        if self._file is None:
+            return
+        if self.count > 0:
+            self._file.write("\n")
+        self._file.write("]")
+        self._file.close()
+        self._file = None
+        if finish:
+            os.replace(partialPath(self.path), self.path)
+
+
+class NdjsonSink:
+    '''
+    Write one creature per line as JSON.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self._file = open(partialPath(path), 'w')
+
+    def write(self, record):
+        self._file.write(json.dumps(record))
+        self._file.write("\n")
+
+    def close(self, finish=True):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if finish:
+            os.replace(partialPath(self.path), self.path)
+
+
+class CsvSink:
+    '''
+    Write a row for each creature.
+    '''
+    def __init__(self, path, headers=None):
+        '''
+        Keyword arguments:
+        headers -- The CSV columns. If None, the columns are
+            srd.creatureHeaders and then any other field of any creature
+            (discovered as they are written).
+        '''
+        self.path = path
+        self.discover = headers is None
+        self.headers = headers
+        if self.headers is None:
+            self.headers = list(creatureHeaders)
+        self._known = set(self.headers)
+        self._writtenHeaders = len(self.headers)
+        self._file = open(partialPath(path), 'w', newline='')
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(self.headers)
+
+    def write(self, record):
+        if self.discover:
+            for name in record:
+                if name not in self._known:
+                    self._known.add(name)
+                    self.headers.append(name)
+        # A row is only as long as the headers known so far (close
+        # adds the rest).
+        self._csv.writerow([record.get(header) for header in self.headers])
+
+    def close(self, finish=True):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        self._csv = None
+        path = partialPath(self.path)
+        if finish and (len(self.headers) > self._writtenHeaders):
+            # Rewrite it with the new columns in the header and every
+            # row as long as the header.
+            tmpPath = path + ".columns"
+            with open(path, 'r', newline='') as ins, \
+                    open(tmpPath, 'w', newline='') as outs:
+                reader = csv.reader(ins)
+                writer = csv.writer(outs)
+                next(reader)
+                writer.writerow(self.headers)
+                padding = len(self.headers)
+                for row in reader:
+                    writer.writerow(row + [""] * (padding - len(row)))
+            os.replace(tmpPath, path)
+            self._writtenHeaders = len(self.headers)
+        if finish:
+            os.replace(path, self.path)
+
+
+class CreatureWriter:
+    '''
+    Use it as a context manager (with CreatureWriter(...) as writer:
+    ...) and call write for each creature.
+    '''
+    def __init__(self, jsonPath=None, csvPath=None, headers=None,
+                 ndjsonPath=None, sinks=None):
+        '''
+        Keyword arguments:
+        jsonPath -- Write a JSON list of creatures here (see JsonSink)
+            unless None.
+        csvPath -- Write a row for each creature here unless None.
+        headers -- The CSV columns (None for srd.creatureHeaders and
+            then any other field found; see CsvSink).
+        ndjsonPath -- Write a line of JSON for each creature here unless
+            None.
+        sinks -- Other objects with write(monster) and close(finish)
+            methods (such as a srd.creaturedb.CreatureDatabase). They
+            get each creature as it is (the file sinks get it from
+            creatureRecord), and are closed with the files.
+        '''
+        self.jsonPath = jsonPath
+        self.csvPath = csvPath
+        self.ndjsonPath = ndjsonPath
+        self.count = 0
+        self._recordSinks = []
+        self._sinks = []
+        self._csvSink = None
+        if jsonPath is not None:
+            self._recordSinks.append(JsonSink(jsonPath))
+        if ndjsonPath is not None:
+            self._recordSinks.append(NdjsonSink(ndjsonPath))
+        if csvPath is not None:
+            self._csvSink = CsvSink(csvPath, headers=headers)
+            self._recordSinks.append(self._csvSink)
+        if sinks is not None:
+            self._sinks = list(sinks)
+        self.headers = headers
+        if self._csvSink is not None:
+            self.headers = self._csvSink.headers
+        elif self.headers is None:
+            self.headers = creatureHeaders
+
+    def write(self, monster):
+        '''
+        Write one creature to every sink.
+        '''
+        record = creatureRecord(monster)
+        for sink in self._recordSinks:
+            sink.write(record)
+        for sink in self._sinks:
+            sink.write(monster)
+        self.count += 1
+
+    def close(self, finish=True):
+        '''
+        Keyword arguments:
+        finish -- Move each file to its destination (False leaves the
+            ".partial" files, such as after an error).
+        '''
+        for sink in self._recordSinks + self._sinks:
+            sink.close(finish=finish)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(finish=(exc_type is None))
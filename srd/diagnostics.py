@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+'''
+Report diagnostic events (such as each creature name or unknown
+fragment found by processChunks) with a level and a category instead of
+writing and flushing each message immediately.
+
+Messages are only formatted if the event is written: pass the format
+string and its arguments separately, and wrap expensive arguments in
+lazy (such as lazy(chunkDump, chunk)). In quiet mode, and for levels
+below the threshold, the methods of a Diagnostics object are replaced by
+a function that does nothing, so a call site costs no more than a call.
+'''
+import sys
+import json
+import atexit
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+levelNames = {
+    DEBUG: "DEBUG",
+    INFO: "INFO",
+    WARNING: "WARNING",
+    ERROR: "ERROR",
+}
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+class lazy:
+    '''
+    Delay a call until the message is formatted, such as:
+    diag.info('category', "found {}", lazy(chunkDump, chunk))
+    '''
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+    def __format__(self, spec):
+        return format(self.func(*self.args), spec)
+
+
+class TextSink:
+    '''
+    Write each event as indented text like pdent did, but keep lines in
+    a buffer until there are bufferSize lines or flush is called. An
+    event of errorLevel or higher is written right away (after the
+    buffered lines before it) so it stays in order with the output it
+    is about and with progress written directly to stderr.
+    '''
+    def __init__(self, stream=None, errorStream=None, errorLevel=WARNING,
+                 bufferSize=1000):
+        '''
+        Keyword arguments:
+        stream -- Where to write events (None for sys.stdout at the time
+            of writing).
+        errorStream -- Where to write events of errorLevel or higher
+            (None for sys.stderr at the time of writing).
+        errorLevel -- The lowest level that is written right away to
+            errorStream (None to write every event to stream, still
+            writing WARNING and higher right away).
+        '''
+        self.stream = stream
+        self.errorStream = errorStream
+        self.errorLevel = errorLevel
+        self.bufferSize = bufferSize
+        self._lines = []
+
+    def write(self, level, category, message, indent=""):
+        line = indent + message.replace("\n", "\n" + indent) + "\n"
+        if self.errorLevel is None:
+            self._lines.append(line)
+            if (level >= WARNING) or (len(self._lines) >= self.bufferSize):
+                self.flush()
+        elif level >= self.errorLevel:
+            self.flush()
+            stream = self.errorStream
+            if stream is None:
+                stream = sys.stderr
+            stream.write(line)
+            stream.flush()
+        else:
+            self._lines.append(line)
+            if len(self._lines) >= self.bufferSize:
+                self.flush()
+
+    def flush(self):
+        if len(self._lines) > 0:
+            stream = self.stream
+            if stream is None:
+                stream = sys.stdout
+            stream.write("".join(self._lines))
+            stream.flush()
+            self._lines = []
+
+    def close(self):
+        self.flush()
+
+
+class JsonLinesSink(TextSink):
+    '''
+    Write each event as a JSON object on its own line with the keys
+    level, category, message and indent (the indent level in spaces).
+    '''
+    def __init__(self, stream=None, bufferSize=1000):
+        TextSink.__init__(self, stream=stream, errorLevel=None,
+                          bufferSize=bufferSize)
+
+    def write(self, level, category, message, indent=""):
+        self._lines.append(json.dumps({
+            'level': levelNames.get(level, level),
+            'category': category,
+            'message': message,
+            'indent': len(indent),
+        }) + "\n")
+        if (level >= WARNING) or (len(self._lines) >= self.bufferSize):
+            self.flush()
+
+
+class RecordingSink:
+    '''
+    Keep each event as a (level, category, message, indent) tuple in
+    events, such as so that a worker process can send its events to the
+    main process to be written in order (see Diagnostics.replay).
+    '''
+    def __init__(self):
+        self.events = []
+
+    def write(self, level, category, message, indent=""):
+        self.events.append((level, category, message, indent))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class Diagnostics:
+    def __init__(self, level=INFO, sink=None, sampleEvery=None,
+                 quiet=False):
+        '''
+        Keyword arguments:
+        level -- Ignore events below this level (DEBUG, INFO, WARNING
+            or ERROR).
+        sink -- A TextSink, JsonLinesSink, or any object with the same
+            write, flush and close methods (None for a TextSink that
+            writes warnings and errors to stderr and the rest to
+            stdout).
+        sampleEvery -- A dict where each key is a category and the
+            value is n, so that only the first of every n events in the
+            category is written.
+        quiet -- Ignore every event.
+        '''
+        if sink is None:
+            sink = TextSink()
+        self.sink = sink
+        self.sampleEvery = {}
+        if sampleEvery is not None:
+            self.sampleEvery.update(sampleEvery)
+        self.counts = {}  # The number of events in each category
+        self.configure(level=level, quiet=quiet)
+
+    def configure(self, level=None, quiet=None):
+        '''
+        Change the level or quiet mode. Methods for ignored levels are
+        replaced by a function that does nothing.
+        '''
+        if level is not None:
+            self.level = level
+        if quiet is not None:
+            self.quiet = quiet
+        for name, methodLevel in [('debug', DEBUG), ('info', INFO),
+                                  ('warning', WARNING), ('error', ERROR)]:
+            if self.quiet or (methodLevel < self.level):
+                setattr(self, name, _noop)
+            elif name in self.__dict__:
+                del self.__dict__[name]  # Use the method again.
+        if self.quiet:
+            self.emit = _noop
+        elif 'emit' in self.__dict__:
+            del self.__dict__['emit']
+
+    def enabled(self, level):
+        '''
+        Check whether events of the level are written (for call sites
+        that must do extra work to make a message).
+        '''
+        return (not self.quiet) and (level >= self.level)
+
+    def emit(self, level, category, message, *args, **kwargs):
+        '''
+        Write an event if its level is enabled and it is not skipped by
+        sampling. The message is formatted with args only if written.
+
+        Keyword arguments:
+        indent -- Indent every line of the message with this string.
+        '''
+        if level < self.level:
+            return
+        count = self.counts.get(category, 0)
+        self.counts[category] = count + 1
+        every = self.sampleEvery.get(category)
+        if (every is not None) and (count % every != 0):
+            return
+        if len(args) > 0:
+            message = message.format(*args)
+        self.sink.write(level, category, message,
+                        indent=kwargs.get('indent', ""))
+
+    def debug(self, category, message, *args, **kwargs):
+        self.emit(DEBUG, category, message, *args, **kwargs)
+
+    def info(self, category, message, *args, **kwargs):
+        self.emit(INFO, category, message, *args, **kwargs)
+
+    def warning(self, category, message, *args, **kwargs):
+        self.emit(WARNING, category, message, *args, **kwargs)
+
+    def error(self, category, message, *args, **kwargs):
+        self.emit(ERROR, category, message, *args, **kwargs)
+
+    def replay(self, events):
+        '''
+        Emit events from a RecordingSink (already formatted, so they
+        are only counted, sampled and written).
+        '''
+        for level, category, message, indent in events:
+            self.emit(level, category, message, indent=indent)
+
+    def flush(self):
+        self.sink.flush()
+
+    def close(self):
+        self.sink.close()
+
+    def summary(self):
+        '''
+        Get a line for each category with the number of events at or
+        above the level (including ones skipped by sampling).
+        '''
+        lines = []
+        for category in sorted(self.counts):
+            lines.append("{}: {}".format(category, self.counts[category]))
+        return "\n".join(lines)
+
+
+def openDiagnostics(path=None, format="text", level=INFO,
+                    sampleEvery=None, quiet=False):
+    '''
+    Get a Diagnostics object that writes to the file at path (or the
+    default streams if None) in the format "text" or "jsonl". The file
+    is closed at exit.
+    '''
+    if quiet:
+        return Diagnostics(quiet=True)
+    stream = None
+    if path is not None:
+        stream = open(path, 'w')
+        atexit.register(stream.close)
+    if format == "jsonl":
+        sink = JsonLinesSink(stream=stream)
+    elif format == "text":
+        errorLevel = WARNING
+        if stream is not None:
+            errorLevel = None  # Keep warnings in the file.
+        sink = TextSink(stream=stream, errorLevel=errorLevel)
+    else:
+        raise ValueError("The diagnostics format must be \"text\" or"
+                         " \"jsonl\".")
+    diag = Diagnostics(level=level, sink=sink, sampleEvery=sampleEvery)
+    atexit.register(diag.flush)
+    return diag
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+'''
+Find every marker string (such as the categoryMarks and subcatEndStrings
+used by processChunks) that occurs in a text using one scan.
+
+The markers are compiled into one regular expression shaped like a trie
+(markers that share a beginning share one branch), so the number of
+markers barely affects the time of a scan. The expression is in a
+lookahead so a match is found at every position, and since each
+position only reports the longest marker starting there, any shorter
+markers that are the beginning of that marker are added too.
+'''
+import re
+
+
+def _trieRegex(node):
+    '''
+    Get a regular expression for the markers in a trie node (a dict
+    where each key is a character and '' means a marker ends here).
+    '''
+    alts = []
+    for ch in sorted(node):
+        if ch == '':
+            continue
+        alts.append(re.escape(ch) + _trieRegex(node[ch]))
+    if len(alts) == 0:
+        return ''
+    if len(alts) == 1:
+        body = alts[0]
+    else:
+        body = "(?:" + "|".join(alts) + ")"
+    if '' in node:
+        # Greedy, so the longest marker is tried first.
+        body = "(?:" + body + ")?"
+    return body
+
+
+class MarkerMatcher:
+    def __init__(self, markers):
+        '''
+        Sequential arguments:
+        markers -- Any iterable of strings (duplicates and empty strings
+            are ignored).
+        '''
+        self.markers = sorted(set(m for m in markers if m))
+        trie = {}
+        for marker in self.markers:
+            node = trie
+            for ch in marker:
+                node = node.setdefault(ch, {})
+            node[''] = True
+        self._regex = None
+        if len(self.markers) > 0:
+            self._regex = re.compile("(?=(" + _trieRegex(trie) + "))")
+        self._prefixes = {}
+        for marker in self.markers:
+            self._prefixes[marker] = [
+                other for other in self.markers
+                if (other != marker) and marker.startswith(other)
+            ]
+
+    def findAll(self, text):
+        '''
+        Get the set of markers that occur anywhere in text (the same as
+        the markers for which marker in text is True).
+        '''
+        hits = set()
+        if self._regex is None:
+            return hits
+        for match in self._regex.finditer(text):
+            marker = match.group(1)
+            if marker not in hits:
+                hits.add(marker)
+                hits.update(self._prefixes[marker])
+        return hits
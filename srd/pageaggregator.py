@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import math
+from bisect import bisect_right
 
 try:
     # from PDFPageDetailedAggregator:
@@ -23,18 +24,14 @@ except NameError:
 
 # TODO:
 from srd import (
-    objDict,
     BBox,
     DocChunk,
     clean_frag_text,
-    clean_frag,
-    same_style,
-    frag_dict,
+    new_frag,
+)
+from srd.profiling import (
+    nullProfiler,
 )
-
-
-def ltannoDict(ltanno):
-    return objDict(ltanno)
 
 
 '''
@@ -68,84 +65,168 @@ class PDFPageDetailedAggregator(PDFPageAggregator):
     """
 
     def __init__(self, rsrcmgr, pageno=1, laparams=None,
-                 colStarts=None):
+                 colStarts=None, verbose=True, captureAnnotations=True,
+                 profiler=None):
+        '''
+        Keyword arguments:
+        colStarts -- The x coordinate where each column starts.
+        verbose -- Show the number of columns.
+        captureAnnotations -- Store each LTAnno (space or newline
+            inferred by pdfminer) in a chunk's annotations as an
+            [offset, text] pair, where offset is the number of
+            characters before it in the raw text of the line (before
+            whitespace is collapsed). If False, annotations of every
+            chunk is None.
+        profiler -- Time the "layout" and "receive_layout" stages of
+            each page (see srd.profiling).
+        '''
         PDFPageAggregator.__init__(self, rsrcmgr, pageno=pageno, laparams=laparams)
-        self.chunks = []
-        self.colStarts = colStarts
-        if self.colStarts is not None:
+        self.pages = {}  # The sorted list of chunks for each page_number
+        self.colStarts = colStarts  # also sets _colMins
+        self.captureAnnotations = captureAnnotations
+        self.profiler = profiler
+        if self.profiler is None:
+            self.profiler = nullProfiler
+        if verbose and (self.colStarts is not None):
             print("columns: {}".format(len(self.colStarts)))
         self.page_number = 0
 
+    @property
+    def colStarts(self):
+        return self._colStarts
+
+    @colStarts.setter
+    def colStarts(self, colStarts):
+        '''
+        Set the x coordinate where each column starts (any number of
+        columns, or None for one column).
+        '''
+        self._colStarts = colStarts
+        self._colMins = None
+        if (colStarts is not None) and (len(colStarts) > 1):
+            # A line is in the last column that starts at or before its
+            # x0 (rounded down so that a line at the measured start is
+            # never put in the previous column).
+            self._colMins = sorted(math.floor(x) for x in colStarts)
+
+    def columnOf(self, x0):
+        '''
+        Get the index of the column that contains x0 (text left of the
+        first column is in column 0).
+        '''
+        if self._colMins is None:
+            return 0
+        col = bisect_right(self._colMins, x0) - 1
+        if col < 0:
+            return 0
+        return col
+
+    @property
+    def chunks(self):
+        '''
+        Get a new list of all chunks in the order of pageid then column
+        then top to bottom.
+        '''
+        chunks = []
+        for pageid, pageChunks in self.iterPages():
+            chunks += pageChunks
+        return chunks
+
+    def iterPages(self):
+        '''
+        Iterate through (pageid, chunks) for each page received so far in
+        pageid order where chunks is sorted by column then top to bottom.
+        '''
+        for pageid in sorted(self.pages):
+            yield pageid, self.pages[pageid]
+
+    def popPages(self):
+        '''
+        Do the same as iterPages but remove each page after it is
+        yielded, so that chunks of finished pages can be streamed
+        without keeping them in memory.
+        '''
+        for pageid in sorted(self.pages):
+            yield pageid, self.pages.pop(pageid)
+
+    def addPage(self, pageid, chunks):
+        '''
+        Add the sorted chunks of a page that was already processed (such
+        as by a previous run) instead of receiving its layout.
+        '''
+        self.pages[pageid] = chunks
+        self.page_number = pageid + 1
+
+    def end_page(self, page):
+        # This is the same as PDFLayoutAnalyzer.end_page except that
+        # layout analysis and receive_layout are timed separately.
+        assert not self._stack, str(len(self._stack))
+        assert isinstance(self.cur_item, LTPage), str(type(self.cur_item))
+        with self.profiler.stage("layout"):
+            if self.laparams is not None:
+                self.cur_item.analyze(self.laparams)
+        self.pageno += 1
+        with self.profiler.stage("receive_layout"):
+            self.receive_layout(self.cur_item)
+
     def receive_layout(self, ltpage):
+        pageChunks = []
+
         def render(item, page_number):
             if isinstance(item, LTPage) or isinstance(item, LTTextBox):
                 for child in item:
                     render(child, page_number)
             elif isinstance(item, LTTextLine):
-                child_str = ''
-                fontSize = None
-                fontName = None
-                fontSizes = []
-                fontNames = []
-                warnings = []
-                parts = []
+                # Build the style runs while visiting each character
+                # once: a run ends when the fontname or size changes.
+                texts = []  # all text including LTAnno (joined below)
+                offset = 0  # The number of characters in texts
                 fragments = []
-                annotations = []
+                annotations = None
+                if self.captureAnnotations:
+                    annotations = []
+                runTexts = []
+                runFont = None
+                runSize = None
                 for child in item:
-                    strp = None
                     if isinstance(child, LTChar):
-                        child_str += child.get_text()
-                        strp = child.get_text().strip()
-                        # and (len(strp) > 0)
-                        if fontName is not None:
-                            if fontName != child.fontname:
-                                warnings.append("mixed fontName")
-                        if fontSize is not None:
-                            if fontSize != child.size:
-                                warnings.append("mixed fontSize")
-                        fontName = child.fontname
-                        fontSize = child.size
-                        frag = frag_dict(
-                            child.get_text(),
-                            child.fontname,
-                            child.size,
-                        )
-                        fragments.append(frag)
-                        # fontNames.append(fontName)
-                        # fontSizes.append(fontSize)
-                        parts.append(strp)
+                        text = child.get_text()
+                        texts.append(text)
+                        offset += len(text)
+                        if ((child.fontname != runFont)
+                                or (child.size != runSize)):
+                            if len(runTexts) > 0:
+                                fragments.append(new_frag(
+                                    clean_frag_text("".join(runTexts)),
+                                    runFont,
+                                    runSize,
+                                ))
+                            runTexts = []
+                            runFont = child.fontname
+                            runSize = child.size
+                        runTexts.append(text)
                     elif isinstance(child, LTAnno):
-                        child_str += child.get_text()
-                        strp = child.get_text().strip()
-                        annotations.append(ltannoDict(child))
-
+                        text = child.get_text()
+                        if annotations is not None:
+                            annotations.append([offset, text])
+                        texts.append(text)
+                        offset += len(text)
+                if len(runTexts) > 0:
+                    fragments.append(new_frag(
+                        clean_frag_text("".join(runTexts)),
+                        runFont,
+                        runSize,
+                    ))
 
-                child_str = ' '.join(child_str.split()).strip()
+                child_str = ' '.join("".join(texts).split())
                 if child_str:
-                    if len(warnings) > 0:
-                        """
-                        print("Warnings in \"{}\":"
-                              " {}: fonts {} sizes {} parts {}"
-                              "".format(child_str, warnings, fontNames,
-                                        fontSizes, parts))
-                        input("Press enter to continue...")
-                        """
-                        fontSize = None
-                        fontName = None
-                    col = None
-                    cols = 0
-                    if self.colStarts is not None:
-                        cols = len(self.colStarts)
-                    if (cols is None) or (cols == 1):
-                        col = 0
-                    elif (cols == 2):
-                        col = 0
-                        col2Min = math.floor(self.colStarts[1])
-                        if item.bbox[0] >= col2Min:
-                            col = 1  # Index [1] is column 2.
-                    else:
-                        raise ValueError("Only a list of length 1 (same as None) or 2"
-                                         " is implemented for \"colStarts\".")
+                    # Only set the chunk's font if all of it is one style.
+                    fontName = None
+                    fontSize = None
+                    if len(fragments) == 1:
+                        fontName = runFont
+                        fontSize = runSize
+                    col = self.columnOf(item.bbox[0])
                     # if isinstance(child, LTChar):
                     '''
                     try:
@@ -169,12 +250,14 @@ class PDFPageDetailedAggregator(PDFPageAggregator):
                         fragments=fragments,
                         annotations=annotations,
                     )
-                    chunk.groupFragments()
-                    self.chunks.append(chunk)
-                for child in item:
-                    render(child, page_number)
+                    pageChunks.append(chunk)
+                # The children of an LTTextLine are only LTChar and
+                # LTAnno, so there is nothing to render in them.
             return
         render(ltpage, self.page_number)
+        # Only sort this page, since the pages are kept separate and
+        # every chunk in pageChunks has the same pageid.
+        pageChunks.sort(key = lambda f: (f.column, -f.bbox.y1))
+        self.pages.setdefault(self.page_number, []).extend(pageChunks)
         self.page_number += 1
-        self.chunks = sorted(self.chunks, key = lambda f: (f.pageid, f.column, -f.bbox.y1))
         self.result = ltpage
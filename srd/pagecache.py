@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+'''
+Keep the chunks of each page in a separate file so that generateChunks
+only has to interpret pages that changed (or weren't finished before an
+interrupted run).
+
+The key of a page is the hash of everything that can change its chunks:
+the page's content streams, its fonts and boxes, the LAParams settings,
+colStarts, captureAnnotations, and cacheVersion. The pageid is not part
+of the key, so pages that only moved (such as in a new edition with an
+inserted page) are still found, and the pageid of the cached chunks is
+replaced by the current one when they are loaded.
+'''
+import os
+import json
+import hashlib
+
+from srd import (
+    dictToChunk,
+)
+
+try:
+    from pdfminer.pdftypes import (
+        PDFStream,
+        resolve1,
+    )
+except ModuleNotFoundError:
+    # pagechunker shows the error since it requires pdfminer anyway.
+    pass
+
+# Change this whenever the aggregator produces different chunks from the
+# same page so that old cache files aren't used.
+cacheVersion = 2
+
+
+def settingsDict(laparams, colStarts, captureAnnotations=True):
+    '''
+    Get the settings that affect chunks as simple types.
+    '''
+    params = None
+    if laparams is not None:
+        params = {}
+        for k, v in sorted(vars(laparams).items()):
+            params[k] = v
+    return {
+        'cacheVersion': cacheVersion,
+        'laparams': params,
+        'colStarts': colStarts,
+        'captureAnnotations': captureAnnotations,
+    }
+
+
+class PageCache:
+    def __init__(self, directory, laparams=None, colStarts=None,
+                 captureAnnotations=True):
+        '''
+        Sequential arguments:
+        directory -- The directory that contains the cache (It is
+            created when the first page is stored).
+
+        Keyword arguments:
+        laparams -- The LAParams used by the aggregator.
+        colStarts -- The colStarts used by the aggregator.
+        captureAnnotations -- The captureAnnotations setting of the
+            aggregator.
+        '''
+        self.directory = directory
+        settings = settingsDict(laparams, colStarts,
+                                captureAnnotations=captureAnnotations)
+        self.settingsStr = json.dumps(settings, sort_keys=True,
+                                      default=repr)
+        self.hits = 0
+        self.misses = 0
+        self._streamHashes = {}
+
+    def plainPdfValue(self, value, depth=0):
+        '''
+        Convert a PDF object to simple types that can be hashed
+        deterministically (streams become the hash of their data).
+        '''
+        value = resolve1(value)
+        if depth > 8:
+            # Avoid cycles such as /Parent references.
+            return None
+        if isinstance(value, PDFStream):
+            # Fonts and images are shared by many pages, so only hash
+            # each stream once.
+            objid = getattr(value, 'objid', None)
+            got = self._streamHashes.get(objid)
+            if got is None:
+                got = hashlib.sha256(value.get_data()).hexdigest()
+                if objid is not None:
+                    self._streamHashes[objid] = got
+            return got
+        if isinstance(value, dict):
+            result = {}
+            for k, v in value.items():
+                if k == 'Parent':
+                    continue
+                result[str(k)] = self.plainPdfValue(v, depth=depth+1)
+            return result
+        if isinstance(value, (list, tuple)):
+            return [self.plainPdfValue(v, depth=depth+1) for v in value]
+        if isinstance(value, (bytes, bytearray)):
+            return value.hex()
+        if isinstance(value, (int, float, str, bool)) or (value is None):
+            return value
+        return repr(value)
+
+    def pageKey(self, page):
+        '''
+        Get the hex digest that identifies the content of a PDFPage.
+        '''
+        digest = hashlib.sha256(self.settingsStr.encode("utf-8"))
+        for stream in page.contents:
+            stream = resolve1(stream)
+            if isinstance(stream, PDFStream):
+                digest.update(stream.get_data())
+        described = {
+            'mediabox': page.mediabox,
+            'cropbox': page.cropbox,
+            'rotate': page.rotate,
+            'resources': self.plainPdfValue(page.resources),
+        }
+        digest.update(json.dumps(described, sort_keys=True,
+                                 default=repr).encode("utf-8"))
+        return digest.hexdigest()
+
+    def pagePath(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key, pageid):
+        '''
+        Get the list of DocChunk objects stored for the key, or None if
+        the page isn't in the cache.
+        '''
+        path = self.pagePath(key)
+        if not os.path.isfile(path):
+            self.misses += 1
+            return None
+        with open(path, 'r') as ins:
+            chunkDicts = json.load(ins)
+        chunks = []
+        for chunkD in chunkDicts:
+            chunk = dictToChunk(chunkD)
+            chunk.pageid = pageid
+            chunks.append(chunk)
+        self.hits += 1
+        return chunks
+
+    def put(self, key, chunks):
+        '''
+        Store the chunks of one page. The file is replaced atomically so
+        an interrupted run never leaves a partial page behind.
+        '''
+        path = self.pagePath(key)
+        parent = os.path.dirname(path)
+        if not os.path.isdir(parent):
+            os.makedirs(parent, exist_ok=True)
+        tmpPath = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmpPath, 'w') as outs:
+            json.dump([chunk.toDict() for chunk in chunks], outs)
+        os.replace(tmpPath, path)
@@ -7,8 +7,24 @@ from srd.pageaggregator import (
 from srd import (
     prerr,
 )
+from srd.pagecache import (
+    PageCache,
+)
+from srd.columns import (
+    detectColumnStarts,
+)
+from srd.profiling import (
+    Profiler,
+    nullProfiler,
+    pageStage,
+)
 
+import os
 import sys
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    as_completed,
+)
 
 try:
     from pprint import pprint
@@ -30,33 +46,295 @@ from io import (
 '''
 
 
-def setAllPageNumbers(device, pageid, pageNumberStr):
-    pageN = None
-    try:
-        pageN = int(pageNumberStr)
-    except ValueError as ex:
-        raise ValueError("WARNING: The page number for page id"
-                         " {} is unknown since the last text"
-                         " on the page is not an integer:"
-                         " \"{}\""
-                         "".format(pageid, pageNumberStr))
-        return
+def setPageNumbers(pages):
+    '''
+    Set pageN of every chunk to the visible page number, assuming that
+    the last text on each page is the page number. Each page is visited
+    once, so this takes linear time.
 
-    for chunk in device.chunks:
-        if chunk.pageid == pageid:
+    Sequential arguments:
+    pages -- An iterable of (pageid, chunks) where chunks is sorted
+        (such as from PDFPageDetailedAggregator.iterPages).
+
+    Returns:
+    A list of (pageid, text) for every page where the last text is not
+    an integer (pageN of those chunks stays None).
+    '''
+    badPages = []
+    for pageid, pageChunks in pages:
+        if len(pageChunks) < 1:
+            continue
+        pageNumberStr = pageChunks[-1].text
+        # ^ usually the page number is 1 higher than the pageid.
+        try:
+            pageN = int(pageNumberStr)
+        except ValueError:
+            badPages.append((pageid, pageNumberStr))
+            continue
+        for chunk in pageChunks:
             chunk.pageN = pageN
+    return badPages
+
+
+def checkPageNumbers(badPages):
+    '''
+    Raise ValueError describing every page in badPages (from
+    setPageNumbers) if there are any.
+    '''
+    if len(badPages) > 0:
+        lines = []
+        for pageid, pageNumberStr in badPages:
+            lines.append("- pageid {}: \"{}\"".format(pageid, pageNumberStr))
+        raise ValueError("The page number for {} page(s) is unknown since"
+                         " the last text on the page is not an integer:\n"
+                         "{}".format(len(badPages), "\n".join(lines)))
+
+
+def countPages(path):
+    with open(path, 'rb') as fp:
+        doc = PDFDocument(PDFParser(fp))
+        count = 0
+        for page in PDFPage.create_pages(doc):
+            count += 1
+    return count
+
+
+def processPage(interpreter, device, page, cache=None):
+    '''
+    Add the chunks of page to the device, using the cache if it has
+    them, otherwise interpreting the page and storing the chunks in the
+    cache. The stages "cache" and "interpret" (which includes "layout"
+    and "receive_layout") are timed by device.profiler.
+    '''
+    profiler = device.profiler
+    key = None
+    if cache is not None:
+        with profiler.stage("cache"):
+            key = cache.pageKey(page)
+            pageChunks = cache.get(key, device.page_number)
+        if pageChunks is not None:
+            device.addPage(device.page_number, pageChunks)
+            return
+    pageid = device.page_number
+    with profiler.stage("interpret"):
+        interpreter.process_page(page)
+    device.get_result()  # receive LTPage (runs receive_layout)
+    if cache is not None:
+        with profiler.stage("cache"):
+            cache.put(key, device.pages.get(pageid, []))
+
+
+def chunkPageRange(path, start, stop, colStarts=None, cacheDir=None,
+                   captureAnnotations=True, pageIndices=None,
+                   profiler=None):
+    '''
+    Get a list of (pageid, chunks) for the pages at indices start
+    through stop-1 (without page numbers) using a separate aggregator.
+    Each pageid is the index of the page in the whole document, so the
+    result is the same as that range of a serial run and can be used by
+    a worker process.
+
+    Keyword arguments:
+    pageIndices -- Only read pages in the range with an index in this
+        container (None for all of them).
+    profiler -- Time each stage of each page (see srd.profiling).
+    '''
+    if profiler is None:
+        profiler = nullProfiler
+    with open(path, 'rb') as fp:
+        parser = PDFParser(fp)
+        doc = PDFDocument(parser)
+        rsrcmgr = PDFResourceManager()
+        laparams = LAParams()
+        device = PDFPageDetailedAggregator(
+            rsrcmgr,
+            laparams=laparams,
+            colStarts=colStarts,
+            verbose=False,
+            captureAnnotations=captureAnnotations,
+            profiler=profiler,
+        )
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+        cache = None
+        if cacheDir is not None:
+            cache = PageCache(cacheDir, laparams=laparams,
+                              colStarts=colStarts,
+                              captureAnnotations=captureAnnotations)
+        for index, page in enumerate(PDFPage.create_pages(doc)):
+            if index >= stop:
+                break
+            if index < start:
+                continue
+            if (pageIndices is not None) and (index not in pageIndices):
+                continue
+            device.page_number = index
+            with profiler.stage(pageStage):
+                processPage(interpreter, device, page, cache=cache)
+    return list(device.iterPages())
+
+
+def chunkPageRangeProfiled(*args, **kwargs):
+    '''
+    Do the same as chunkPageRange with a new Profiler (for a worker
+    process).
+
+    Returns:
+    (pages, data) where pages is the result of chunkPageRange and data
+    is from Profiler.data (see Profiler.merge).
+    '''
+    profiler = Profiler()
+    pages = chunkPageRange(*args, profiler=profiler, **kwargs)
+    return pages, profiler.data()
 
 
-def generateChunks(path, pageid=None, colStarts=None, max_pageid=None):
+def pageRanges(count, shards):
+    '''
+    Split range(count) into at most the given number of contiguous
+    (start, stop) ranges that differ in length by no more than 1.
+    '''
+    shards = max(1, min(shards, count))
+    ranges = []
+    start = 0
+    for i in range(shards):
+        stop = start + (count - start) // (shards - i)
+        if stop > start:
+            ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def iterChunkPagesParallel(path, colStarts=None, workers=None,
+                           cacheDir=None, captureAnnotations=True,
+                           pageIndices=None, profiler=None, progress=None):
+    '''
+    Do the same thing as iterChunkPages but split the pages into
+    contiguous ranges and interpret each range in a separate process.
+    Ranges are yielded in page order as soon as every range before them
+    is done, so the result is identical to that of a serial run.
+
+    Keyword arguments:
+    workers -- The number of processes (None for os.cpu_count()).
+    pageIndices -- Only read pages with these indices (None for all).
+    profiler -- Add the time of each stage in each worker to this
+        Profiler (see srd.profiling).
+    progress -- Call this with the number of pages done and the total
+        instead of writing the progress to stderr.
     '''
+    rangeFunc = chunkPageRange
+    if profiler is None:
+        profiler = nullProfiler
+    else:
+        rangeFunc = chunkPageRangeProfiled
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if pageIndices is None:
+        selected = range(countPages(path))
+    else:
+        selected = sorted(set(pageIndices))
+    count = len(selected)
+    # More ranges than workers keeps every worker busy even if some
+    # pages take much longer than others. Each range has the same number
+    # of chosen pages.
+    ranges = []
+    rangeCounts = []
+    for first, last in pageRanges(count, workers * 4):
+        ranges.append((selected[first], selected[last-1] + 1))
+        rangeCounts.append(last - first)
+    onlyIndices = None
+    if pageIndices is not None:
+        onlyIndices = set(selected)
+    results = {}
+    nextIndex = 0
+    done = 0
+    badPages = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for i, (start, stop) in enumerate(ranges):
+            future = pool.submit(rangeFunc, path, start, stop,
+                                 colStarts=colStarts, cacheDir=cacheDir,
+                                 captureAnnotations=captureAnnotations,
+                                 pageIndices=onlyIndices)
+            futures[future] = i
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            if rangeFunc is chunkPageRangeProfiled:
+                results[i], data = results[i]
+                profiler.merge(data)
+            done += rangeCounts[i]
+            if progress is not None:
+                progress(done, count)
+            else:
+                sys.stderr.write("\rRead {}/{} pages ({}%)    "
+                                 "".format(done, count,
+                                           int(float(done) / count * 100)))
+                sys.stderr.flush()
+            while nextIndex in results:
+                for pageid, pageChunks in results.pop(nextIndex):
+                    with profiler.stage("numbering"):
+                        badPages += setPageNumbers([(pageid, pageChunks)])
+                    yield pageid, pageChunks
+                nextIndex += 1
+    if progress is None:
+        sys.stderr.write("\n")
+        sys.stderr.flush()
+    checkPageNumbers(badPages)
+
+
+def iterChunkPages(path, pageid=None, colStarts=None, max_pageid=None,
+                   workers=1, cacheDir=None, captureAnnotations=True,
+                   pageIndices=None, profiler=None, progress=None):
+    '''
+    Yield (pageid, chunks) for each page as soon as it is done, with
+    pageN already set, so that chunks can be saved or processed without
+    keeping the whole document in memory. If the last text on any page
+    isn't an integer, ValueError is raised after the last page.
+
     This function is based on code from
     lindblandro's Oct 4 '13 at 10:33 answer
     edited by slushy Feb 4 '14 at 23:41
     at <https://stackoverflow.com/a/19179114>
     on <https://stackoverflow.com/questions/15737806/extract-text-using-
     pdfminer-and-pypdf2-merges-columns>.
+
+    Keyword arguments:
+    pageid -- Only read the page with this PDF object id.
+    colStarts -- The x coordinate where each column starts (any number
+        of columns), None for one column, or "auto" to detect them
+        using srd.columns.detectColumnStarts.
+    max_pageid -- Deprecated and ignored: the progress is now based on
+        the page count of the document.
+    workers -- Interpret pages using this many processes (None for
+        os.cpu_count()). It is ignored if pageid is set.
+    cacheDir -- Keep the chunks of each page in this directory (see
+        PageCache) and only interpret pages that aren't there yet.
+    captureAnnotations -- Store the LTAnno objects of each chunk (see
+        PDFPageDetailedAggregator). Turn it off if annotations are never
+        used to save time and space.
+    pageIndices -- Only read the pages with these indices (the same as
+        the pageid of each chunk, starting at 0), such as from
+        srd.pageselect.selectPages (None for every page).
+    profiler -- Time each stage of each page, such as "interpret" and
+        "receive_layout" (see srd.profiling).
+    progress -- Call this with the number of pages done and the total
+        (such as to show the progress of several documents at once)
+        instead of writing the progress to stderr.
     '''
-    global indent
+    if colStarts == "auto":
+        colStarts = detectColumnStarts(path, pageIndices=pageIndices)
+        prerr("* detected column starts: {}".format(colStarts))
+    if (pageid is None) and (workers != 1):
+        for page in iterChunkPagesParallel(
+                path, colStarts=colStarts, workers=workers,
+                cacheDir=cacheDir, captureAnnotations=captureAnnotations,
+                pageIndices=pageIndices, profiler=profiler,
+                progress=progress):
+            yield page
+        return
+    if profiler is None:
+        profiler = nullProfiler
+    if pageIndices is not None:
+        pageIndices = set(pageIndices)
     fp = open(path, 'rb')
     parser = PDFParser(fp)
     doc = PDFDocument(parser)
@@ -68,55 +346,68 @@ def generateChunks(path, pageid=None, colStarts=None, max_pageid=None):
         rsrcmgr,
         laparams=laparams,
         colStarts=colStarts,
+        captureAnnotations=captureAnnotations,
+        profiler=profiler,
     )
     interpreter = PDFPageInterpreter(rsrcmgr, device)
+    cache = None
+    if cacheDir is not None:
+        cache = PageCache(cacheDir, laparams=laparams, colStarts=colStarts,
+                          captureAnnotations=captureAnnotations)
+    badPages = []
 
-    UNKNOWN = 0
-    CONTEXT_MONSTERS = 1
-    CONTEXT_APPENDIX_A = 2
-
-    for page in PDFPage.create_pages(doc):
+    # The page count is read from the document (Listing the pages
+    # doesn't interpret them, so it takes almost no time).
+    pages = list(PDFPage.create_pages(doc))
+    total = len(pages)
+    if pageIndices is not None:
+        total = len([i for i in range(len(pages)) if i in pageIndices])
+    done = 0
+    for index, page in enumerate(pages):
+        if (pageIndices is not None) and (index not in pageIndices):
+            continue
         if (pageid is None) or (pageid==page.pageid):
             # print("page: {}".format(dir(page)))
             # ^ page: ['INHERITABLE_ATTRS', '__class__', '__delattr__', '__dict__', '__dir__', '__doc__', '__eq__', '__format__', '__ge__', '__getattribute__', '__gt__', '__hash__', '__init__', '__init_subclass__', '__le__', '__lt__', '__module__', '__ne__', '__new__', '__reduce__', '__reduce_ex__', '__repr__', '__setattr__', '__sizeof__', '__str__', '__subclasshook__', '__weakref__', 'annots', 'attrs', 'beads', 'contents', 'create_pages', 'cropbox', 'debug', 'doc', 'get_pages', 'lastmod', 'mediabox', 'pageid', 'resources', 'rotate']
-            progressTotalStr = ""
-            percentStr = ""
-            if max_pageid is not None:
-                progressTotalStr = "/" + str(max_pageid)
-                percent = float(page.pageid) / float(max_pageid) * 100
-                percentStr = " ({}%)".format(int(percent))
-                sys.stderr.write("\r")  # overwrite
-            sys.stderr.write("Reading pageid {}{}{}    "
-                             "".format(page.pageid, progressTotalStr,
-                                       percentStr))
-            sys.stderr.flush()
-            interpreter.process_page(page)
-            device.get_result()  # receive LTPage (runs receive_layout)
-            # NOTE: There is no point in iterating chunks here,
-            # because the list stored in device.chunks will grow on each
-            # iteration and the page numbers are not distinguished yet.
+            done += 1
+            if progress is None:
+                sys.stderr.write("\rReading page {} ({}/{}, {}%)    "
+                                 "".format(index + 1, done, total,
+                                           int(float(done) / total * 100)))
+                sys.stderr.flush()
+            device.page_number = index
+            with profiler.stage(pageStage):
+                processPage(interpreter, device, page, cache=cache)
+            # The page is complete, so its number is known and it can be
+            # handed off.
+            for donePage in device.popPages():
+                with profiler.stage("numbering"):
+                    badPages += setPageNumbers([donePage])
+                yield donePage
+            if progress is not None:
+                progress(done, total)
             if pageid is not None:
                 break
-    sys.stderr.write("\n")
-    sys.stderr.flush()
-
-    # pprint(device.rows)
-    prevChunk = None
-    pageN = None
-
-    for chunk in device.chunks:
-        if prevChunk is not None:
-            if prevChunk.pageid != chunk.pageid:
-                setAllPageNumbers(device, prevChunk.pageid,
-                                  prevChunk.text)
-                # Assume that the last text on the page is the (visible)
-                # page number if it is a number.
-                # print("page {} ended with {}"
-                #       "".format(prevChunk.pageid, prevChunk.text))
-                # ^ usually the page number is 1 higher than the pageid.
-        prevChunk = chunk
-
-    if prevChunk is not None:
-        setAllPageNumbers(device, prevChunk.pageid, prevChunk.text)
-
-    return device.chunks
+    fp.close()
+    if progress is None:
+        sys.stderr.write("\n")
+        sys.stderr.flush()
+    checkPageNumbers(badPages)
+
+
+def generateChunks(path, pageid=None, colStarts=None, max_pageid=None,
+                   workers=1, cacheDir=None, captureAnnotations=True,
+                   pageIndices=None, profiler=None, progress=None):
+    '''
+    Get a list of every chunk in the document in order of pageid then
+    column then top to bottom. For the keyword arguments, see
+    iterChunkPages.
+    '''
+    chunks = []
+    for donePageid, pageChunks in iterChunkPages(
+            path, pageid=pageid, colStarts=colStarts,
+            max_pageid=max_pageid, workers=workers, cacheDir=cacheDir,
+            captureAnnotations=captureAnnotations, pageIndices=pageIndices,
+            profiler=profiler, progress=progress):
+        chunks += pageChunks
+    return chunks
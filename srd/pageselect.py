@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+'''
+Choose which pages of a PDF to read so that a run can be limited to part
+of a document (such as only the bestiary). Pages can be chosen by index
+(the same as the pageid of a chunk, starting at 0), by printed page
+label (from the /PageLabels of the document, or the page number if it
+has none), or by outline (bookmark) section.
+
+A page spec is a comma-separated list of labels and ranges, such as
+"iv,12-15,300-" (a range with no end continues to the last page). An
+item with one "-" is a single page if it is a label (such as "A-1") or
+if it is not two numbers and the labels aren't known. Separate a range
+of labels that contain "-" with ".." instead, such as "A-1..A-9".
+'''
+import itertools
+
+from srd import (
+    prerr,
+)
+
+try:
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdfdocument import (
+        PDFDocument,
+        PDFNoOutlines,
+        PDFNoPageLabels,
+    )
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdftypes import resolve1
+    from pdfminer.psparser import PSLiteral
+except ModuleNotFoundError:
+    # pagechunker shows the error since it requires pdfminer anyway.
+    pass
+
+
+def _isDashRange(item, labels):
+    if (labels is not None) and (item in labels):
+        return False
+    first, last = item.split("-")
+    if first.strip().isdigit() and (last.strip().isdigit()
+                                    or not last.strip()):
+        return True
+    return labels is not None
+
+
+def parsePageSpec(spec, labels=None):
+    '''
+    Split a page spec (see the module documentation) into a list of
+    (first, last) pairs of labels, where last is None for an open range
+    and first is last for a single page.
+
+    Keyword arguments:
+    labels -- The labels of the pages (such as from getPageLabels) so
+        that an item with "-" that is a label is one page and any other
+        is a range. If None, only numbers such as "12-15" or "300-"
+        are split at "-".
+    '''
+    if labels is not None:
+        labels = set(labels)
+    pairs = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if ".." in item:
+            first, last = item.split("..", 1)
+        elif (item.count("-") == 1) and _isDashRange(item, labels):
+            first, last = item.split("-")
+        else:
+            first = last = item
+        first = first.strip()
+        last = last.strip()
+        if not first:
+            raise ValueError("The page range \"{}\" has no start."
+                             "".format(item))
+        if not last:
+            last = None
+        pairs.append((first, last))
+    return pairs
+
+
+def getPageLabels(doc, count):
+    '''
+    Get the printed label of each of the count pages of a PDFDocument
+    (the page number starting at "1" if it has no /PageLabels).
+    '''
+    try:
+        return list(itertools.islice(doc.get_page_labels(), count))
+    except PDFNoPageLabels:
+        return [str(index + 1) for index in range(count)]
+
+
+def labelIndices(labels, spec):
+    '''
+    Get the sorted list of page indices chosen by a page spec, where
+    labels is from getPageLabels. If a label occurs more than once,
+    the first page with it is used.
+    '''
+    firstIndex = {}
+    for index, label in enumerate(labels):
+        firstIndex.setdefault(label, index)
+    indices = set()
+    for first, last in parsePageSpec(spec, labels=firstIndex):
+        start = firstIndex.get(first)
+        if start is None:
+            raise ValueError("There is no page labeled \"{}\"."
+                             "".format(first))
+        end = len(labels) - 1
+        if last is not None:
+            end = firstIndex.get(last)
+            if end is None:
+                raise ValueError("There is no page labeled \"{}\"."
+                                 "".format(last))
+        if end < start:
+            raise ValueError("The page range {}-{} ends before it starts."
+                             "".format(first, last))
+        indices.update(range(start, end + 1))
+    return sorted(indices)
+
+
+def _destPageIndex(doc, dest, action, pageIndices):
+    '''
+    Get the index of the page that an outline item goes to, or None.
+
+    Sequential arguments:
+    pageIndices -- A dict where each key is the objid of a page and
+        the value is its index.
+    '''
+    dest = resolve1(dest)
+    if dest is None:
+        action = resolve1(action)
+        if isinstance(action, dict):
+            dest = resolve1(action.get('D'))
+    if isinstance(dest, PSLiteral):
+        dest = dest.name
+    if isinstance(dest, (str, bytes)):
+        try:
+            dest = resolve1(doc.get_dest(dest))
+        except KeyError:
+            # PDFDestinationNotFound is a KeyError.
+            return None
+    if isinstance(dest, dict):
+        dest = resolve1(dest.get('D'))
+    if isinstance(dest, list) and (len(dest) > 0):
+        return pageIndices.get(getattr(dest[0], 'objid', None))
+    return None
+
+
+def outlineSections(doc, pages):
+    '''
+    Get a list of (level, title, start, stop) for each outline item of
+    a PDFDocument, where start is the index of its page and stop is the
+    index of the page of the next item at the same or a higher level
+    (or the page count), so pages start to stop-1 are the section. The
+    list is empty if the document has no outline.
+
+    Sequential arguments:
+    pages -- The list of PDFPage objects of the document.
+    '''
+    pageIndices = {}
+    for index, page in enumerate(pages):
+        pageIndices[page.pageid] = index
+    items = []
+    try:
+        for level, title, dest, action, se in doc.get_outlines():
+            start = _destPageIndex(doc, dest, action, pageIndices)
+            if start is not None:
+                items.append((level, title.strip(), start))
+    except PDFNoOutlines:
+        return []
+    sections = []
+    for i, (level, title, start) in enumerate(items):
+        stop = len(pages)
+        for nextLevel, nextTitle, nextStart in items[i+1:]:
+            if nextLevel <= level:
+                stop = nextStart
+                break
+        # Include the start page even if the next item is on it.
+        stop = max(stop, start + 1)
+        sections.append((level, title, start, stop))
+    return sections
+
+
+def sectionIndices(sections, titles):
+    '''
+    Get the sorted list of page indices in the outline sections (from
+    outlineSections) that have any of the given titles or start with
+    one of them (so "Appendix MM" chooses "Appendix MM-A: ..." and
+    "Appendix MM-B: ...").
+    '''
+    indices = set()
+    matched = set()
+    for level, title, start, stop in sections:
+        for query in titles:
+            if title.startswith(query):
+                indices.update(range(start, stop))
+                matched.add(query)
+    missing = [query for query in titles if query not in matched]
+    if len(missing) > 0:
+        raise ValueError("The outline has no section starting with: {}"
+                         "".format(", ".join(missing)))
+    return sorted(indices)
+
+
+def selectPages(path, labels=None, sections=None, indices=None):
+    '''
+    Get the sorted list of indices of the pages chosen by any of the
+    arguments, or None to read every page if no argument is set.
+
+    Sequential arguments:
+    path -- The PDF file.
+
+    Keyword arguments:
+    labels -- A page spec of printed page labels (see parsePageSpec).
+    sections -- A list of outline titles (see sectionIndices).
+    indices -- An iterable of page indices.
+    '''
+    if (labels is None) and (sections is None) and (indices is None):
+        return None
+    chosen = set()
+    if indices is not None:
+        chosen.update(indices)
+    if (labels is not None) or (sections is not None):
+        with open(path, 'rb') as fp:
+            doc = PDFDocument(PDFParser(fp))
+            pages = list(PDFPage.create_pages(doc))
+            if labels is not None:
+                chosen.update(labelIndices(getPageLabels(doc, len(pages)),
+                                           labels))
+            if sections is not None:
+                found = outlineSections(doc, pages)
+                if len(found) == 0:
+                    prerr("\"{}\" has no outline, so no pages can be"
+                          " chosen by section.".format(path))
+                chosen.update(sectionIndices(found, sections))
+    return sorted(chosen)
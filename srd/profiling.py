@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+'''
+Measure where the time of a run goes. Pass a Profiler as the profiler
+argument of main, generateChunks, iterChunkPages or processChunks, and
+each stage (such as "interpret", "layout", "receive_layout",
+"numbering", "saveChunks" or "processChunks") is timed using wall and
+CPU clocks. Stages can be nested: the self time of a stage excludes the
+time of stages inside it, so the self times add up to the time of the
+run. Call report at the end to get a summary with a histogram of the
+time of each page.
+
+To see which functions take the time in one stage, set profileStage
+(and optionally profilePath for a pstats file that can be read by
+python3 -m pstats). Only the time spent in that stage is profiled.
+
+Stages run by worker processes (workers other than 1) are measured in
+each worker and added to the parent's totals, but profileStage only
+profiles the parent process.
+'''
+import io
+import math
+import time
+import cProfile
+import pstats
+
+pageStage = "page"
+
+
+class StageTimer:
+    '''
+    Time one stage of a Profiler. Use it as a context manager (from
+    Profiler.stage).
+    '''
+    __slots__ = ('profiler', 'name', 'wall', 'cpu', 'childWall',
+                 'childCpu')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.childWall = 0.0
+        self.childCpu = 0.0
+
+    def __enter__(self):
+        profiler = self.profiler
+        profiler._stack.append(self)
+        if (profiler._cprofile is not None) and (
+                self.name == profiler.profileStage):
+            profiler._profiling += 1
+            if profiler._profiling == 1:
+                profiler._cprofile.enable()
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        profiler = self.profiler
+        if (profiler._cprofile is not None) and (
+                self.name == profiler.profileStage):
+            profiler._profiling -= 1
+            if profiler._profiling == 0:
+                profiler._cprofile.disable()
+        profiler._stack.pop()
+        if len(profiler._stack) > 0:
+            parent = profiler._stack[-1]
+            parent.childWall += wall
+            parent.childCpu += cpu
+        profiler.add(self.name, wall, cpu, selfWall=wall-self.childWall,
+                     selfCpu=cpu-self.childCpu)
+
+
+class Profiler:
+    def __init__(self, profileStage=None, profilePath=None,
+                 sortKey="cumulative"):
+        '''
+        Keyword arguments:
+        profileStage -- Run cProfile only while this stage runs (None
+            to only time stages).
+        profilePath -- Write the cProfile stats here (None to show the
+            functions that took the most time in the report).
+        sortKey -- How to sort the functions in the report (see
+            pstats.Stats.sort_stats).
+        '''
+        self.profileStage = profileStage
+        self.profilePath = profilePath
+        self.sortKey = sortKey
+        # name: [calls, wall, cpu, selfWall, selfCpu]
+        self.totals = {}
+        self.order = []  # Stage names in the order first seen
+        self.samples = {}  # The wall time of each call of each stage
+        self.merged = False  # True if another Profiler's times were added
+        self._stack = []
+        self._profiling = 0
+        self._cprofile = None
+        if profileStage is not None:
+            self._cprofile = cProfile.Profile()
+        self.start = time.perf_counter()
+        self.startCpu = time.process_time()
+
+    def stage(self, name):
+        '''
+        Get a context manager that times a stage, such as:
+        with profiler.stage("layout"):
+            ...
+        '''
+        return StageTimer(self, name)
+
+    def add(self, name, wall, cpu, selfWall=None, selfCpu=None, calls=1,
+            samples=None):
+        '''
+        Add time to a stage (for times measured elsewhere, such as by a
+        worker process).
+
+        Keyword arguments:
+        samples -- A list of the time of each call (None for [wall]).
+        '''
+        if selfWall is None:
+            selfWall = wall
+        if selfCpu is None:
+            selfCpu = cpu
+        total = self.totals.get(name)
+        if total is None:
+            total = [0, 0.0, 0.0, 0.0, 0.0]
+            self.totals[name] = total
+            self.order.append(name)
+            self.samples[name] = []
+        total[0] += calls
+        total[1] += wall
+        total[2] += cpu
+        total[3] += selfWall
+        total[4] += selfCpu
+        if samples is None:
+            self.samples[name].append(wall)
+        else:
+            self.samples[name] += samples
+
+    def data(self):
+        '''
+        Get the totals and samples as simple types (so they can be sent
+        from a worker process and added using merge).
+        '''
+        return {
+            'order': self.order,
+            'totals': self.totals,
+            'samples': self.samples,
+        }
+
+    def merge(self, data):
+        '''
+        Add the totals and samples from the data of another Profiler.
+        '''
+        self.merged = True
+        for name in data['order']:
+            calls, wall, cpu, selfWall, selfCpu = data['totals'][name]
+            self.add(name, wall, cpu, selfWall=selfWall, selfCpu=selfCpu,
+                     calls=calls, samples=data['samples'][name])
+
+    def histogram(self, name=pageStage, width=40):
+        '''
+        Get lines that show how many calls of a stage took each range of
+        time (each range is twice as long as the previous one).
+        '''
+        samples = self.samples.get(name)
+        if not samples:
+            return []
+        buckets = {}
+        for seconds in samples:
+            ms = seconds * 1000.0
+            bucket = 0
+            if ms > 0:
+                bucket = max(0, int(math.floor(math.log2(ms))) + 1)
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+        most = max(buckets.values())
+        lines = []
+        for bucket in range(min(buckets), max(buckets) + 1):
+            count = buckets.get(bucket, 0)
+            low = 0.0
+            if bucket > 0:
+                low = 2.0 ** (bucket - 1)
+            high = 2.0 ** bucket
+            bar = "#" * int(math.ceil(float(count) / most * width))
+            lines.append("  {:>8.1f}-{:<8.1f} ms {:>6} {}"
+                         "".format(low, high, count, bar))
+        return lines
+
+    def report(self):
+        '''
+        Get the summary of every stage as text.
+        '''
+        wall = time.perf_counter() - self.start
+        cpu = time.process_time() - self.startCpu
+        lines = []
+        lines.append("Profile (wall {:.3f} s, CPU {:.3f} s):"
+                     "".format(wall, cpu))
+        lines.append("  {:<16} {:>8} {:>10} {:>10} {:>10} {:>6} {:>10}"
+                     "".format("stage", "calls", "wall s", "self s",
+                               "self CPU s", "self%", "ms/call"))
+        for name in self.order:
+            calls, stageWall, stageCpu, selfWall, selfCpu = self.totals[name]
+            percent = 0.0
+            if wall > 0:
+                percent = selfWall / wall * 100.0
+            lines.append("  {:<16} {:>8} {:>10.3f} {:>10.3f} {:>10.3f}"
+                         " {:>6.1f} {:>10.3f}"
+                         "".format(name, calls, stageWall, selfWall,
+                                   selfCpu, percent,
+                                   stageWall / calls * 1000.0))
+        if self.merged:
+            lines.append("  (Stages include the time of worker processes,"
+                         " so they can add up to more than the wall"
+                         " time.)")
+        histogram = self.histogram(pageStage)
+        if len(histogram) > 0:
+            lines.append("Time per page:")
+            lines += histogram
+        if self._cprofile is not None:
+            if self.profilePath is not None:
+                self._cprofile.dump_stats(self.profilePath)
+                lines.append("* wrote the profile of \"{}\" to \"{}\""
+                             "".format(self.profileStage,
+                                       self.profilePath))
+            else:
+                stream = io.StringIO()
+                stats = pstats.Stats(self._cprofile, stream=stream)
+                stats.sort_stats(self.sortKey).print_stats(25)
+                lines.append("Profile of \"{}\":".format(self.profileStage))
+                lines.append(stream.getvalue().rstrip())
+        return "\n".join(lines)
+
+
+class NullStage:
+    '''
+    A context manager that does nothing (see NullProfiler).
+    '''
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
+
+
+nullStage = NullStage()
+
+
+class NullProfiler:
+    '''
+    Do nothing with stages so that code can always call
+    profiler.stage(...) (This is the default profiler).
+    '''
+    def stage(self, name):
+        return nullStage
+
+    def add(self, *args, **kwargs):
+        pass
+
+
+nullProfiler = NullProfiler()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+'''
+Find chunks by where they are on a page instead of scanning the page's
+whole chunk list. A PageIndex puts each chunk of one page in every cell
+of a uniform grid that its bbox touches, so a region or nearest-chunk
+query only looks at chunks in nearby cells. Chunks are also kept sorted
+by the bottom of their bbox (the baseline of a line), so chunks on the
+same baseline (such as each part of a stat row or a table row) are
+found with a binary search.
+
+Coordinates are PDF points with y increasing upward, the same as
+DocChunk.bbox (x1, y1 is the bottom left and x2, y2 is the top right).
+'''
+import math
+from bisect import (
+    bisect_left,
+    bisect_right,
+)
+
+
+def pointDistance(bbox, x, y):
+    '''
+    Get the distance from a point to the nearest part of a BBox (0 if
+    the point is inside it).
+    '''
+    dx = max(bbox.x1 - x, 0.0, x - bbox.x2)
+    dy = max(bbox.y1 - y, 0.0, y - bbox.y2)
+    return math.hypot(dx, dy)
+
+
+class PageIndex:
+    def __init__(self, chunks, cellSize=36.0):
+        '''
+        Sequential arguments:
+        chunks -- The DocChunk objects of one page.
+
+        Keyword arguments:
+        cellSize -- The width and height of each grid cell in points
+            (about the height of a few lines works well).
+        '''
+        self.chunks = list(chunks)
+        self.cellSize = float(cellSize)
+        self._cells = {}
+        self._minCell = None
+        self._maxCell = None
+        bottoms = []
+        for index, chunk in enumerate(self.chunks):
+            bbox = chunk.bbox
+            cx1, cy1 = self._cell(bbox.x1, bbox.y1)
+            cx2, cy2 = self._cell(bbox.x2, bbox.y2)
+            for cx in range(cx1, cx2 + 1):
+                for cy in range(cy1, cy2 + 1):
+                    self._cells.setdefault((cx, cy), []).append(index)
+            if self._minCell is None:
+                self._minCell = [cx1, cy1]
+                self._maxCell = [cx2, cy2]
+            else:
+                self._minCell = [min(self._minCell[0], cx1),
+                                 min(self._minCell[1], cy1)]
+                self._maxCell = [max(self._maxCell[0], cx2),
+                                 max(self._maxCell[1], cy2)]
+            bottoms.append((bbox.y1, index))
+        bottoms.sort()
+        self._bottoms = [bottom for bottom, index in bottoms]
+        self._bottomIndices = [index for bottom, index in bottoms]
+
+    def _cell(self, x, y):
+        return (int(math.floor(x / self.cellSize)),
+                int(math.floor(y / self.cellSize)))
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def region(self, x1, y1, x2, y2, contained=False):
+        '''
+        Get the chunks (in page order) whose bbox overlaps the rectangle
+        (or is entirely inside it if contained is True).
+        '''
+        if len(self.chunks) == 0:
+            return []
+        cx1, cy1 = self._cell(x1, y1)
+        cx2, cy2 = self._cell(x2, y2)
+        cx1 = max(cx1, self._minCell[0])
+        cy1 = max(cy1, self._minCell[1])
+        cx2 = min(cx2, self._maxCell[0])
+        cy2 = min(cy2, self._maxCell[1])
+        found = set()
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                found.update(self._cells.get((cx, cy), ()))
+        results = []
+        for index in sorted(found):
+            bbox = self.chunks[index].bbox
+            if contained:
+                if ((bbox.x1 >= x1) and (bbox.x2 <= x2)
+                        and (bbox.y1 >= y1) and (bbox.y2 <= y2)):
+                    results.append(self.chunks[index])
+            elif ((bbox.x1 <= x2) and (bbox.x2 >= x1)
+                    and (bbox.y1 <= y2) and (bbox.y2 >= y1)):
+                results.append(self.chunks[index])
+        return results
+
+    def nearest(self, x, y, k=1, maxDistance=None, exclude=None):
+        '''
+        Get a list of up to k (distance, chunk) pairs for the chunks
+        nearest to a point (see pointDistance), nearest first.
+
+        Keyword arguments:
+        maxDistance -- Ignore chunks farther away than this.
+        exclude -- Ignore this chunk (such as the one the point is
+            from).
+        '''
+        if (len(self.chunks) == 0) or (k < 1):
+            return []
+        cx, cy = self._cell(x, y)
+        # The farthest ring of cells that contains any chunk:
+        lastRing = max(abs(cx - self._minCell[0]),
+                       abs(cx - self._maxCell[0]),
+                       abs(cy - self._minCell[1]),
+                       abs(cy - self._maxCell[1]))
+        seen = set()
+        best = []  # (distance, index)
+        ring = 0
+        while ring <= lastRing:
+            for cell in self._ring(cx, cy, ring):
+                for index in self._cells.get(cell, ()):
+                    if index in seen:
+                        continue
+                    seen.add(index)
+                    chunk = self.chunks[index]
+                    if chunk is exclude:
+                        continue
+                    distance = pointDistance(chunk.bbox, x, y)
+                    if (maxDistance is not None) and (distance > maxDistance):
+                        continue
+                    best.append((distance, index))
+            best.sort()
+            del best[k:]
+            # Any chunk not seen yet is in a farther ring, so it is at
+            # least this far away:
+            bound = ring * self.cellSize
+            if (len(best) == k) and (best[-1][0] <= bound):
+                break
+            if (maxDistance is not None) and (bound > maxDistance):
+                break
+            ring += 1
+        return [(distance, self.chunks[index]) for distance, index in best]
+
+    @staticmethod
+    def _ring(cx, cy, ring):
+        '''
+        Yield each cell at exactly ring cells (horizontally, vertically
+        or diagonally) from cx, cy.
+        '''
+        if ring == 0:
+            yield (cx, cy)
+            return
+        for dx in range(-ring, ring + 1):
+            yield (cx + dx, cy - ring)
+            yield (cx + dx, cy + ring)
+        for dy in range(-ring + 1, ring):
+            yield (cx - ring, cy + dy)
+            yield (cx + ring, cy + dy)
+
+    def sameBaseline(self, chunk, tolerance=2.0):
+        '''
+        Get the other chunks whose bottom is within tolerance points of
+        the bottom of chunk, from left to right.
+        '''
+        return self.baseline(chunk.bbox.y1, tolerance=tolerance,
+                             exclude=chunk)
+
+    def baseline(self, y, tolerance=2.0, exclude=None):
+        '''
+        Get the chunks whose bottom is within tolerance points of y,
+        from left to right.
+        '''
+        start = bisect_left(self._bottoms, y - tolerance)
+        stop = bisect_right(self._bottoms, y + tolerance)
+        results = []
+        for i in range(start, stop):
+            chunk = self.chunks[self._bottomIndices[i]]
+            if chunk is not exclude:
+                results.append(chunk)
+        results.sort(key=lambda c: c.bbox.x1)
+        return results
+
+
+def buildPageIndexes(chunks, cellSize=36.0):
+    '''
+    Get a dict where each key is a pageid and the value is a PageIndex
+    of the chunks of that page.
+
+    Sequential arguments:
+    chunks -- Any iterable of DocChunk objects (such as a ColumnarChunks
+        store, or the chunks of several pages).
+    '''
+    pages = {}
+    for chunk in chunks:
+        pages.setdefault(chunk.pageid, []).append(chunk)
+    indexes = {}
+    for pageid, pageChunks in pages.items():
+        indexes[pageid] = PageIndex(pageChunks, cellSize=cellSize)
+    return indexes
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+import sys
+import os
+import json
+import tempfile
+from unittest import TestCase
+
+from srd.batch import (
+    findJobs,
+    runBatch,
+)
+from benchmarks.fixtures import (
+    writeTwoColumnPdf,
+    colStarts,
+)
+
+
+def prerr(msg):
+    sys.stderr.write("{}\n".format(msg))
+    sys.stderr.flush()
+
+
+class TestBatch(TestCase):
+    def test_find_jobs(self):
+        prerr("* testing findJobs with a manifest...")
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = os.path.join(tmp, "manifest.json")
+            with open(manifest, 'w') as outs:
+                json.dump(["a/book.pdf", "b/book.pdf",
+                           {'path': "c.pdf", 'output': "third"}], outs)
+            jobs = findJobs(manifest, "out")
+            self.assertEqual([job['path'] for job in jobs],
+                             [os.path.join(tmp, "a/book.pdf"),
+                              os.path.join(tmp, "b/book.pdf"),
+                              os.path.join(tmp, "c.pdf")])
+            self.assertEqual([job['output'] for job in jobs],
+                             [os.path.join("out", "book"),
+                              os.path.join("out", "book-2"),
+                              os.path.join("out", "third")])
+            prerr("* testing findJobs with a manifest output name...")
+            with open(manifest, 'w') as outs:
+                json.dump(["book.pdf", {'path': "x.pdf", 'output': "book"}],
+                          outs)
+            jobs = findJobs(manifest, "out")
+            self.assertEqual([job['output'] for job in jobs],
+                             [os.path.join("out", "book-2"),
+                              os.path.join("out", "book")])
+
+    def test_run_batch(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "pdfs")
+            os.makedirs(source)
+            for i in range(3):
+                writeTwoColumnPdf(os.path.join(source, "m{}.pdf".format(i)),
+                                  pageCount=2 + i, lineCount=6)
+            with open(os.path.join(source, "broken.pdf"), 'w') as outs:
+                outs.write("not a PDF")
+            prerr("* testing runBatch with a broken PDF...")
+            jobs = findJobs(source, os.path.join(tmp, "out"))
+            results = runBatch(jobs, workers=2, maxPending=2,
+                               colStarts=colStarts)
+            self.assertEqual([r['path'] for r in results],
+                             [job['path'] for job in jobs])
+            self.assertIsNotNone(results[0]['error'])
+            for i, result in enumerate(results[1:]):
+                self.assertIsNone(result['error'])
+                self.assertEqual(result['pages'], 2 + i)
+                for name in ["chunks.bin", "creatures.json",
+                             "creatures.csv", "diagnostics.log"]:
+                    self.assertTrue(os.path.isfile(
+                        os.path.join(result['output'], name)))
+
+
+if __name__ == "__main__":
+    print("Error: You ran a test module"
+          " but nose should have imported it instead.")
+    print("Run tests from {} via:"
+          "".format(os.path.realpath("..")))
+    print("python3 -m nose")
+    print("#or:")
+    print("python -m nose")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+import sys
+import os
+import tempfile
+from unittest import TestCase
+
+import srd
+from srd.buildgraph import (
+    BuildGraph,
+    creatureRulesDigest,
+)
+
+
+def prerr(msg):
+    sys.stderr.write("{}\n".format(msg))
+    sys.stderr.flush()
+
+
+def writeText(path, text):
+    with open(path, 'w') as outs:
+        outs.write(text)
+
+
+class TestBuildGraph(TestCase):
+    def test_stale(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            statePath = os.path.join(tmp, "build.json")
+            source = os.path.join(tmp, "chunks.ndjson")
+            output = os.path.join(tmp, "creatures.json")
+            writeText(source, "one\n")
+            writeText(output, "[]\n")
+            graph = BuildGraph(statePath)
+            inputs = {'chunks': graph.fileDigest(source), 'rules': "a"}
+            prerr("* testing BuildGraph.staleReason...")
+            self.assertEqual(graph.staleReason('creatures', inputs,
+                                               [output]),
+                             "it has no build record")
+            graph.record('creatures', inputs, [output])
+
+            graph = BuildGraph(statePath)
+            self.assertFalse(graph.changed)
+            self.assertTrue(graph.isRecordedOutput('creatures', output))
+            self.assertFalse(graph.isRecordedOutput('creatures', source))
+            self.assertIsNone(graph.staleReason('creatures', inputs,
+                                                [output]))
+            self.assertEqual(
+                graph.staleReason('creatures', dict(inputs, rules="b"),
+                                  [output]),
+                "rules changed",
+            )
+            writeText(source, "two\n")
+            changed = {'chunks': graph.fileDigest(source), 'rules': "a"}
+            self.assertTrue(graph.changed)
+            self.assertTrue(graph.isStale('creatures', changed, [output]))
+
+            prerr("* testing that an edited output is stale...")
+            writeText(output, "[{}]\n")
+            self.assertFalse(graph.isRecordedOutput('creatures', output))
+            self.assertIn("was changed",
+                          graph.staleReason('creatures', inputs, [output]))
+            os.remove(output)
+            self.assertIn("is missing",
+                          graph.staleReason('creatures', inputs, [output]))
+            graph.forget('creatures')
+            self.assertFalse(BuildGraph(statePath).has('creatures'))
+
+    def test_file_digest_cache(self):
+        prerr("* testing that BuildGraph.fileDigest only hashes changes...")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "source.pdf")
+            writeText(path, "abc")
+            graph = BuildGraph(os.path.join(tmp, "build.json"))
+            digest = graph.fileDigest(path)
+            key = os.path.abspath(path)
+            # A cached digest is used while the size and time are the same:
+            graph.files[key][2] = "cached"
+            self.assertEqual(graph.fileDigest(path), "cached")
+            info = os.stat(path)
+            os.utime(path, ns=(info.st_atime_ns, info.st_mtime_ns + 1000))
+            self.assertEqual(graph.fileDigest(path), digest)
+
+    def test_rule_tables(self):
+        prerr("* testing creatureRulesDigest...")
+        digest = creatureRulesDigest()
+        self.assertEqual(creatureRulesDigest(), digest)
+        srd.subcatEndPages.append(-1)
+        try:
+            self.assertNotEqual(creatureRulesDigest(), digest)
+        finally:
+            srd.subcatEndPages.pop()
+        self.assertEqual(creatureRulesDigest(), digest)
+
+
+if __name__ == "__main__":
+    print("Error: You ran a test module"
+          " but nose should have imported it instead.")
+    print("Run tests from {} via:"
+          "".format(os.path.realpath("..")))
+    print("python3 -m nose")
+    print("#or:")
+    print("python -m nose")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+import sys
+import os
+import re
+import tempfile
+from unittest import TestCase
+
+from srd import (
+    chunkRole,
+    dictToChunk,
+    roleName,
+)
+from srd.chunkcolumns import (
+    ColumnarChunks,
+    writeColumnarChunks,
+)
+from srd.chunkindex import (
+    ChunkIndex,
+    openChunkIndex,
+    writeChunkIndex,
+)
+from benchmarks.fixtures import (
+    srdLikeChunkDicts,
+)
+
+
+def prerr(msg):
+    sys.stderr.write("{}\n".format(msg))
+    sys.stderr.flush()
+
+
+class TestChunkIndex(TestCase):
+    def test_search(self):
+        chunkDicts = srdLikeChunkDicts(creaturesPerSection=2)
+        chunks = [dictToChunk(chunkD) for chunkD in chunkDicts]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "chunks.index")
+            prerr("* testing writeChunkIndex...")
+            self.assertEqual(writeChunkIndex(chunks, path), len(chunks))
+            with ChunkIndex(path) as index:
+                prerr("* testing ChunkIndex.search against scanning...")
+                for word in ["armor", "Challenge", "dragon", "nothing"]:
+                    expected = [i for i, c in enumerate(chunks)
+                                if word.lower()
+                                in re.findall(r"\w+", c.text.lower())]
+                    self.assertEqual([r['id'] for r in index.search(word)],
+                                     expected)
+                names = index.search(role=roleName)
+                self.assertEqual(
+                    [r['text'] for r in names],
+                    [c.text for c in chunks if chunkRole(c) == roleName])
+                self.assertGreater(len(names), 0)
+                hit = names[0]
+                self.assertEqual(hit['pageN'], chunks[hit['id']].pageN)
+                prerr("* testing ChunkIndex.search with a phrase...")
+                got = index.search('"armor class"')
+                self.assertGreater(len(got), 0)
+                self.assertEqual(index.search("class armor", phrase=True),
+                                 [])
+                pageNs = sorted(set(r['pageN'] for r in got))
+                pageN = pageNs[len(pageNs) // 2]
+                self.assertEqual(
+                    set(r['pageN'] for r in index.search(
+                        '"armor class"', pages="{}".format(pageN))),
+                    {pageN})
+                self.assertEqual(
+                    set(r['pageN'] for r in index.search(
+                        '"armor class"', pages="{}-".format(pageN))),
+                    set(n for n in pageNs if n >= pageN))
+                prerr("* testing that the index has the style of DocChunk...")
+                for result in index.search("armor"):
+                    chunk = chunks[result['id']]
+                    self.assertEqual((result['fontname'], result['size']),
+                                     (chunk.fontName, chunk.fontSize))
+                mixed = [i for i, c in enumerate(chunks)
+                         if len(c.fragments) > 1]
+                self.assertGreater(len(mixed), 0)
+                self.assertIsNone(index.chunk(mixed[0])['fontname'])
+                fonts = set(r['id'] for r in index.search(font="calibri"))
+                self.assertNotIn(mixed[0], fonts)
+
+    def test_open_from_store(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            chunksPath = os.path.join(tmp, "chunks.bin")
+            path = os.path.join(tmp, "chunks.index")
+            writeColumnarChunks(srdLikeChunkDicts(creaturesPerSection=1),
+                                chunksPath)
+            prerr("* testing openChunkIndex with a columnar store...")
+            with openChunkIndex(path=path, chunksPath=chunksPath) as index:
+                with ColumnarChunks(chunksPath) as chunks:
+                    self.assertEqual(len(index), len(chunks))
+                    first = index.search("challenge", limit=1)[0]
+                    self.assertEqual(first['text'],
+                                     chunks[first['id']].text)
+
+
+if __name__ == "__main__":
+    print("Error: You ran a test module"
+          " but nose should have imported it instead.")
+    print("Run tests from {} via:"
+          "".format(os.path.realpath("..")))
+    print("python3 -m nose")
+    print("#or:")
+    print("python -m nose")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+import sys
+import os
+import tempfile
+from unittest import TestCase
+
+from srd import (
+    DocChunk,
+)
+from srd.chunkcolumns import (
+    ColumnarChunks,
+    writeColumnarChunks,
+)
+from srd.chunkstore import (
+    ChunkWriter,
+    iterChunks,
+    saveChunkPages,
+)
+
+
+def prerr(msg):
+    sys.stderr.write("{}\n".format(msg))
+    sys.stderr.flush()
+
+
+def sampleChunks():
+    chunks = []
+    for pageid in range(3):
+        for i in range(4):
+            chunk = DocChunk(
+                pageid,
+                i % 2,
+                (57.6, 700.0 - i * 20, 200.25, 710.0 - i * 20),
+                "Line {} of page {}".format(i, pageid),
+                fontName="Helvetica",
+                fontSize=10.0,
+                fragments=[{'text': "Line {} of page {}".format(i, pageid),
+                            'fontname': "Helvetica", 'size': 10.0}],
+                annotations=[],
+            )
+            chunk.pageN = pageid + 1
+            chunks.append(chunk)
+    return chunks
+
+
+class TestChunkStore(TestCase):
+    def test_round_trip(self):
+        chunks = sampleChunks()
+        expected = [chunk.toDict() for chunk in chunks]
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ["chunks.ndjson", "chunks.ndjson.gz"]:
+                path = os.path.join(tmp, name)
+                prerr("* testing ChunkWriter and iterChunks with {}..."
+                      "".format(name))
+                with ChunkWriter(path) as writer:
+                    writer.writeChunks(chunks)
+                got = [chunk.toDict() for chunk in iterChunks(path)]
+                self.assertEqual(len(got), len(expected))
+                for i in range(len(got)):
+                    self.assertEqual(got[i]['text'], expected[i]['text'])
+                    self.assertEqual(tuple(got[i]['bbox']),
+                                     expected[i]['bbox'])
+                    self.assertEqual(got[i]['pageN'], expected[i]['pageN'])
+
+    def test_save_chunk_pages(self):
+        chunks = sampleChunks()
+        pages = [(0, chunks[:4]), (1, chunks[4:8]), (2, chunks[8:])]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "chunks.ndjson")
+            prerr("* testing saveChunkPages...")
+            self.assertEqual(saveChunkPages(iter(pages), path), 12)
+            self.assertEqual(os.listdir(tmp), ["chunks.ndjson"])
+            got = list(iterChunks(path, requirePageN=True))
+            prerr("* testing saveChunkPages with no extension...")
+            path = os.path.join(tmp, "chunks")
+            self.assertEqual(saveChunkPages(iter(pages), path), 12)
+            self.assertEqual(sorted(os.listdir(tmp)),
+                             ["chunks", "chunks.ndjson"])
+        self.assertEqual([c.text for c in got], [c.text for c in chunks])
+
+    def test_columnar_round_trip(self):
+        chunks = sampleChunks()
+        chunks[0].pageN = None
+        chunks[1].fontName = None
+        chunks[1].fontSize = None
+        chunks[1].annotations = None
+        expected = [chunk.toDict() for chunk in chunks]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "chunks.bin")
+            prerr("* testing writeColumnarChunks and ColumnarChunks...")
+            self.assertEqual(writeColumnarChunks(chunks, path), len(chunks))
+            with ColumnarChunks(path) as store:
+                self.assertEqual(len(store), len(chunks))
+                got = [chunk.toDict() for chunk in store]
+                self.assertEqual(got, expected)
+                self.assertEqual(list(store.pageids),
+                                 [c.pageid for c in chunks])
+                self.assertTrue(store[-1].oneStyle("Helvetica", 10.0))
+
+
+if __name__ == "__main__":
+    print("Error: You ran a test module"
+          " but nose should have imported it instead.")
+    print("Run tests from {} via:"
+          "".format(os.path.realpath("..")))
+    print("python3 -m nose")
+    print("#or:")
+    print("python -m nose")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+import sys
+import os
+import tempfile
+from unittest import TestCase
+
+from srd.columns import (
+    findColumnStarts,
+)
+from srd.pagechunker import (
+    generateChunks,
+)
+from benchmarks.fixtures import (
+    writeTwoColumnPdf,
+)
+
+
+def prerr(msg):
+    sys.stderr.write("{}\n".format(msg))
+    sys.stderr.flush()
+
+
+class TestColumns(TestCase):
+    def test_find_column_starts(self):
+        prerr("* testing findColumnStarts...")
+        xs = ([57.6] * 20 + [68.0] * 6 + [190.3]
+              + [328.56] * 18 + [338.0] * 5 + [540.0])
+        self.assertEqual(findColumnStarts(xs), [57.6, 328.56])
+        self.assertEqual(findColumnStarts([]), [])
+
+    def test_three_columns(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = writeTwoColumnPdf(os.path.join(tmp, "fixture.pdf"),
+                                     pageCount=3, lineCount=10,
+                                     colStarts=[36, 216, 396])
+            prerr("* testing generateChunks with detected columns...")
+            chunks = generateChunks(path, colStarts="auto")
+            for chunk in chunks:
+                if chunk.text.startswith("Column "):
+                    self.assertEqual(chunk.column,
+                                     int(chunk.text.split()[1]))
+            self.assertEqual(set(c.column for c in chunks), {0, 1, 2})
+            self.assertEqual(chunks[-1].pageN, 3)
+            prerr("* testing generateChunks with one column...")
+            chunks = generateChunks(path, colStarts=None)
+            self.assertEqual(set(c.column for c in chunks), {0})
+
+
+if __name__ == "__main__":
+    print("Error: You ran a test module"
+          " but nose should have imported it instead.")
+    print("Run tests from {} via:"
+          "".format(os.path.realpath("..")))
+    print("python3 -m nose")
+    print("#or:")
+    print("python -m nose")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+from srd import (
+    dictToChunk,
+    iterCreatures,
+    NameHeader,
+)
+from srd.diagnostics import (
+    Diagnostics,
+)
+from srd.creaturedb import (
+    CreatureDatabase,
+)
+from benchmarks.fixtures import (
+    srdLikeChunkDicts,
+)
+
+
+def prerr(msg):
+    sys.stderr.write("{}\n".format(msg))
+    sys.stderr.flush()
+
+
+class TestCreatureDatabase(TestCase):
+    def test_write(self):
+        chunks = [dictToChunk(chunkD)
+                  for chunkD in srdLikeChunkDicts(creaturesPerSection=4)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "srd.sqlite")
+            prerr("* testing CreatureDatabase...")
+            quiet = Diagnostics(quiet=True)
+            monsters = []
+            with CreatureDatabase(path, batchSize=7) as database:
+                for monster in iterCreatures(
+                        database.iterAddingChunks(chunks),
+                        diagnostics=quiet):
+                    monsters.append(monster)
+                    database.write(monster)
+                self.assertFalse(os.path.isfile(path))
+            db = sqlite3.connect(path)
+            try:
+                self.assertEqual(
+                    db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0],
+                    len(chunks))
+                rows = db.execute("SELECT name, cr, crText, xp, data"
+                                  " FROM creatures ORDER BY id").fetchall()
+                self.assertEqual([row[0] for row in rows],
+                                 [m[NameHeader] for m in monsters])
+                for row, monster in zip(rows, monsters):
+                    self.assertEqual(row[1], monster['CR'])
+                    self.assertEqual(row[3], monster['XP'])
+                    self.assertEqual(json.loads(row[4])['CR'], row[2])
+                strong = db.execute("SELECT COUNT(*) FROM creatures"
+                                    " WHERE cr >= 5").fetchone()[0]
+                self.assertEqual(strong, len([m for m in monsters
+                                              if m['CR'] >= 5]))
+                armor = db.execute(
+                    "SELECT creature, value FROM creatureStats"
+                    " WHERE name = 'Armor Class' ORDER BY creatureId"
+                ).fetchall()
+                self.assertEqual(armor, [(m[NameHeader], m['Armor Class'])
+                                         for m in monsters
+                                         if 'Armor Class' in m])
+                plan = " ".join(str(row) for row in db.execute(
+                    "EXPLAIN QUERY PLAN SELECT name FROM creatures"
+                    " WHERE subcategory = 'A Group'"))
+                self.assertIn("creaturesSubcategory", plan)
+            finally:
+                db.close()
+
+
+if __name__ == "__main__":
+    print("Error: You ran a test module"
+          " but nose should have imported it instead.")
+    print("Run tests from {} via:"
+          "".format(os.path.realpath("..")))
+    print("python3 -m nose")
+    print("#or:")
+    print("python -m nose")
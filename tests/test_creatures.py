@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+import sys
+import os
+import json
+import shutil
+import tempfile
+from unittest import TestCase
+
+from srd import (
+    CreatureParser,
+    dictToChunk,
+    iterCreatures,
+    floatToFraction,
+    NameHeader,
+)
+from srd.diagnostics import (
+    Diagnostics,
+)
+from srd.creaturewriter import (
+    CreatureWriter,
+)
+
+
+def prerr(msg):
+    sys.stderr.write("{}\n".format(msg))
+    sys.stderr.flush()
+
+
+NAME = ('WWROEK+Calibri-Bold', 16.139999999999986)
+STAT = ('WWROEK+Calibri-Bold', 13.234800000000064)
+BODY = ('LUFRKP+Calibri', 13.116719999999987)
+LETTER = ('DXJJCX+GillSans-SemiBold', 21.474000000000046)
+
+
+def makeChunk(frags, pageN=1):
+    fragments = [{'text': text, 'fontname': style[0], 'size': style[1]}
+                 for text, style in frags]
+    return dictToChunk({
+        'pageid': pageN - 1,
+        'pageN': pageN,
+        'column': 0,
+        'bbox': [57.6, 700.0, 300.0, 713.0],
+        'text': " ".join(text for text, style in frags),
+        'fragments': fragments,
+        'annotations': None,
+    })
+
+
+def monsterChunks():
+    yield makeChunk([("Monsters (A)", LETTER)])
+    for name, challenge in [("Aboleth", "10 (5,900 XP)"),
+                            ("Acolyte", "1/4 (50 XP)"),
+                            ("Ape", None)]:
+        yield makeChunk([(name, NAME)])
+        yield makeChunk([("Armor Class", STAT), ("12", BODY)])
+        if challenge is not None:
+            yield makeChunk([("Challenge", STAT), (challenge, BODY)])
+
+
+class TestCreatures(TestCase):
+    def test_iter_creatures_streams(self):
+        prerr("* testing that iterCreatures yields creatures early...")
+        consumed = []
+
+        def counted():
+            for chunk in monsterChunks():
+                consumed.append(chunk.text)
+                yield chunk
+
+        quiet = Diagnostics(quiet=True)
+        creatures = iterCreatures(counted(), diagnostics=quiet)
+        first = next(creatures)
+        self.assertEqual(first[NameHeader], "Aboleth")
+        self.assertEqual(first['CR'], 10.0)
+        self.assertEqual(first['XP'], 5900)
+        # Only the chunks up to the name that ends Aboleth were read.
+        self.assertEqual(consumed[-1], "Acolyte")
+        rest = list(creatures)
+        self.assertEqual([m[NameHeader] for m in rest], ["Acolyte", "Ape"])
+        self.assertEqual(rest[1]['CR'], -1)
+
+    def test_interleaved_parsers(self):
+        prerr("* testing two CreatureParser objects at once...")
+        quiet = Diagnostics(quiet=True)
+        expected = list(iterCreatures(monsterChunks(), diagnostics=quiet))
+        parsers = [CreatureParser(diagnostics=quiet),
+                   CreatureParser(diagnostics=quiet)]
+        results = [[], []]
+        for chunk in monsterChunks():
+            for i, parser in enumerate(parsers):
+                results[i] += parser.feed(chunk)
+        for i, parser in enumerate(parsers):
+            results[i] += parser.finish()
+            self.assertEqual(results[i], expected)
+        self.assertEqual(parsers[0].state()['context'], 'Monster')
+
+    def test_creature_writer(self):
+        prerr("* testing CreatureWriter...")
+        quiet = Diagnostics(quiet=True)
+        monsters = list(iterCreatures(monsterChunks(), diagnostics=quiet))
+        directory = tempfile.mkdtemp()
+        try:
+            jsonPath = os.path.join(directory, "creatures.json")
+            csvPath = os.path.join(directory, "creatures.csv")
+            headers = [NameHeader, "CR", "XP"]
+            with CreatureWriter(jsonPath=jsonPath, csvPath=csvPath,
+                                headers=headers) as writer:
+                for monster in monsters:
+                    writer.write(monster)
+                self.assertFalse(os.path.isfile(jsonPath))
+            expected = [dict(m) for m in monsters]
+            for monster in expected:
+                monster['CR'] = floatToFraction(monster['CR'])
+            with open(jsonPath, 'r') as ins:
+                self.assertEqual(ins.read(),
+                                 json.dumps(expected, indent=2))
+            with open(csvPath, 'r') as ins:
+                lines = ins.read().splitlines()
+            self.assertEqual(lines, ["ClassName,CR,XP", "Aboleth,10,5900.0",
+                                     "Acolyte,1/4,50.0", "Ape,-1,-1"])
+
+            with CreatureWriter(jsonPath=jsonPath) as writer:
+                pass
+            with open(jsonPath, 'r') as ins:
+                self.assertEqual(ins.read(), "[]")
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    print("Error: You ran a test module"
+          " but nose should have imported it instead.")
+    print("Run tests from {} via:"
+          "".format(os.path.realpath("..")))
+    print("python3 -m nose")
+    print("#or:")
+    print("python -m nose")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+import sys
+import os
+import tempfile
+from unittest import TestCase
+
+from srd import (
+    dictToChunk,
+    iterCreatures,
+)
+from srd.diagnostics import (
+    Diagnostics,
+    RecordingSink,
+)
+from srd.chunkcolumns import (
+    ColumnarChunks,
+    writeColumnarChunks,
+)
+from srd.creaturesegments import (
+    groupSegments,
+    iterCreaturesParallel,
+    splitSegments,
+)
+from benchmarks.fixtures import (
+    srdLikeChunkDicts,
+)
+
+
+def prerr(msg):
+    sys.stderr.write("{}\n".format(msg))
+    sys.stderr.flush()
+
+
+def parse(chunks, **kwargs):
+    log = Diagnostics(sink=RecordingSink())
+    if 'workers' in kwargs:
+        monsters = list(iterCreaturesParallel(chunks, diagnostics=log,
+                                              **kwargs))
+    else:
+        monsters = list(iterCreatures(chunks, diagnostics=log))
+    return monsters, log.sink.events
+
+
+class TestCreatureSegments(TestCase):
+    def test_split_segments(self):
+        prerr("* testing splitSegments...")
+        chunks = [dictToChunk(chunkD)
+                  for chunkD in srdLikeChunkDicts(creaturesPerSection=2)]
+        segments = splitSegments(chunks)
+        # One before "Monsters (A)" and one for each letter:
+        self.assertEqual(len(segments), 7)
+        self.assertEqual(segments[1][2]['context'], None)
+        self.assertEqual(segments[2][2]['context'], 'Monster')
+        self.assertEqual(chunks[segments[2][0]].text, "Monsters (B)")
+        self.assertEqual(segments[-1][1], len(chunks))
+        groups = groupSegments(segments, 3)
+        self.assertLessEqual(len(groups), 4)
+        self.assertEqual([g[0] for g in groups[1:]],
+                         [g[1] for g in groups[:-1]])
+
+    def test_same_as_serial(self):
+        chunkDicts = srdLikeChunkDicts(creaturesPerSection=5)
+        chunks = [dictToChunk(chunkD) for chunkD in chunkDicts]
+        expected = parse(chunks)
+        prerr("* testing iterCreaturesParallel with a chunk list...")
+        self.assertEqual(parse(chunks, workers=3), expected)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "chunks.bin")
+            writeColumnarChunks(chunkDicts, path)
+            prerr("* testing iterCreaturesParallel with ColumnarChunks...")
+            with ColumnarChunks(path) as store:
+                self.assertEqual(parse(store, workers=2), expected)
+
+
+if __name__ == "__main__":
+    print("Error: You ran a test module"
+          " but nose should have imported it instead.")
+    print("Run tests from {} via:"
+          "".format(os.path.realpath("..")))
+    print("python3 -m nose")
+    print("#or:")
+    print("python -m nose")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+import sys
+import os
+import csv
+import json
+import tempfile
+from unittest import TestCase
+
+from srd import (
+    creatureHeaders,
+)
+from srd.creaturewriter import (
+    CreatureWriter,
+    sortCreatures,
+)
+
+
+def prerr(msg):
+    sys.stderr.write("{}\n".format(msg))
+    sys.stderr.flush()
+
+
+class ListSink:
+    def __init__(self):
+        self.monsters = []
+        self.finished = None
+
+    def write(self, monster):
+        self.monsters.append(monster)
+
+    def close(self, finish=True):
+        self.finished = finish
+
+
+def monsterList():
+    monsters = []
+    for i in range(23):
+        monsters.append({'ClassName': "M{}".format(i), 'CR': (i * 7) % 5,
+                         'XP': i})
+    monsters[4]['Damage Immunities'] = "poison\nacid"
+    monsters[9]['Legendary Actions'] = "3"
+    return monsters
+
+
+class TestCreatureWriter(TestCase):
+    def test_sort_creatures(self):
+        prerr("* testing sortCreatures with sorted runs on disk...")
+        monsters = monsterList()
+        expected = sorted(monsters, key=lambda o: o['CR'])
+        with tempfile.TemporaryDirectory() as tmp:
+            got = list(sortCreatures(iter(monsters), runSize=4, tmpDir=tmp))
+            self.assertEqual(got, expected)
+            self.assertEqual(os.listdir(tmp), [])
+        self.assertEqual(list(sortCreatures(monsters)), expected)
+        self.assertEqual(list(sortCreatures([])), [])
+
+    def test_sinks(self):
+        prerr("* testing CreatureWriter sinks and CSV columns...")
+        monsters = monsterList()
+        sink = ListSink()
+        with tempfile.TemporaryDirectory() as tmp:
+            jsonPath = os.path.join(tmp, "creatures.json")
+            ndjsonPath = os.path.join(tmp, "creatures.ndjson")
+            csvPath = os.path.join(tmp, "creatures.csv")
+            with CreatureWriter(jsonPath=jsonPath, ndjsonPath=ndjsonPath,
+                                csvPath=csvPath, sinks=[sink]) as writer:
+                for monster in monsters:
+                    writer.write(monster)
+            self.assertEqual(writer.count, len(monsters))
+            self.assertEqual(sink.monsters, monsters)
+            self.assertTrue(sink.finished)
+            with open(jsonPath, 'r') as ins:
+                records = json.load(ins)
+            with open(ndjsonPath, 'r') as ins:
+                self.assertEqual([json.loads(line) for line in ins],
+                                 records)
+            with open(csvPath, 'r', newline='') as ins:
+                rows = list(csv.DictReader(ins))
+            self.assertEqual(list(rows[0].keys()),
+                             creatureHeaders + ["Damage Immunities",
+                                                "Legendary Actions"])
+            self.assertEqual(len(rows), len(monsters))
+            self.assertEqual(rows[3]['Damage Immunities'], "")
+            self.assertEqual(rows[4]['Damage Immunities'], "poison\nacid")
+            self.assertEqual(rows[9]['Legendary Actions'], "3")
+            self.assertEqual(rows[22]['Legendary Actions'], "")
+            self.assertEqual(rows[1]['CR'], records[1]['CR'])
+
+
+if __name__ == "__main__":
+    print("Error: You ran a test module"
+          " but nose should have imported it instead.")
+    print("Run tests from {} via:"
+          "".format(os.path.realpath("..")))
+    print("python3 -m nose")
+    print("#or:")
+    print("python -m nose")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+import sys
+import os
+import io
+import json
+from unittest import TestCase
+
+from srd.diagnostics import (
+    Diagnostics,
+    TextSink,
+    JsonLinesSink,
+    lazy,
+    DEBUG,
+    INFO,
+    WARNING,
+)
+
+
+def prerr(msg):
+    sys.stderr.write("{}\n".format(msg))
+    sys.stderr.flush()
+
+
+class TestDiagnostics(TestCase):
+    def test_levels_and_buffer(self):
+        prerr("* testing Diagnostics levels and TextSink buffering...")
+        outs = io.StringIO()
+        errs = io.StringIO()
+        diag = Diagnostics(level=INFO,
+                           sink=TextSink(stream=outs, errorStream=errs))
+        calls = []
+
+        def dump(value):
+            calls.append(value)
+            return "<{}>".format(value)
+
+        diag.debug('stat', "skipped {}", lazy(dump, 1))
+        diag.info('name', "Name {}:", lazy(dump, 2), indent="  ")
+        self.assertEqual(outs.getvalue(), "")
+        # A warning is written right away, after the lines before it:
+        diag.warning('stat', "WARNING: {}", "a\nb")
+        self.assertEqual(calls, [2])
+        self.assertEqual(outs.getvalue(), "  Name <2>:\n")
+        self.assertEqual(errs.getvalue(), "WARNING: a\nb\n")
+        diag.info('name', "Next")
+        self.assertEqual(outs.getvalue(), "  Name <2>:\n")
+        diag.flush()
+        self.assertEqual(outs.getvalue(), "  Name <2>:\nNext\n")
+        self.assertTrue(diag.enabled(WARNING))
+        self.assertFalse(diag.enabled(DEBUG))
+
+    def test_warning_order(self):
+        prerr("* testing that TextSink keeps warnings in order...")
+        outs = io.StringIO()
+        diag = Diagnostics(sink=TextSink(stream=outs, errorLevel=None))
+        diag.info('name', "one")
+        diag.warning('stat', "two")
+        self.assertEqual(outs.getvalue(), "one\ntwo\n")
+        diag.info('name', "three")
+        diag.flush()
+        self.assertEqual(outs.getvalue(), "one\ntwo\nthree\n")
+
+        # The default errorStream is sys.stderr when it is written:
+        diag = Diagnostics(sink=TextSink(stream=outs))
+        errs = io.StringIO()
+        oldStderr = sys.stderr
+        sys.stderr = errs
+        try:
+            diag.warning('stat', "four")
+        finally:
+            sys.stderr = oldStderr
+        self.assertEqual(errs.getvalue(), "four\n")
+
+    def test_sampling_and_quiet(self):
+        prerr("* testing Diagnostics sampling and quiet mode...")
+        outs = io.StringIO()
+        diag = Diagnostics(sink=JsonLinesSink(stream=outs),
+                           sampleEvery={'unknown': 3})
+        for i in range(7):
+            diag.info('unknown', "chunk {}", i)
+        diag.flush()
+        events = [json.loads(line) for line in outs.getvalue().splitlines()]
+        self.assertEqual([e['message'] for e in events],
+                         ["chunk 0", "chunk 3", "chunk 6"])
+        self.assertEqual(events[0]['level'], "INFO")
+        self.assertEqual(diag.counts['unknown'], 7)
+
+        diag.configure(quiet=True)
+        diag.warning('unknown', "{}", lazy(self.fail, "formatted"))
+        diag.flush()
+        self.assertEqual(len(outs.getvalue().splitlines()), 3)
+        diag.configure(quiet=False)
+        diag.info('other', "back")
+        diag.flush()
+        self.assertEqual(len(outs.getvalue().splitlines()), 4)
+
+
+if __name__ == "__main__":
+    print("Error: You ran a test module"
+          " but nose should have imported it instead.")
+    print("Run tests from {} via:"
+          "".format(os.path.realpath("..")))
+    print("python3 -m nose")
+    print("#or:")
+    print("python -m nose")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+import sys
+import os
+from unittest import TestCase
+
+from srd.markers import (
+    MarkerMatcher,
+)
+
+
+def prerr(msg):
+    sys.stderr.write("{}\n".format(msg))
+    sys.stderr.flush()
+
+
+class TestMarkers(TestCase):
+    def test_find_all(self):
+        markers = ["monstrosity,", "monstrosity (", "Monsters (A)",
+                   "Monsters", "5.1", "403", "ab", "abc", "b c", ""]
+        matcher = MarkerMatcher(markers)
+        texts = [
+            "",
+            "Large monstrosity, unaligned",
+            "Huge monstrosity (titan), monstrosity, any",
+            "Monsters (A)",
+            "Monsters (B)",
+            "SRD 5.1 p. 403",
+            "abc",
+            "xab c",
+            "nothing here",
+        ]
+        prerr("* testing MarkerMatcher.findAll...")
+        for text in texts:
+            expected = set(m for m in markers if m and (m in text))
+            self.assertEqual(matcher.findAll(text), expected)
+
+    def test_no_markers(self):
+        prerr("* testing MarkerMatcher with no markers...")
+        self.assertEqual(MarkerMatcher([]).findAll("any text"), set())
+
+
+if __name__ == "__main__":
+    print("Error: You ran a test module"
+          " but nose should have imported it instead.")
+    print("Run tests from {} via:"
+          "".format(os.path.realpath("..")))
+    print("python3 -m nose")
+    print("#or:")
+    print("python -m nose")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+import sys
+import os
+import json
+import tempfile
+from unittest import TestCase
+
+from srd import (
+    DocChunk,
+)
+from srd.pagechunker import (
+    generateChunks,
+    setPageNumbers,
+)
+from benchmarks.fixtures import (
+    writeTwoColumnPdf,
+    colStarts,
+)
+
+
+def prerr(msg):
+    sys.stderr.write("{}\n".format(msg))
+    sys.stderr.flush()
+
+
+def pageOf(pageid, texts):
+    return (pageid, [DocChunk(pageid, 0, (0, 0, 1, 1), text)
+                     for text in texts])
+
+
+class TestPageChunker(TestCase):
+    def test_set_page_numbers(self):
+        pages = [
+            pageOf(0, ["Title", "2"]),
+            pageOf(1, ["Text", "Not a number"]),
+            pageOf(2, []),
+            pageOf(3, ["More", "Last"]),
+            pageOf(4, ["5"]),
+        ]
+        prerr("* testing setPageNumbers...")
+        self.assertEqual(setPageNumbers(pages),
+                         [(1, "Not a number"), (3, "Last")])
+        self.assertEqual([c.pageN for c in pages[0][1]], [2, 2])
+        self.assertEqual([c.pageN for c in pages[1][1]], [None, None])
+        self.assertEqual(pages[4][1][0].pageN, 5)
+
+    def test_parallel_matches_serial(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = writeTwoColumnPdf(os.path.join(tmp, "fixture.pdf"),
+                                     pageCount=5, lineCount=8)
+            prerr("* testing generateChunks serially...")
+            serial = generateChunks(path, colStarts=colStarts)
+            prerr("* testing generateChunks with 2 workers...")
+            parallel = generateChunks(path, colStarts=colStarts, workers=2)
+        self.assertEqual(serial[-1].pageN, 5)
+        self.assertEqual(json.dumps([c.toDict() for c in serial]),
+                         json.dumps([c.toDict() for c in parallel]))
+
+    def test_page_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = writeTwoColumnPdf(os.path.join(tmp, "fixture.pdf"),
+                                     pageCount=3, lineCount=8)
+            cacheDir = os.path.join(tmp, "pagecache")
+            prerr("* testing generateChunks without a cache...")
+            expected = json.dumps([c.toDict() for c in
+                                   generateChunks(path, colStarts=colStarts)])
+            for i in range(2):
+                prerr("* testing generateChunks with a cache (pass {})..."
+                      "".format(i+1))
+                got = generateChunks(path, colStarts=colStarts,
+                                     cacheDir=cacheDir)
+                self.assertEqual(json.dumps([c.toDict() for c in got]),
+                                 expected)
+            pageFiles = []
+            for root, dirs, files in os.walk(cacheDir):
+                pageFiles += files
+            self.assertEqual(len(pageFiles), 3)
+
+
+if __name__ == "__main__":
+    print("Error: You ran a test module"
+          " but nose should have imported it instead.")
+    print("Run tests from {} via:"
+          "".format(os.path.realpath("..")))
+    print("python3 -m nose")
+    print("#or:")
+    print("python -m nose")
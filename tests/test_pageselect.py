@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+import sys
+import os
+import json
+import tempfile
+from unittest import TestCase
+
+import srd
+from srd.diagnostics import (
+    Diagnostics,
+)
+from srd.pageselect import (
+    parsePageSpec,
+    selectPages,
+)
+from srd.pagechunker import (
+    generateChunks,
+)
+from benchmarks.fixtures import (
+    writeTwoColumnPdf,
+    colStarts,
+)
+
+
+def prerr(msg):
+    sys.stderr.write("{}\n".format(msg))
+    sys.stderr.flush()
+
+
+pageLabels = [
+    (0, 'r', None, None),  # i, ii
+    (2, 'D', None, 1),  # 1 through 4
+    (6, 'D', "A-", 1),  # A-1, A-2
+]
+outline = [
+    (1, "Introduction", 0),
+    (1, "Monsters", 2),
+    (2, "Monsters (A)", 2),
+    (2, "Monsters (B)", 4),
+    (1, "Appendix MM-A: Miscellaneous Creatures", 6),
+]
+
+
+class TestPageSelect(TestCase):
+    def test_select_pages(self):
+        prerr("* testing parsePageSpec...")
+        self.assertEqual(parsePageSpec("iv, 12-15,300-,A-1..A-9"),
+                         [("iv", "iv"), ("12", "15"), ("300", None),
+                          ("A-1", "A-9")])
+        self.assertEqual(parsePageSpec("A-1,ii-2"),
+                         [("A-1", "A-1"), ("ii-2", "ii-2")])
+        self.assertEqual(parsePageSpec("A-1,ii-2", labels=["ii", "2", "A-1"]),
+                         [("A-1", "A-1"), ("ii", "2")])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = writeTwoColumnPdf(os.path.join(tmp, "fixture.pdf"),
+                                     pageCount=8, lineCount=4,
+                                     pageLabels=pageLabels,
+                                     outline=outline)
+            prerr("* testing selectPages...")
+            self.assertIsNone(selectPages(path))
+            self.assertEqual(selectPages(path, labels="ii-2,A-2..A-2"),
+                             [1, 2, 3, 7])
+            prerr("* testing selectPages with a hyphenated label...")
+            self.assertEqual(selectPages(path, labels="A-1"), [6])
+            self.assertEqual(selectPages(path, labels="3-"),
+                             [4, 5, 6, 7])
+            self.assertEqual(selectPages(path, sections=["Monsters (B)",
+                                                         "Appendix MM"]),
+                             [4, 5, 6, 7])
+            self.assertEqual(selectPages(path, sections=["Monsters"],
+                                         indices=[0]),
+                             [0, 2, 3, 4, 5])
+            with self.assertRaises(ValueError):
+                selectPages(path, labels="5")
+            with self.assertRaises(ValueError):
+                selectPages(path, sections=["Spells"])
+
+    def test_generate_chosen_pages(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = writeTwoColumnPdf(os.path.join(tmp, "fixture.pdf"),
+                                     pageCount=6, lineCount=6)
+            whole = generateChunks(path, colStarts=colStarts)
+            chosen = [1, 2, 4]
+            expected = json.dumps([c.toDict() for c in whole
+                                   if c.pageid in chosen])
+            prerr("* testing generateChunks with pageIndices...")
+            serial = generateChunks(path, colStarts=colStarts,
+                                    pageIndices=chosen)
+            self.assertEqual(json.dumps([c.toDict() for c in serial]),
+                             expected)
+            prerr("* testing generateChunks with pageIndices and 2"
+                  " workers...")
+            parallel = generateChunks(path, colStarts=colStarts,
+                                      pageIndices=chosen, workers=2)
+            self.assertEqual(json.dumps([c.toDict() for c in parallel]),
+                             expected)
+
+    def test_main_keeps_full_outputs(self):
+        prerr("* testing that a main run on chosen pages keeps the full"
+              " outputs...")
+        oldCwd = os.getcwd()
+        oldPaths = (srd.dataPath, srd.pageCachePath)
+        with tempfile.TemporaryDirectory() as tmp:
+            writeTwoColumnPdf(os.path.join(tmp, "SRD-OGL_V5.1.pdf"),
+                              pageCount=4, lineCount=4)
+            srd.dataPath = os.path.join(tmp, "data")
+            srd.pageCachePath = os.path.join(tmp, "pagecache")
+            os.makedirs(srd.dataPath)
+            fullPaths = [os.path.join(srd.dataPath, name) for name in
+                         ["creatures.json", "creatures.ndjson",
+                          "creatures.csv"]]
+            for path in fullPaths:
+                with open(path, 'w') as outs:
+                    outs.write("full")
+            try:
+                os.chdir(tmp)
+                srd.main(workers=1, colStarts=colStarts, labels="2-3",
+                         diagnostics=Diagnostics(quiet=True))
+                with self.assertRaises(ValueError):
+                    srd.main(workers=1, colStarts=colStarts, labels="2-3",
+                             outputPath=srd.dataPath)
+                subsetPath = srd.selectionPath(labels="2-3")
+            finally:
+                os.chdir(oldCwd)
+                srd.dataPath, srd.pageCachePath = oldPaths
+            for path in fullPaths:
+                with open(path, 'r') as ins:
+                    self.assertEqual(ins.read(), "full")
+            self.assertTrue(os.path.isfile(os.path.join(subsetPath,
+                                                        "creatures.json")))
+
+
+if __name__ == "__main__":
+    print("Error: You ran a test module"
+          " but nose should have imported it instead.")
+    print("Run tests from {} via:"
+          "".format(os.path.realpath("..")))
+    print("python3 -m nose")
+    print("#or:")
+    print("python -m nose")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+import sys
+import os
+import time
+import tempfile
+from unittest import TestCase
+
+from srd.profiling import (
+    Profiler,
+    nullProfiler,
+)
+from srd.pagechunker import (
+    generateChunks,
+)
+from benchmarks.fixtures import (
+    writeTwoColumnPdf,
+    colStarts,
+)
+
+
+def prerr(msg):
+    sys.stderr.write("{}\n".format(msg))
+    sys.stderr.flush()
+
+
+class TestProfiling(TestCase):
+    def test_nested_stages(self):
+        prerr("* testing Profiler with nested stages...")
+        profiler = Profiler(profileStage="inner")
+        for i in range(2):
+            with profiler.stage("outer"):
+                with profiler.stage("inner"):
+                    time.sleep(0.01)
+        calls, wall, cpu, selfWall, selfCpu = profiler.totals['outer']
+        self.assertEqual(calls, 2)
+        innerWall = profiler.totals['inner'][1]
+        self.assertGreaterEqual(innerWall, 0.02)
+        self.assertAlmostEqual(selfWall, wall - innerWall, places=6)
+        self.assertEqual(len(profiler.samples['inner']), 2)
+        report = profiler.report()
+        self.assertIn("outer", report)
+        self.assertIn("Profile of \"inner\"", report)
+
+        other = Profiler()
+        other.merge(profiler.data())
+        self.assertEqual(other.totals['inner'][0], 2)
+        with nullProfiler.stage("anything"):
+            pass
+
+    def test_generate_chunks_stages(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = writeTwoColumnPdf(os.path.join(tmp, "fixture.pdf"),
+                                     pageCount=3, lineCount=6)
+            prerr("* testing generateChunks with a Profiler...")
+            profiler = Profiler()
+            generateChunks(path, colStarts=colStarts, profiler=profiler)
+            for name in ["page", "interpret", "layout", "receive_layout",
+                         "numbering"]:
+                self.assertEqual(profiler.totals[name][0], 3)
+            prerr("* testing generateChunks with a Profiler and 2"
+                  " workers...")
+            profiler = Profiler()
+            generateChunks(path, colStarts=colStarts, profiler=profiler,
+                           workers=2)
+            self.assertTrue(profiler.merged)
+            self.assertEqual(profiler.totals['receive_layout'][0], 3)
+            self.assertGreater(len(profiler.histogram()), 0)
+
+
+if __name__ == "__main__":
+    print("Error: You ran a test module"
+          " but nose should have imported it instead.")
+    print("Run tests from {} via:"
+          "".format(os.path.realpath("..")))
+    print("python3 -m nose")
+    print("#or:")
+    print("python -m nose")
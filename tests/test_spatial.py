@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+import sys
+import os
+import random
+from unittest import TestCase
+
+from srd import (
+    DocChunk,
+)
+from srd.spatial import (
+    PageIndex,
+    buildPageIndexes,
+    pointDistance,
+)
+
+
+def prerr(msg):
+    sys.stderr.write("{}\n".format(msg))
+    sys.stderr.flush()
+
+
+def randomChunks(rng, count, pageid=0):
+    chunks = []
+    for i in range(count):
+        x1 = rng.uniform(0, 500)
+        y1 = rng.choice([100.0, 122.5, 145.0]) + rng.uniform(0, 600)
+        chunks.append(DocChunk(pageid, 0, (x1, y1, x1 + rng.uniform(5, 250),
+                                           y1 + rng.uniform(8, 14)),
+                               "chunk {}".format(i)))
+    return chunks
+
+
+class TestSpatial(TestCase):
+    def test_queries_match_scanning(self):
+        prerr("* testing PageIndex against scanning every chunk...")
+        rng = random.Random(5)
+        chunks = randomChunks(rng, 200)
+        index = PageIndex(chunks, cellSize=30.0)
+        for i in range(50):
+            x1 = rng.uniform(-50, 600)
+            y1 = rng.uniform(-50, 800)
+            x2 = x1 + rng.uniform(0, 200)
+            y2 = y1 + rng.uniform(0, 200)
+            expected = [c for c in chunks
+                        if (c.bbox.x1 <= x2) and (c.bbox.x2 >= x1)
+                        and (c.bbox.y1 <= y2) and (c.bbox.y2 >= y1)]
+            self.assertEqual(index.region(x1, y1, x2, y2), expected)
+
+            x = rng.uniform(-100, 700)
+            y = rng.uniform(-100, 900)
+            distances = sorted(pointDistance(c.bbox, x, y) for c in chunks)
+            got = index.nearest(x, y, k=3)
+            self.assertEqual([d for d, c in got], distances[:3])
+            got = index.nearest(x, y, k=3, maxDistance=20.0)
+            self.assertEqual([d for d, c in got],
+                             [d for d in distances[:3] if d <= 20.0])
+
+    def test_same_baseline(self):
+        prerr("* testing PageIndex.sameBaseline...")
+        row = [DocChunk(1, 0, (x, 500.0 + dy, x + 40, 510.0), str(x))
+               for x, dy in [(300, 0.5), (100, 0.0), (200, -1.0)]]
+        other = DocChunk(1, 0, (100, 480.0, 140, 490.0), "below")
+        indexes = buildPageIndexes(row + [other])
+        index = indexes[1]
+        self.assertEqual([c.text for c in index.sameBaseline(row[1])],
+                         ["200", "300"])
+        self.assertEqual(index.sameBaseline(other), [])
+        self.assertEqual(index.nearest(120, 495, exclude=other)[0][1].text,
+                         "100")
+
+
+if __name__ == "__main__":
+    print("Error: You ran a test module"
+          " but nose should have imported it instead.")
+    print("Run tests from {} via:"
+          "".format(os.path.realpath("..")))
+    print("python3 -m nose")
+    print("#or:")
+    print("python -m nose")